@@ -0,0 +1,374 @@
+import asyncio
+import sys
+import unittest
+from concurrent.futures import (
+    Executor,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    as_completed,
+)
+from dataclasses import replace
+from fractions import Fraction
+from typing import AsyncIterator, Callable, Iterable, Iterator
+
+from dyce import H
+from dyce.evaluation import LimitT
+
+# Local imports
+from dyce_impl import mechanic_dyce_fudged, mechanic_dyce_order_stats_fudged
+from params import Params
+from result_cache import ResultCache, _decode_h, _encode_h
+
+__all__ = ()
+
+_MechanicImplementationT = Callable[[Params, H, LimitT], H]
+_BatchResultT = tuple[int, Params | None, H | None]
+
+
+def evaluate_notations(
+    notations: str,
+    die_map: dict[str, H],
+    die: H,
+    explode_limit: LimitT,
+    implementation: _MechanicImplementationT = mechanic_dyce_fudged,
+    workers: int | None = 1,
+    executor: Executor | None = None,
+    result_cache: ResultCache | None = None,
+) -> Iterator[_BatchResultT]:
+    r"""
+    Parses *notations* and evaluates each line via ``#!python evaluate_params``.
+    """
+    return evaluate_params(
+        Params.parse_from_notation(notations, die_map),
+        die,
+        explode_limit,
+        implementation,
+        workers,
+        executor,
+        result_cache,
+    )
+
+
+def evaluate_params(
+    all_params: Iterable[Params | None],
+    die: H,
+    explode_limit: LimitT,
+    implementation: _MechanicImplementationT = mechanic_dyce_fudged,
+    workers: int | None = 1,
+    executor: Executor | None = None,
+    result_cache: ResultCache | None = None,
+) -> Iterator[_BatchResultT]:
+    r"""
+    Evaluates each of *all_params* with *implementation*, yielding ``#!python (index,
+    params, h)`` tuples as results become available. Spacers (``#!python None``) are
+    yielded immediately as ``#!python (index, None, None)``, along with any results
+    found in *result_cache*. The remaining lines are independent, so they are fanned out
+    over *executor* (or a ``#!python ProcessPoolExecutor`` with *workers* processes if
+    *workers* is not ``#!python 1``) and yielded in the order they complete. Results
+    cross process boundaries as compressed outcome/count pairs rather than pickled
+    ``#!python H`` objects.
+    """
+    ready, pending = _ready_and_pending(
+        all_params, die, explode_limit, implementation, result_cache
+    )
+    yield from ready
+
+    def _finished(i: int, params: Params, line_die: H, h: H) -> _BatchResultT:
+        if result_cache is not None:
+            result_cache.store(implementation, params, line_die, explode_limit, h)
+
+        return i, params, h
+
+    if executor is None and (workers == 1 or len(pending) <= 1 or is_emscripten()):
+        for i, params, line_die in pending:
+            yield _finished(
+                i, params, line_die, implementation(params, line_die, explode_limit)
+            )
+
+        return
+
+    own_executor = None
+    futures: dict[Future, tuple[int, Params, H]] = {}
+
+    if executor is None:
+        executor = own_executor = ProcessPoolExecutor(workers)
+
+    try:
+        futures = {
+            executor.submit(
+                _evaluate_line,
+                implementation,
+                # The die is sent separately as outcome/count pairs
+                replace(params, override_die=None),
+                tuple(line_die.items()),
+                explode_limit,
+            ): (i, params, line_die)
+            for i, params, line_die in pending
+        }
+
+        for future in as_completed(futures):
+            i, params, line_die = futures[future]
+            yield _finished(i, params, line_die, _decode_h(future.result()))
+    finally:
+        # If we were closed early, don't leave the remaining lines queued on a shared
+        # executor
+        for future in futures:
+            future.cancel()
+
+        if own_executor is not None:
+            own_executor.shutdown(wait=False, cancel_futures=True)
+
+
+async def evaluate_params_async(
+    all_params: Iterable[Params | None],
+    die: H,
+    explode_limit: LimitT,
+    implementation: _MechanicImplementationT = mechanic_dyce_fudged,
+    executor: Executor | None = None,
+    result_cache: ResultCache | None = None,
+) -> AsyncIterator[_BatchResultT]:
+    r"""
+    Asynchronous counterpart to ``#!python evaluate_params`` that never blocks the
+    running event loop on a computation. Pending lines are run on *executor* (or the
+    loop's default executor, if *executor* is ``#!python None``) and yielded in the
+    order they complete. If the consuming task is cancelled (or the iterator is closed),
+    lines that haven't started yet are cancelled and the results of any that have are
+    discarded. Under Pyodide, which has neither processes nor threads, lines are
+    computed in the loop one at a time, yielding to other tasks between each.
+    """
+    ready, pending = _ready_and_pending(
+        all_params, die, explode_limit, implementation, result_cache
+    )
+
+    for result in ready:
+        yield result
+
+    def _finished(i: int, params: Params, line_die: H, h: H) -> _BatchResultT:
+        if result_cache is not None:
+            result_cache.store(implementation, params, line_die, explode_limit, h)
+
+        return i, params, h
+
+    if executor is None and is_emscripten():
+        for i, params, line_die in pending:
+            await asyncio.sleep(0)
+            yield _finished(
+                i, params, line_die, implementation(params, line_die, explode_limit)
+            )
+
+        return
+
+    loop = asyncio.get_running_loop()
+    futures = {
+        loop.run_in_executor(
+            executor,
+            _evaluate_line,
+            implementation,
+            # The die is sent separately as outcome/count pairs
+            replace(params, override_die=None),
+            tuple(line_die.items()),
+            explode_limit,
+        ): (i, params, line_die)
+        for i, params, line_die in pending
+    }
+    not_done = set(futures)
+
+    try:
+        while not_done:
+            done, not_done = await asyncio.wait(
+                not_done, return_when=asyncio.FIRST_COMPLETED
+            )
+
+            for future in done:
+                i, params, line_die = futures[future]
+                yield _finished(i, params, line_die, _decode_h(future.result()))
+    finally:
+        for future in not_done:
+            future.cancel()
+
+
+def _ready_and_pending(
+    all_params: Iterable[Params | None],
+    die: H,
+    explode_limit: LimitT,
+    implementation: _MechanicImplementationT,
+    result_cache: ResultCache | None,
+) -> tuple[list[_BatchResultT], list[tuple[int, Params, H]]]:
+    r"""
+    Splits *all_params* into results that are ready (spacers and results found in
+    *result_cache*) and lines (with their dice) that still need computing.
+    """
+    ready: list[_BatchResultT] = []
+    pending: list[tuple[int, Params, H]] = []
+
+    for i, params in enumerate(all_params):
+        if params is None:
+            ready.append((i, None, None))
+            continue
+
+        line_die = params.override_die if params.override_die else die
+        h = (
+            None
+            if result_cache is None
+            else result_cache.lookup(implementation, params, line_die, explode_limit)
+        )
+
+        if h is None:
+            pending.append((i, params, line_die))
+        else:
+            ready.append((i, params, h))
+
+    return ready, pending
+
+
+def _evaluate_line(
+    implementation: _MechanicImplementationT,
+    params: Params,
+    die_items: tuple[tuple[int, int], ...],
+    explode_limit: LimitT,
+) -> bytes:
+    return _encode_h(implementation(params, H(die_items), explode_limit))
+
+
+def is_emscripten() -> bool:
+    r"""
+    Returns whether we're running under Pyodide (e.g., JupyterLite), which cannot spawn
+    processes (so work has to be done in this one).
+    """
+    return sys.platform == "emscripten"
+
+
+class TestEvaluateNotations(unittest.TestCase):
+    notations = r"""
+    4s1b@3  # first
+    <null>
+    [d8]2s1b@1+@3
+    nonsense
+    1s2b@2>1
+    <null>
+    """
+    die_map = {"d6": H(6), "d8": H(8)}
+
+    def _expected(self) -> list[_BatchResultT]:
+        expected: list[_BatchResultT] = []
+
+        for i, params in enumerate(
+            Params.parse_from_notation(self.notations, self.die_map)
+        ):
+            if params is None:
+                expected.append((i, None, None))
+            else:
+                h = mechanic_dyce_order_stats_fudged(
+                    params, params.override_die or H(6), Fraction(1, 10)
+                )
+                expected.append((i, params, h))
+
+        return expected
+
+    def test_serial(self):
+        results = evaluate_notations(
+            self.notations,
+            self.die_map,
+            H(6),
+            Fraction(1, 10),
+            mechanic_dyce_order_stats_fudged,
+        )
+        self.assertEqual(sorted(results, key=lambda res: res[0]), self._expected())
+
+    def test_process_pool(self):
+        with ProcessPoolExecutor(2) as executor:
+            results = list(
+                evaluate_notations(
+                    self.notations,
+                    self.die_map,
+                    H(6),
+                    Fraction(1, 10),
+                    mechanic_dyce_order_stats_fudged,
+                    executor=executor,
+                )
+            )
+
+        # Spacers come first, in order
+        self.assertEqual(results[:2], [(1, None, None), (4, None, None)])
+        self.assertEqual(sorted(results, key=lambda res: res[0]), self._expected())
+
+    def test_result_cache(self):
+        result_cache = ResultCache(None)
+
+        for _ in range(2):
+            results = evaluate_notations(
+                self.notations,
+                self.die_map,
+                H(6),
+                Fraction(1, 10),
+                mechanic_dyce_order_stats_fudged,
+                workers=2,
+                result_cache=result_cache,
+            )
+            self.assertEqual(sorted(results, key=lambda res: res[0]), self._expected())
+
+        self.assertEqual((result_cache.hits, result_cache.misses), (3, 3))
+
+    def test_async(self):
+        async def _collect() -> list[_BatchResultT]:
+            return [
+                result
+                async for result in evaluate_params_async(
+                    Params.parse_from_notation(self.notations, self.die_map),
+                    H(6),
+                    Fraction(1, 10),
+                    mechanic_dyce_order_stats_fudged,
+                )
+            ]
+
+        results = asyncio.run(_collect())
+        self.assertEqual(results[:2], [(1, None, None), (4, None, None)])
+        self.assertEqual(sorted(results, key=lambda res: res[0]), self._expected())
+
+    def test_async_cancel(self):
+        started = []
+
+        def _slow_counted(params: Params, die: H, explode_limit: LimitT) -> H:
+            started.append(params.num_std)
+
+            return _slow_implementation(params, die, explode_limit)
+
+        async def _first_result() -> _BatchResultT:
+            results = evaluate_params_async(
+                Params.parse_from_notation("1s0b@1\n2s0b@1\n3s0b@1"),
+                H(6),
+                0,
+                _slow_counted,
+                executor=executor,
+            )
+
+            try:
+                async for result in results:
+                    return result
+            finally:
+                await results.aclose()
+
+            assert False, "should never be here"
+
+        # One (thread) worker, so we can see which lines it started, and the last line
+        # is still queued when we stop
+        with ThreadPoolExecutor(1) as executor:
+            i, _, h = asyncio.run(_first_result())
+
+        self.assertEqual((i, h), (0, H(6) + 1))
+        # The second line had already started when the first finished, but the third
+        # was cancelled before it could
+        self.assertEqual(started, [1, 2])
+
+
+def _slow_implementation(params: Params, die: H, explode_limit: LimitT) -> H:
+    from time import sleep
+
+    sleep(0.2)
+
+    return die + params.num_std
+
+
+if __name__ == "__main__":
+    unittest.main()
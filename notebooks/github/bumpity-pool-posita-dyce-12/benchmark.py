@@ -0,0 +1,444 @@
+import argparse
+import json
+import platform
+import sys
+import tracemalloc
+import unittest
+from datetime import datetime, timezone
+from fractions import Fraction
+from importlib.metadata import PackageNotFoundError, version
+from time import perf_counter
+from typing import Any, Callable, Iterable, Iterator, Sequence
+
+from dyce import H
+from dyce.evaluation import LimitT
+
+# Local imports
+from dyce_impl import mechanic_dyce_exploded, mechanic_dyce_order_stats_fudged
+from icepool_impl import mechanic_icepool
+from implementations import IMPLEMENTATION_MAP
+from memo import clear_memos
+from monte_carlo import mechanic_monte_carlo
+from params import NotationParser, Params
+
+__all__ = ()
+
+_MechanicImplementationT = Callable[[Params, H, LimitT], H]
+
+# Bump this whenever the layout of the JSON output changes
+_RESULTS_VERSION = 1
+
+_DIE_MAP = {
+    "d4": H(4),
+    "d6": H(6),
+    "d8": H(8),
+    "d10": H(10),
+    "d12": H(12),
+    "d20": H(20),
+    "d0": H({0: 1}),
+    "d10*2": H(10) * 2,
+}
+
+_EXPLODE_LIMIT_MAP: dict[str, LimitT] = {
+    "0": 0,
+    "1": 1,
+    "2": 2,
+    "1/10": Fraction(1, 10),
+    "1/100": Fraction(1, 100),
+    "1/10000": Fraction(1, 10_000),
+}
+
+# Implementations whose results should match mechanic_dyce_exploded rather than the
+# fudged mechanic (see TestMechanicIcepool.test_dyce_exploded)
+_ACCURATE_IMPLEMENTATIONS: frozenset[_MechanicImplementationT] = frozenset(
+    (mechanic_dyce_exploded, mechanic_icepool, mechanic_monte_carlo)
+)
+
+# Implementations whose results are only approximately equal to their references (and
+# so are not compared)
+_APPROXIMATE_IMPLEMENTATIONS: frozenset[_MechanicImplementationT] = frozenset(
+    (mechanic_monte_carlo,)
+)
+
+
+def benchmark_grid(
+    pool_sizes: Iterable[int],
+    bump_ratios: Iterable[float],
+    extras: Iterable[str],
+) -> Iterator[Params]:
+    r"""
+    Yields distinct ``#!python Params`` for each combination of *pool_sizes*, fractions
+    of each pool made up of bump dice (*bump_ratios*), and extra dice notations (e.g.,
+    ``""``, ``"<1"``, ``">2"``). The set die is in the middle of the pool and the lowest
+    die is a bonus die.
+    """
+    seen: set[Params] = set()
+    bump_ratios = tuple(bump_ratios)
+    extras = tuple(extras)
+
+    for pool_size in pool_sizes:
+        for bump_ratio in bump_ratios:
+            num_bmp = min(round(pool_size * bump_ratio), pool_size - 1)
+            num_std = pool_size - num_bmp
+
+            for extra in extras:
+                params = Params.parse_line(
+                    f"{num_std}s{num_bmp}b@{pool_size // 2 + 1}{extra}+@1"
+                )
+                assert params is not None
+
+                if params not in seen:
+                    seen.add(params)
+                    yield params
+
+
+def run_benchmarks(
+    implementations: dict[str, _MechanicImplementationT],
+    all_params: Sequence[Params],
+    die_names: Iterable[str],
+    explode_limit_names: Iterable[str],
+    repeat: int = 3,
+    max_seconds: float | None = None,
+    log: Callable[[str], None] | None = None,
+) -> Iterator[dict[str, Any]]:
+    r"""
+    Runs each of *implementations* for each combination of *all_params*, die and
+    explode limit, yielding one JSON-friendly record per case. Wall time is the best of
+    *repeat* runs (with caches cleared before each). Peak memory comes from a separate,
+    traced run (because tracing slows everything down). Each result is compared to that
+    of a reference implementation (``#!python mechanic_dyce_exploded`` for accurate
+    implementations, ``#!python mechanic_dyce_order_stats_fudged`` otherwise). Once a case
+    takes longer than *max_seconds*, larger pools are skipped for that implementation,
+    die and explode limit.
+    """
+    references: dict[tuple[_MechanicImplementationT, Params, H, LimitT], H] = {}
+    # (implementation name, die name, explode limit name) -> smallest pool size that
+    # exceeded max_seconds
+    too_slow: dict[tuple[str, str, str], int] = {}
+    explode_limit_names = tuple(explode_limit_names)
+
+    for die_name in die_names:
+        die = _DIE_MAP[die_name]
+
+        for explode_limit_name in explode_limit_names:
+            explode_limit = _EXPLODE_LIMIT_MAP[explode_limit_name]
+
+            for params in all_params:
+                pool_size = params.num_std + params.num_bmp
+
+                for name, implementation in implementations.items():
+                    reference = (
+                        mechanic_dyce_exploded
+                        if implementation in _ACCURATE_IMPLEMENTATIONS
+                        else mechanic_dyce_order_stats_fudged
+                    )
+                    record: dict[str, Any] = {
+                        "implementation": name,
+                        "function": implementation.__name__,
+                        "reference": reference.__name__,
+                        "notation": str(params),
+                        "pool_size": pool_size,
+                        "die": die_name,
+                        "explode_limit": explode_limit_name,
+                    }
+                    slow_key = (name, die_name, explode_limit_name)
+
+                    if pool_size >= too_slow.get(slow_key, pool_size + 1):
+                        record["skipped"] = (
+                            f"a pool of size {too_slow[slow_key]} took longer than {max_seconds} seconds"
+                        )
+                        yield record
+                        continue
+
+                    wall_seconds = []
+
+                    for _ in range(repeat):
+                        clear_memos()
+                        start = perf_counter()
+                        h = implementation(params, die, explode_limit)
+                        wall_seconds.append(perf_counter() - start)
+
+                    clear_memos()
+                    tracemalloc.start()
+
+                    try:
+                        implementation(params, die, explode_limit)
+                        _, peak_bytes = tracemalloc.get_traced_memory()
+                    finally:
+                        tracemalloc.stop()
+
+                    reference_key = (reference, params, die, explode_limit)
+
+                    if implementation in _APPROXIMATE_IMPLEMENTATIONS:
+                        equal = None
+                    else:
+                        if reference_key not in references:
+                            references[reference_key] = (
+                                h
+                                if implementation is reference
+                                else reference(params, die, explode_limit)
+                            )
+
+                        equal = h == references[reference_key]
+
+                    record.update(
+                        wall_seconds=min(wall_seconds),
+                        wall_seconds_all=wall_seconds,
+                        peak_bytes=peak_bytes,
+                        equal=equal,
+                        mean=h.mean(),
+                    )
+
+                    if max_seconds is not None and min(wall_seconds) > max_seconds:
+                        too_slow[slow_key] = min(
+                            too_slow.get(slow_key, pool_size), pool_size
+                        )
+
+                    if log is not None:
+                        log(
+                            f"{name} | {die_name} | {explode_limit_name} | {params!s}: {record['wall_seconds']:.4f}s, {peak_bytes:,} bytes{' (MISMATCH)' if record['equal'] is False else ''}"
+                        )
+
+                    yield record
+
+
+def find_regressions(
+    baseline: dict[str, Any],
+    results: dict[str, Any],
+    threshold: float = 1.25,
+) -> list[str]:
+    r"""
+    Compares *results* to *baseline* (both as written by ``#!python main``) and returns
+    a description of each case that became unequal or whose best wall time grew by more
+    than *threshold* times.
+    """
+
+    def _key(record: dict[str, Any]) -> tuple[str, str, str, str]:
+        return (
+            record["function"],
+            record["notation"],
+            record["die"],
+            record["explode_limit"],
+        )
+
+    baseline_records = {_key(record): record for record in baseline["results"]}
+    regressions = []
+
+    for record in results["results"]:
+        old_record = baseline_records.get(_key(record))
+
+        if old_record is None or "skipped" in record or "skipped" in old_record:
+            continue
+
+        desc = " | ".join(_key(record))
+
+        if old_record["equal"] and record["equal"] is False:
+            regressions.append(f"{desc}: result no longer matches reference")
+
+        if record["wall_seconds"] > old_record["wall_seconds"] * threshold:
+            regressions.append(
+                f"{desc}: {old_record['wall_seconds']:.4f}s -> {record['wall_seconds']:.4f}s"
+            )
+
+    return regressions
+
+
+def _environment() -> dict[str, Any]:
+    packages = {}
+
+    for package in ("dyce", "icepool", "numpy"):
+        try:
+            packages[package] = version(package)
+        except PackageNotFoundError:
+            packages[package] = None
+
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "packages": packages,
+    }
+
+
+def _parse_args(argv: Sequence[str] | None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Benchmark bumpity mechanic implementations."
+    )
+    parser.add_argument(
+        "notations",
+        nargs="*",
+        metavar="NOTATION",
+        help="notations to benchmark (instead of the generated grid)",
+    )
+    parser.add_argument(
+        "-i",
+        "--implementation",
+        action="append",
+        dest="implementations",
+        metavar="SUBSTRING",
+        help="only benchmark implementations whose names contain SUBSTRING (repeatable)",
+    )
+    parser.add_argument("--pool-sizes", type=int, nargs="+", default=[1, 2, 3, 4, 5, 6])
+    parser.add_argument(
+        "--bump-ratios", type=float, nargs="+", default=[0.0, 0.34, 0.5, 1.0]
+    )
+    parser.add_argument("--extras", nargs="+", default=["", "<1", ">2"])
+    parser.add_argument(
+        "--dice", nargs="+", choices=tuple(_DIE_MAP), default=["d6", "d20"]
+    )
+    parser.add_argument(
+        "--explode-limits",
+        nargs="+",
+        choices=tuple(_EXPLODE_LIMIT_MAP),
+        default=["0", "2", "1/10000"],
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--max-seconds",
+        type=float,
+        default=30.0,
+        help="skip larger pools for an implementation once a case takes this long",
+    )
+    parser.add_argument(
+        "-o", "--output", default="-", help="where to write JSON results"
+    )
+    parser.add_argument(
+        "--compare",
+        metavar="BASELINE",
+        help="JSON results from a previous run to check for regressions",
+    )
+    parser.add_argument("--threshold", type=float, default=1.25)
+
+    return parser.parse_args(argv)
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    args = _parse_args(argv)
+    implementations = {
+        name: implementation
+        for name, implementation in IMPLEMENTATION_MAP.items()
+        if not args.implementations
+        or any(substring in name for substring in args.implementations)
+    }
+
+    if args.notations:
+        notation_parser = NotationParser()
+        all_params = [
+            params
+            for params in notation_parser.parse("\n".join(args.notations))
+            if params is not None
+        ]
+
+        for error in notation_parser.errors:
+            print(f"ignoring poorly formed notation {error}", file=sys.stderr)
+    else:
+        all_params = list(
+            benchmark_grid(args.pool_sizes, args.bump_ratios, args.extras)
+        )
+
+    # Smaller pools first so that max_seconds can skip larger ones
+    all_params.sort(key=lambda params: params.num_std + params.num_bmp)
+    results = {
+        "version": _RESULTS_VERSION,
+        "started": datetime.now(timezone.utc).isoformat(),
+        "environment": _environment(),
+        "results": list(
+            run_benchmarks(
+                implementations,
+                all_params,
+                args.dice,
+                args.explode_limits,
+                args.repeat,
+                args.max_seconds,
+                log=lambda line: print(line, file=sys.stderr),
+            )
+        ),
+    }
+
+    if args.output == "-":
+        json.dump(results, sys.stdout, indent=2)
+        print()
+    else:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    mismatches = [
+        record for record in results["results"] if record.get("equal") is False
+    ]
+    status = 0
+
+    for record in mismatches:
+        print(
+            f"MISMATCH: {record['implementation']} | {record['die']} | {record['explode_limit']} | {record['notation']}",
+            file=sys.stderr,
+        )
+        status = 1
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+        for regression in find_regressions(baseline, results, args.threshold):
+            print(f"REGRESSION: {regression}", file=sys.stderr)
+            status = 1
+
+    return status
+
+
+class TestBenchmark(unittest.TestCase):
+    def test_grid(self):
+        all_params = list(benchmark_grid((1, 3), (0.0, 0.5, 1.0), ("", "<1")))
+        self.assertEqual(
+            [str(params) for params in all_params],
+            [
+                "1s0b@1+@1",
+                "1s0b@1<1+@1",
+                "3s0b@2+@1",
+                "3s0b@2<1+@1",
+                "1s2b@2+@1",
+                "1s2b@2<1+@1",
+            ],
+        )
+
+    def test_run_benchmarks(self):
+        all_params = list(benchmark_grid((1, 2), (0.5,), ("", ">1")))
+        implementations = {
+            name: implementation
+            for name, implementation in IMPLEMENTATION_MAP.items()
+            if implementation.__name__.startswith("mechanic_dyce")
+        }
+        records = list(
+            run_benchmarks(implementations, all_params, ("d4",), ("0", "1/10"), 1)
+        )
+        self.assertEqual(len(records), len(implementations) * len(all_params) * 2)
+
+        for record in records:
+            self.assertTrue(record["equal"], msg=f"record = {record!r}")
+            self.assertGreater(record["peak_bytes"], 0, msg=f"record = {record!r}")
+            self.assertGreaterEqual(
+                record["wall_seconds"], 0.0, msg=f"record = {record!r}"
+            )
+
+        slow = {"results": [dict(record, wall_seconds=1.0) for record in records]}
+        self.assertEqual(find_regressions(slow, slow), [])
+        fast = {"results": [dict(record, wall_seconds=0.1) for record in records]}
+        self.assertEqual(len(find_regressions(fast, slow)), len(records))
+
+    def test_max_seconds(self):
+        all_params = list(benchmark_grid((1, 2), (0.0,), ("",)))
+        records = list(
+            run_benchmarks(
+                {"dyce": IMPLEMENTATION_MAP["dyce (explosions fudged within limit)"]},
+                all_params,
+                ("d4",),
+                ("0",),
+                1,
+                max_seconds=-1.0,
+            )
+        )
+        self.assertNotIn("skipped", records[0])
+        self.assertIn("skipped", records[1])
+
+
+if __name__ == "__main__":
+    sys.exit(main())
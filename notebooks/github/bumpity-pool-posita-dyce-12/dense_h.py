@@ -0,0 +1,276 @@
+import math
+import unittest
+from numbers import Integral
+from typing import Iterable
+
+import numpy as np
+from dyce import H
+
+__all__ = ()
+
+_UINT64_MAX = int(np.iinfo(np.uint64).max)
+
+
+class DenseH:
+    r"""
+    Compact histogram for integer outcomes, stored as the lowest outcome (*offset*) and
+    an array of counts for each consecutive outcome from there. Counts are ``uint64``
+    unless they might overflow, in which case they are Python ``int`` objects. This is
+    much cheaper to convolve (via ``#!python np.convolve``) than a dict-backed ``#!python
+    H`` when outcomes are dense, as they are for all of our dice.
+    """
+
+    __slots__ = ("offset", "counts")
+
+    def __init__(self, offset: int, counts: np.ndarray):
+        self.offset = offset
+        self.counts = counts
+
+    @classmethod
+    def from_h(cls, h: H) -> "DenseH":
+        if not h:
+            return cls(0, np.zeros(0, dtype=np.uint64))
+
+        if not all(isinstance(outcome, Integral) for outcome in h):
+            raise ValueError(f"outcomes must be integers ({h})")
+
+        lo = int(min(h))
+        hi = int(max(h))
+        counts = np.zeros(hi - lo + 1, dtype=_counts_dtype(max(h.values())))
+
+        for outcome, count in h.items():
+            counts[int(outcome) - lo] = count
+
+        return cls(lo, counts)
+
+    def to_h(self) -> H:
+        return H(
+            (self.offset + i, count)
+            for i, count in enumerate(self.counts.tolist())
+            if count
+        )
+
+    @property
+    def total(self) -> int:
+        return sum(self.counts.tolist())
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.offset}, {self.counts!r})"
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, H):
+            other = DenseH.from_h(other)
+
+        if not isinstance(other, DenseH):
+            return NotImplemented
+
+        lhs = self.lowest_terms()
+        rhs = other.lowest_terms()
+
+        return lhs.offset == rhs.offset and lhs.counts.tolist() == rhs.counts.tolist()
+
+    def __add__(self, other: "DenseH | int") -> "DenseH":
+        if isinstance(other, Integral):
+            return DenseH(self.offset + int(other), self.counts)
+
+        if not isinstance(other, DenseH):
+            return NotImplemented
+
+        if not len(self.counts) or not len(other.counts):
+            return DenseH(0, np.zeros(0, dtype=np.uint64))
+
+        # No convolved count can exceed the product of the totals
+        dtype = _counts_dtype(self.total * other.total)
+
+        return DenseH(
+            self.offset + other.offset,
+            np.convolve(self.counts.astype(dtype), other.counts.astype(dtype)),
+        )
+
+    __radd__ = __add__
+
+    def __rmatmul__(self, n: int) -> "DenseH":
+        if not isinstance(n, Integral):
+            return NotImplemented
+
+        if n < 0:
+            raise ValueError(f"cannot convolve a negative number of times ({n})")
+
+        # Binary exponentiation
+        result = DenseH(0, np.ones(1, dtype=np.uint64))
+        base = self
+
+        while n:
+            if n & 0x1:
+                result = result + base
+
+            n >>= 1
+
+            if n:
+                base = base + base
+
+        return result
+
+    def merge(self, other: "DenseH", scalar: int = 1) -> "DenseH":
+        r"""
+        Returns a histogram whose counts are the outcome-wise sum of this histogram's
+        counts and *other*'s counts multiplied by *scalar* (i.e., not a convolution).
+        """
+        if not len(other.counts):
+            return self
+
+        if not len(self.counts):
+            return other.scaled(scalar)
+
+        lo = min(self.offset, other.offset)
+        hi = max(self.offset + len(self.counts), other.offset + len(other.counts))
+        dtype = _counts_dtype(self.total + other.total * scalar)
+        counts = np.zeros(hi - lo, dtype=dtype)
+        counts[
+            self.offset - lo : self.offset - lo + len(self.counts)
+        ] += self.counts.astype(dtype)
+        counts[
+            other.offset - lo : other.offset - lo + len(other.counts)
+        ] += other.counts.astype(dtype) * (
+            dtype(scalar) if dtype is np.uint64 else scalar
+        )
+
+        return DenseH(lo, counts)
+
+    def scaled(self, scalar: int) -> "DenseH":
+        dtype = _counts_dtype(self.total * scalar)
+
+        return DenseH(
+            self.offset,
+            self.counts.astype(dtype)
+            * (dtype(scalar) if dtype is np.uint64 else scalar),
+        )
+
+    def lowest_terms(self) -> "DenseH":
+        nonzero = np.flatnonzero(self.counts)
+
+        if not len(nonzero):
+            return DenseH(0, np.zeros(0, dtype=np.uint64))
+
+        counts = self.counts[nonzero[0] : nonzero[-1] + 1]
+        divisor = int(np.gcd.reduce(counts))
+
+        if counts.dtype == object:
+            counts = np.array(
+                [count // divisor for count in counts.tolist()],
+                dtype=_counts_dtype(max(counts.tolist()) // divisor),
+            )
+        else:
+            counts = counts // np.uint64(divisor)
+
+        return DenseH(self.offset + int(nonzero[0]), counts)
+
+    def mean(self) -> float:
+        return (
+            sum(
+                outcome * count
+                for outcome, count in enumerate(self.counts.tolist(), self.offset)
+            )
+            / self.total
+        )
+
+    def variance(self) -> float:
+        mu = self.mean()
+
+        return (
+            sum(
+                count * (outcome - mu) ** 2
+                for outcome, count in enumerate(self.counts.tolist(), self.offset)
+            )
+            / self.total
+        )
+
+    def stdev(self) -> float:
+        return math.sqrt(self.variance())
+
+
+def aggregate_weighted_dense(
+    weighted_sources: Iterable[tuple[DenseH, int]],
+) -> DenseH:
+    r"""
+    Dense counterpart to ``#!python dyce.evaluation.aggregate_weighted`` for histogram
+    sources. Each source's total takes on its corresponding weight, but sources are
+    scaled to the least common multiple of their totals (rather than the product), which
+    keeps counts small.
+    """
+    weighted_sources = [
+        (dense_h, weight) for dense_h, weight in weighted_sources if len(dense_h.counts)
+    ]
+    totals = [dense_h.total for dense_h, _ in weighted_sources]
+    common_total = math.lcm(*totals) if totals else 1
+    result = DenseH(0, np.zeros(0, dtype=np.uint64))
+
+    for (dense_h, weight), total in zip(weighted_sources, totals):
+        result = result.merge(dense_h, weight * (common_total // total))
+
+    return result
+
+
+def _counts_dtype(max_count: int) -> type:
+    return np.uint64 if max_count <= _UINT64_MAX else object
+
+
+class TestDenseH(unittest.TestCase):
+    def test_round_trip(self):
+        for h in (H(6), H({-3: 1, 0: 2, 4: 5}), 3 @ H(20), H({0: 2**70, 1: 1})):
+            self.assertEqual(DenseH.from_h(h).to_h(), h, msg=f"h = {h!r}")
+
+    def test_add(self):
+        for lhs, rhs in (
+            (H(6), H(6)),
+            (H({-3: 1, 0: 2, 4: 5}), H(20)),
+            (H({0: 2**63, 1: 2**63}), H({0: 2**63, 2: 1})),
+        ):
+            self.assertEqual(
+                (DenseH.from_h(lhs) + DenseH.from_h(rhs)).to_h(),
+                lhs + rhs,
+                msg=f"lhs = {lhs!r}; rhs = {rhs!r}",
+            )
+
+        self.assertEqual((DenseH.from_h(H(6)) + 3).to_h(), H(6) + 3)
+
+    def test_overflow(self):
+        dense_h = DenseH.from_h(H(6))
+        self.assertIs(dense_h.counts.dtype.type, np.uint64)
+        dense_h = 30 @ dense_h
+        self.assertIs(dense_h.counts.dtype, np.dtype(object))
+        self.assertEqual(dense_h.to_h(), 30 @ H(6))
+
+    def test_matmul(self):
+        for n in range(5):
+            self.assertEqual(
+                (n @ DenseH.from_h(H(4))).to_h(), n @ H(4) if n else H({0: 1})
+            )
+
+    def test_lowest_terms(self):
+        dense_h = DenseH(-1, np.array([0, 4, 6, 0], dtype=np.uint64))
+        lowest = dense_h.lowest_terms()
+        self.assertEqual(lowest.offset, 0)
+        self.assertEqual(lowest.counts.tolist(), [2, 3])
+        self.assertEqual(dense_h, H({0: 2, 1: 3}))
+
+    def test_stats(self):
+        for h in (H(6), 4 @ H(8) - 10, H({0: 2**70, 1: 1})):
+            dense_h = DenseH.from_h(h)
+            self.assertAlmostEqual(dense_h.mean(), h.mean(), msg=f"h = {h!r}")
+            self.assertAlmostEqual(dense_h.stdev(), h.stdev(), msg=f"h = {h!r}")
+
+    def test_aggregate_weighted(self):
+        from dyce.evaluation import aggregate_weighted
+
+        weighted_sources = ((H(2), 1), (H({1: 1, 2: 2}), 2), (H({}), 5), (H(6), 3))
+        self.assertEqual(
+            aggregate_weighted_dense(
+                (DenseH.from_h(h), weight) for h, weight in weighted_sources
+            ),
+            aggregate_weighted(weighted_sources),
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,21 +1,75 @@
 import unittest
-from functools import cache
+from collections import defaultdict
+from dataclasses import dataclass
+from fractions import Fraction
+from math import comb
+from typing import Callable
 
+import numpy as np
+from dense_h import DenseH, aggregate_weighted_dense
 from dyce import H, P
 from dyce.evaluation import HResult, LimitT, PResult, PWithSelection, explode, foreach
+from memo import memo
 
 # Local imports
 from params import Params
 
 __all__ = ()
 
+# (std_used, bmp_used, total, held, check_outcome), where held is either the outcome of
+# the first die (if the set die is the last one and the check die might wrap around), or
+# whether the check die has been bumped to the next position
+_OrderStatsStateT = tuple[int, int, int, int | bool | None, int | None]
+
+_BaseMechanicT = Callable[[Params, H], H]
+
+_FUDGED_BASE_TERM_CACHE_SIZE = 256
+_EXPLOSIONS_CACHE_SIZE = 64
+_POOL_CACHE_SIZE = 64
+_POOL_TABLE_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# Upper bound on the number of merged rolls materialized at once by
+# mechanic_dyce_numpy
+_NUMPY_CHUNK_SIZE = 1 << 20
+
 
 def mechanic_dyce_fudged(params: Params, die: H, explode_limit: LimitT = 0) -> H:
-    return mechanic_dyce_base(params, die) + _aggregate_exploded_deltas(
-        die, explode_limit
+    return combine_fudged_terms(
+        fudged_base_term(mechanic_dyce_base, params, die),
+        fudged_delta_term(die, explode_limit),
     )
 
 
+def fudged_base_term(base: _BaseMechanicT, params: Params, die: H) -> H:
+    r"""
+    Returns the unexploded term of a fudged mechanic (i.e., ``#!python base(params,
+    die)``). Results are cached (up to ``#!python _FUDGED_BASE_TERM_CACHE_SIZE``, least
+    recently used first) by *base*, normalized *params* and *die*, so changing only the
+    explode limit does not recompute them.
+    """
+    return _fudged_base_term(base, params.normalized(), die)
+
+
+@memo(max_size=_FUDGED_BASE_TERM_CACHE_SIZE)
+def _fudged_base_term(base: _BaseMechanicT, params: Params, die: H) -> H:
+    return base(params, die)
+
+
+def fudged_delta_term(die: H, explode_limit: LimitT) -> H:
+    r"""
+    Returns the exploded term of a fudged mechanic, which depends only on *die* and
+    *explode_limit* (and is cached by both).
+    """
+    return _aggregate_exploded_deltas(die, explode_limit)
+
+
+def combine_fudged_terms(base_term: H, delta_term: H) -> H:
+    try:
+        return (DenseH.from_h(base_term) + DenseH.from_h(delta_term)).to_h()
+    except ValueError:  # non-integral outcomes
+        return base_term + delta_term
+
+
 def mechanic_dyce_base(params: Params, die: H) -> H:
     r"""
     *params* and *die* are used to describe the pool and mechanic constraints. Note this
@@ -27,19 +81,9 @@ def mechanic_dyce_base(params: Params, die: H) -> H:
     extra_bmp = min(params.extra_bmp, pool_size)
     # double each standard outcome (all even; assumes all outcomes are integers and support
     # bit-wise operations)
-    p_std = (params.num_std + extra_std) @ P(
-        H(
-            (outcome << 1, count)  # faster than outcome * 2  # type: ignore
-            for outcome, count in die.items()
-        )
-    )
+    p_std = encoded_pool(params.num_std + extra_std, die, 0x0)
     # double each bump outcome and add one (all odd)
-    p_bmp = (params.num_bmp + extra_bmp) @ P(
-        H(
-            (outcome << 1 | 0x1, count)  # faster than outcome * 2 + 1  # type: ignore
-            for outcome, count in die.items()
-        )
-    )
+    p_bmp = encoded_pool(params.num_bmp + extra_bmp, die, 0x1)
 
     if params.extra_std:
         extra_bonus = -2 * max(params.extra_std - pool_size, 0)
@@ -97,28 +141,559 @@ def mechanic_dyce_base(params: Params, die: H) -> H:
     return unexploded_result
 
 
-@cache
+def mechanic_dyce_order_stats_fudged(
+    params: Params, die: H, explode_limit: LimitT = 0
+) -> H:
+    return combine_fudged_terms(
+        fudged_base_term(mechanic_dyce_order_stats, params, die),
+        fudged_delta_term(die, explode_limit),
+    )
+
+
+def mechanic_dyce_order_stats(params: Params, die: H) -> H:
+    r"""
+    Alternative to ``#!python mechanic_dyce_base`` with the same interface and result.
+    Rather than enumerating every sorted roll of both pools, this walks the die's
+    outcomes in ascending order (standard before bump for the same outcome, which is the
+    same ordering as the even/odd encoding above) and counts the number of ways to
+    assign *k* of the remaining dice in each pool to that outcome (i.e., ``#!python
+    comb(remaining, k) * count ** k``). Only the positions the mechanic actually looks
+    at (the set die, its neighbor and any bonus dice) are tracked, so the number of
+    states depends on the number of faces and the pool sizes, not on the number of
+    distinct rolls.
+    """
+    return H(
+        (total, ways)
+        for (total, _), ways in _order_stats_totals(
+            params, die, track_check_outcome=False
+        ).items()
+    )
+
+
+def mechanic_dyce_exploded(params: Params, die: H, explode_limit: LimitT = 0) -> H:
+    r"""
+    Like ``#!python mechanic_dyce_order_stats``, but limits explosions accurately (i.e.,
+    with the same result as ``#!python icepool_impl.mechanic_icepool``). The check die's
+    outcome is tracked along with the total, and each outcome's exploded distribution
+    (from ``#!python _explosions_by_outcome``, which is computed once per die and limit)
+    is added to the totals for that check outcome. Each outcome therefore costs one
+    additional convolution, regardless of the pool size. Convolutions and the weighted
+    mix are performed on ``#!python DenseH`` arrays.
+    """
+    explosions = _explosions_by_outcome(die, explode_limit)
+    totals_by_check_outcome: dict[int, dict[int, int]] = defaultdict(dict)
+
+    for (total, check_outcome), ways in _order_stats_totals(
+        params, die, track_check_outcome=True
+    ).items():
+        totals_by_check_outcome[check_outcome][total] = ways  # type: ignore
+
+    dense_explosions = {
+        check_outcome: DenseH.from_h(exploded)
+        for check_outcome, exploded in explosions.items()
+    }
+
+    return (
+        aggregate_weighted_dense(
+            (
+                DenseH.from_h(H(totals)) + dense_explosions.get(check_outcome, 0),
+                sum(totals.values()),
+            )
+            for check_outcome, totals in totals_by_check_outcome.items()
+        )
+        .lowest_terms()
+        .to_h()
+    )
+
+
+@dataclass(frozen=True)
+class PoolWindow:
+    r"""
+    The part of a roll the mechanic looks at, given *params*, and how each die sorted
+    into it updates the running ``#!python (total, held, check_outcome)`` (see
+    ``#!python _OrderStatsStateT``). Positions are counted across the sorted standard
+    and bump dice together, including any extra dice, of which only the
+    ``#!python pool_size`` from ``#!python window_start`` are kept. Shared by
+    ``#!python mechanic_dyce_order_stats`` and ``#!python icepool_impl.IcepoolMechanic``,
+    which walk sorted rolls in the same order.
+    """
+
+    num_std: int
+    num_bmp: int
+    window_start: int
+    extra_bonus: int
+    set_die: int
+    bonus_multiplicities: tuple[int, ...]
+
+    @classmethod
+    def from_params(cls, params: Params) -> "PoolWindow":
+        pool_size = params.num_std + params.num_bmp
+        extra_std = min(params.extra_std, pool_size)
+        extra_bmp = min(params.extra_bmp, pool_size)
+        num_std = params.num_std + extra_std
+        num_bmp = params.num_bmp + extra_bmp
+
+        if params.extra_std:
+            extra_bonus = -2 * max(params.extra_std - pool_size, 0)
+            window_start = 0
+        elif params.extra_bmp:
+            extra_bonus = 2 * max(params.extra_bmp - pool_size, 0)
+            window_start = num_std + num_bmp - pool_size
+        else:
+            extra_bonus = 0
+            window_start = 0
+
+        bonus_multiplicities = [0] * pool_size
+
+        for bonus_die in params.bonus_dice:
+            bonus_multiplicities[bonus_die] += 1
+
+        return cls(
+            num_std=num_std,
+            num_bmp=num_bmp,
+            window_start=window_start,
+            extra_bonus=extra_bonus,
+            set_die=params.set_die,
+            bonus_multiplicities=tuple(bonus_multiplicities),
+        )
+
+    @property
+    def pool_size(self) -> int:
+        return len(self.bonus_multiplicities)
+
+    @property
+    def window_stop(self) -> int:
+        return self.window_start + self.pool_size
+
+    @property
+    def wraps(self) -> bool:
+        return self.set_die == self.pool_size - 1
+
+    def fill(
+        self,
+        total: int,
+        held: int | bool | None,
+        check_outcome: int | None,
+        outcome: int,
+        is_bmp: bool,
+        start: int,
+        stop: int,
+        track_check_outcome: bool = True,
+    ) -> tuple[int, int | bool | None, int | None]:
+        r"""
+        Returns the updated ``#!python (total, held, check_outcome)`` after sorting
+        *outcome* (from the bump pool if *is_bmp* is ``#!python True``) into positions
+        *start* through *stop* (exclusive). *check_outcome* is left alone unless
+        *track_check_outcome* is ``#!python True``.
+        """
+        set_die = self.set_die
+        wraps = self.wraps
+
+        for position in range(
+            max(start - self.window_start, 0),
+            min(stop - self.window_start, self.pool_size),
+        ):
+            total += self.bonus_multiplicities[position] * outcome
+
+            if wraps:
+                if position == 0:
+                    held = outcome
+
+                if position == set_die:
+                    total += outcome
+
+                    if is_bmp and set_die > 0:
+                        # Bump dice wrap around to the first die, but also keep the
+                        # set die's original outcome
+                        total += held  # type: ignore
+
+                        if track_check_outcome:
+                            check_outcome = held  # type: ignore
+                    elif track_check_outcome:
+                        check_outcome = outcome
+
+                    held = None
+            elif position == set_die:
+                if is_bmp:
+                    held = True
+                else:
+                    total += outcome
+
+                    if track_check_outcome:
+                        check_outcome = outcome
+            elif position == set_die + 1 and held is True:
+                total += outcome
+                held = None
+
+                if track_check_outcome:
+                    check_outcome = outcome
+
+        return total, held, check_outcome
+
+
+def _order_stats_totals(
+    params: Params,
+    die: H,
+    track_check_outcome: bool,
+) -> dict[tuple[int, int | None], int]:
+    r"""
+    Returns counts keyed by the mechanic's total (including any extra bonus) and, if
+    *track_check_outcome* is ``#!python True``, the outcome of the check die (otherwise
+    ``#!python None``). See ``#!python mechanic_dyce_order_stats``.
+    """
+    window = PoolWindow.from_params(params)
+    states: dict[_OrderStatsStateT, int] = {(0, 0, 0, None, None): 1}
+
+    for outcome, count in sorted(die.items()):
+        if count == 0:
+            continue
+
+        for is_bmp, pool_total in ((False, window.num_std), (True, window.num_bmp)):
+            next_states: dict[_OrderStatsStateT, int] = defaultdict(int)
+
+            for (
+                std_used,
+                bmp_used,
+                total,
+                held,
+                check_outcome,
+            ), ways in states.items():
+                used = bmp_used if is_bmp else std_used
+                remaining = pool_total - used
+                start = std_used + bmp_used
+
+                for k in range(remaining + 1):
+                    next_total, next_held, next_check_outcome = window.fill(
+                        total,
+                        held,
+                        check_outcome,
+                        outcome,
+                        is_bmp,
+                        start,
+                        start + k,
+                        track_check_outcome,
+                    )
+                    next_state = (
+                        (
+                            std_used,
+                            bmp_used + k,
+                            next_total,
+                            next_held,
+                            next_check_outcome,
+                        )
+                        if is_bmp
+                        else (
+                            std_used + k,
+                            bmp_used,
+                            next_total,
+                            next_held,
+                            next_check_outcome,
+                        )
+                    )
+                    next_states[next_state] += ways * comb(remaining, k) * count**k
+
+            states = next_states
+
+    totals: dict[tuple[int, int | None], int] = defaultdict(int)
+
+    for (std_used, bmp_used, total, _, check_outcome), ways in states.items():
+        if std_used == window.num_std and bmp_used == window.num_bmp:
+            totals[total + window.extra_bonus, check_outcome] += ways
+
+    return totals
+
+
+def mechanic_dyce_numpy_fudged(params: Params, die: H, explode_limit: LimitT = 0) -> H:
+    return combine_fudged_terms(
+        fudged_base_term(mechanic_dyce_numpy, params, die),
+        fudged_delta_term(die, explode_limit),
+    )
+
+
+def mechanic_dyce_numpy(params: Params, die: H) -> H:
+    r"""
+    Alternative to ``#!python mechanic_dyce_base`` with the same interface and result.
+    Uses the same even/odd encoding, but materializes the (already sliced) sorted rolls
+    of each pool as NumPy integer matrices and performs the merge, slice, bump check and
+    bonus summation on whole blocks of rolls at once. Counts are kept as ``uint64`` where
+    the total number of rolls allows it and as Python ``int`` objects otherwise, and are
+    accumulated into a ``#!python DenseH`` indexed by outcome.
+    """
+    # Pool tables are built from (and cached by) the die in lowest terms, so the count
+    # dtype must be chosen for the same
+    die = die.lowest_terms()
+    pool_size = params.num_std + params.num_bmp
+    extra_std = min(params.extra_std, pool_size)
+    extra_bmp = min(params.extra_bmp, pool_size)
+    num_std = params.num_std + extra_std
+    num_bmp = params.num_bmp + extra_bmp
+
+    if params.extra_std:
+        extra_bonus = -2 * max(params.extra_std - pool_size, 0)
+        roll_slice = slice(None, pool_size)
+    elif params.extra_bmp:
+        extra_bonus = 2 * max(params.extra_bmp - pool_size, 0)
+        roll_slice = slice(-pool_size, None)
+    else:
+        extra_bonus = 0
+        roll_slice = slice(None, pool_size)
+
+    count_dtype = (
+        np.uint64
+        if die.total ** (num_std + num_bmp) <= np.iinfo(np.uint64).max
+        else object
+    )
+    # Keep the highest dice of each pool if (and only if) there are extra bump dice
+    highest = roll_slice.start is not None
+    std_rolls, std_counts = encoded_pool_table(num_std, die, 0x0, pool_size, highest)
+    bmp_rolls, bmp_counts = encoded_pool_table(num_bmp, die, 0x1, pool_size, highest)
+    std_counts = std_counts.astype(count_dtype)
+    bmp_counts = bmp_counts.astype(count_dtype)
+    set_die = params.set_die
+    bonus_dice = list(params.bonus_dice)
+    totals = DenseH(0, np.zeros(0, dtype=count_dtype))
+    chunk_rows = max(_NUMPY_CHUNK_SIZE // len(bmp_rolls), 1)
+
+    for chunk_start in range(0, len(std_rolls), chunk_rows):
+        std_chunk = std_rolls[chunk_start : chunk_start + chunk_rows]
+        std_chunk_counts = std_counts[chunk_start : chunk_start + chunk_rows]
+        # Every standard roll in the chunk paired with every bump roll
+        rolls = np.concatenate(
+            (
+                np.repeat(std_chunk, len(bmp_rolls), axis=0),
+                np.tile(bmp_rolls, (len(std_chunk), 1)),
+            ),
+            axis=1,
+        )
+        rolls.sort(axis=1)
+        rolls = rolls[:, roll_slice]
+        assert rolls.shape[1] == pool_size
+        counts = np.repeat(std_chunk_counts, len(bmp_rolls)) * np.tile(
+            bmp_counts, len(std_chunk)
+        )
+        outcomes, _ = _mechanic_on_rolls(rolls, set_die, bonus_dice)
+        lo = int(outcomes.min())
+        chunk_counts = np.zeros(int(outcomes.max()) - lo + 1, dtype=count_dtype)
+        np.add.at(chunk_counts, outcomes - lo, counts)
+        totals = totals.merge(DenseH(lo, chunk_counts))
+
+    return (totals + extra_bonus).to_h()
+
+
+def _mechanic_on_rolls(
+    rolls: np.ndarray,
+    set_die: int,
+    bonus_dice: list[int],
+) -> tuple[np.ndarray, np.ndarray]:
+    r"""
+    Vectorized counterpart to ``#!python mechanic_dyce_base``'s ``#!python _mechanic``
+    for a matrix of sorted, sliced and encoded rolls (one per row). Returns each roll's
+    total (without any extra bonus) and the outcome of its check die.
+    """
+    next_die = (set_die + 1) % rolls.shape[1]
+    shifted_set_outcomes = rolls[:, set_die]
+    # odd outcomes are bump dice
+    is_bmp = (shifted_set_outcomes & 0x1).astype(bool)
+    check_outcomes = np.where(is_bmp, rolls[:, next_die], shifted_set_outcomes) >> 1
+    totals = check_outcomes.copy()
+
+    if next_die < set_die:
+        totals += np.where(is_bmp, shifted_set_outcomes >> 1, 0)
+
+    if bonus_dice:
+        totals += (rolls[:, bonus_dice] >> 1).sum(axis=1)
+
+    return totals, check_outcomes
+
+
+@memo(max_size=_POOL_CACHE_SIZE)
+def encoded_pool(num_dice: int, die: H, bump_bit: int) -> P:
+    r"""
+    Returns a pool of *num_dice* of *die*, with each outcome doubled and *bump_bit* added
+    (see ``#!python mechanic_dyce_base``). Pools are cached (up to ``#!python
+    _POOL_CACHE_SIZE``, least recently used first), so lines sharing a die and pool size
+    share the pool.
+    """
+    return num_dice @ P(
+        H((outcome << 1 | bump_bit, count) for outcome, count in die.items())  # type: ignore
+    )
+
+
+def encoded_pool_table(
+    num_dice: int,
+    die: H,
+    bump_bit: int,
+    keep: int,
+    highest: bool = False,
+) -> tuple[np.ndarray, np.ndarray]:
+    r"""
+    Returns the distinct sorted rolls of ``#!python encoded_pool(num_dice, die,
+    bump_bit)`` (as rows of an integer matrix) and the number of ways each can occur,
+    keeping only the lowest (or *highest*) *keep* dice of each roll. A table is built
+    from the table with one fewer die by merging each of its rolls with each face and
+    combining duplicates. Because a die that doesn't make the cut can never make it
+    later, that table can be sliced the same way. Every intermediate table is cached (up
+    to ``#!python _POOL_TABLE_CACHE_MAX_BYTES``, least recently used first), so pools of
+    overlapping sizes (e.g., ``5s0b``, ``4s1b``, ``3s2b``) share work. Cached arrays
+    are read-only. Counts are for *die* in lowest terms, since equal dice share a table
+    regardless of their counts' scale.
+    """
+    keep = min(keep, num_dice)
+    # Keeping every die is the same regardless of which end we keep
+    highest = highest and keep < num_dice
+
+    return _pool_table(num_dice, die.lowest_terms(), bump_bit, keep, highest)
+
+
+@memo(
+    max_bytes=_POOL_TABLE_CACHE_MAX_BYTES,
+    sizeof=lambda table: table[0].nbytes + table[1].nbytes,
+)
+def _pool_table(
+    num_dice: int,
+    die: H,
+    bump_bit: int,
+    keep: int,
+    highest: bool,
+) -> tuple[np.ndarray, np.ndarray]:
+    count_dtype = (
+        np.uint64 if die.total**num_dice <= np.iinfo(np.uint64).max else object
+    )
+
+    if num_dice == 0:
+        # A single empty roll, so that pairing with another pool is a no-op
+        rolls = np.empty((1, 0), dtype=np.int64)
+        counts = np.ones(1, dtype=count_dtype)
+    else:
+        prev_rolls, prev_counts = encoded_pool_table(
+            num_dice - 1, die, bump_bit, keep, highest
+        )
+        faces = np.array(
+            [outcome << 1 | bump_bit for outcome in die], dtype=np.int64  # type: ignore
+        )
+        face_counts = np.array(list(die.values()), dtype=count_dtype)
+        merged = np.concatenate(
+            (
+                np.repeat(prev_rolls, len(faces), axis=0),
+                np.tile(faces, len(prev_rolls))[:, np.newaxis],
+            ),
+            axis=1,
+        )
+        merged.sort(axis=1)
+
+        if merged.shape[1] > keep:
+            merged = merged[:, -keep:] if highest else merged[:, :keep]
+
+        rolls, inverse = np.unique(merged, axis=0, return_inverse=True)
+        counts = np.zeros(len(rolls), dtype=count_dtype)
+        np.add.at(
+            counts,
+            inverse.ravel(),
+            np.repeat(prev_counts.astype(count_dtype), len(faces))
+            * np.tile(face_counts, len(prev_rolls)),
+        )
+
+    rolls.setflags(write=False)
+    counts.setflags(write=False)
+
+    return rolls, counts
+
+
+@memo
 def _aggregate_exploded_deltas(die: H, explode_limit: LimitT):
+    # The check roll counts against explode_limit, so explosions are one level shallower
+    # than they are at the top level
+    explosions = _explosions_by_outcome(die, explode_limit, nested=True)
+
     def _func(h_res: HResult):
-        return _explosions_by_outcome(h_res.h, explode_limit).get(h_res.outcome, 0)  # type: ignore
+        return explosions.get(h_res.outcome, 0)  # type: ignore
 
     return foreach(_func, die)
 
 
-@cache
-def _explosions_by_outcome(die: H, explode_limit: LimitT) -> dict[int, H]:
+@memo(max_size=_EXPLOSIONS_CACHE_SIZE)
+def _explosions_by_outcome(
+    die: H, explode_limit: LimitT, nested: bool = False
+) -> dict[int, H]:
+    r"""
+    Returns, for each outcome of *die*, the distribution of an additional roll of *die*
+    that only counts if it matches that outcome, in which case it explodes on that
+    outcome (i.e., ``#!python die.eq(outcome) * explode(die, predicate=lambda result:
+    result.outcome == outcome, limit=explode_limit)``). If *nested* is ``#!python
+    True``, explosions are evaluated as if from within a roll of *die* (e.g., via
+    ``#!python foreach``), which is one level closer to *explode_limit*. Results are
+    cached by *die*, *explode_limit* and *nested* (up to ``#!python
+    _EXPLOSIONS_CACHE_SIZE``, least recently used first).
+    """
+    return _build_explosions_by_outcome(die, explode_limit, nested)
+
+
+def _build_explosions_by_outcome(
+    die: H, explode_limit: LimitT, nested: bool = False
+) -> dict[int, H]:
+    r"""
+    Rather than recursing through ``#!python explode`` for each outcome, this uses the
+    fact that exploding on an outcome *x* with probability *q* to a depth of *d* lands
+    on *j* ``* x + y`` (for each other outcome *y*) with probability ``q ** j * P(y)``
+    for each *j* less than *d*, or on *d* ``* x + y`` (for every outcome *y*, as the
+    sentinel) with probability ``q ** d * P(y)``. Counts are scaled to a common total
+    of ``die.total ** (d + 1)``. Fractional limits stop at the first depth whose
+    probability does not exceed *explode_limit*, just like ``#!python expandable``.
+    Nested explosions are one level shallower.
+    """
     if explode_limit <= 0:
         return {}
-    else:
-        return {
-            outcome: die.eq(outcome)  # type: ignore
-            * explode(
+
+    if len(die) == 1:
+        # explode has special handling for these (e.g., extrapolating to infinity)
+        (outcome,) = die
+
+        def _explode(_: HResult | None = None) -> H:
+            return die.eq(outcome) * explode(  # type: ignore
                 die,
                 predicate=lambda result: result.outcome == outcome,
                 limit=explode_limit,
             )
-            for outcome in die
-        }
+
+        return {outcome: foreach(_explode, die) if nested else _explode()}
+
+    total = die.total
+    items = list(die.items())
+    explosions = {}
+
+    for outcome, count in items:
+        if isinstance(explode_limit, int):
+            depth = explode_limit
+        else:
+            q = Fraction(count, total)
+            depth = 1
+
+            while q**depth > explode_limit:
+                depth += 1
+
+        if nested:
+            depth -= 1
+
+        exploded: defaultdict[int, int] = defaultdict(int)
+        # The roll that doesn't match (i.e., die.eq(outcome) is False) contributes zero
+        exploded[0] = (total - count) * total ** (depth + 1)
+        weight = count * total**depth  # includes the match (i.e., count / total)
+
+        for num_matches in range(depth):
+            for other_outcome, other_count in items:
+                if other_outcome != outcome:
+                    exploded[num_matches * outcome + other_outcome] += (  # type: ignore
+                        weight * other_count
+                    )
+
+            weight = weight // total * count
+
+        for other_outcome, other_count in items:
+            exploded[depth * outcome + other_outcome] += weight * other_count  # type: ignore
+
+        explosions[outcome] = H(exploded)
+
+    return explosions
 
 
 class TestExplosions(unittest.TestCase):
@@ -153,6 +728,41 @@ class TestExplosions(unittest.TestCase):
             },
         )
 
+    def test_explosions_by_outcome_matches_explode(self):
+        for die in (
+            H(6),
+            H({1: 1, 2: 19}),
+            H({-1: 1, 0: 2, 3: 1}),
+            H({3: 1}),
+            H(4) * 2,
+        ):
+            for explode_limit in (1, 3, Fraction(1, 36), Fraction(9, 10), 0.01):
+                expected = {
+                    outcome: die.eq(outcome)  # type: ignore
+                    * explode(
+                        die,
+                        predicate=lambda result, outcome=outcome: result.outcome
+                        == outcome,
+                        limit=explode_limit,
+                    )
+                    for outcome in die
+                }
+                self.assertEqual(
+                    _build_explosions_by_outcome(die, explode_limit),
+                    expected,
+                    msg=f"die = {die!r}; explode_limit = {explode_limit}",
+                )
+
+    def test_explosions_by_outcome_cached(self):
+        explosions = _explosions_by_outcome(H(5), 2)
+        self.assertIs(_explosions_by_outcome(H(5), 2), explosions)
+        # Nested explosions are cached separately, so neither pollutes the other
+        self.assertEqual(
+            _explosions_by_outcome(H(5), 2, nested=True),
+            _explosions_by_outcome(H(5), 1),
+        )
+        self.assertIs(_explosions_by_outcome(H(5), 2), explosions)
+
     def test_aggregate_exploded_deltas(self):
         d2 = H(2)
         self.assertEqual(_aggregate_exploded_deltas(d2, 0), H({0: 1}))
@@ -165,6 +775,74 @@ class TestExplosions(unittest.TestCase):
         )
 
 
+class TestPools(unittest.TestCase):
+    def test_encoded_pool_cached(self):
+        p = encoded_pool(3, H(6), 0x1)
+        self.assertEqual(p, 3 @ P(H({2 * i + 1: 1 for i in range(1, 7)})))
+        self.assertIs(encoded_pool(3, H(6), 0x1), p)
+
+    def test_encoded_pool_table(self):
+        for die in (H(4), H({-1: 1, 0: 2, 3: 1})):
+            for num_dice in range(5):
+                for keep in range(1, 4):
+                    for highest, roll_slice in (
+                        (False, slice(None, keep)),
+                        (True, slice(-keep, None)),
+                    ):
+                        rolls, counts = encoded_pool_table(
+                            num_dice, die, 0x1, keep, highest
+                        )
+                        expected = (
+                            encoded_pool(num_dice, die, 0x1).rolls_with_counts(
+                                roll_slice
+                            )
+                            if num_dice
+                            else (((), 1),)
+                        )
+                        self.assertEqual(
+                            sorted(zip(map(tuple, rolls.tolist()), counts.tolist())),
+                            sorted(expected),
+                            msg=f"die = {die!r}; num_dice = {num_dice}; keep = {keep}; highest = {highest}",
+                        )
+                        self.assertFalse(rolls.flags.writeable)
+
+    def test_encoded_pool_table_shared(self):
+        die = H(7)
+        _pool_table.cache_clear()
+        table = encoded_pool_table(4, die, 0x0, 4)
+        # Smaller pools were built along the way
+        self.assertEqual(_pool_table.cache_info().misses, 5)
+        encoded_pool_table(3, die, 0x0, 5)
+        self.assertEqual(_pool_table.cache_info().misses, 5)
+        self.assertIs(encoded_pool_table(4, die, 0x0, 4, highest=True), table)
+
+
+class TestFudgedTerms(unittest.TestCase):
+    def test_base_term_cached(self):
+        calls = []
+
+        def _base(params: Params, die: H) -> H:
+            calls.append((params, die))
+
+            return mechanic_dyce_order_stats(params, die)
+
+        (params,) = Params.parse_from_notation("4s1b@3+@1  # first")
+        (same_params,) = Params.parse_from_notation("4s1b@3+@1  # second")
+
+        for explode_limit in (0, 1, 2, 1):
+            self.assertEqual(
+                combine_fudged_terms(
+                    fudged_base_term(_base, same_params, H(6)),
+                    fudged_delta_term(H(6), explode_limit),
+                ),
+                mechanic_dyce_fudged(params, H(6), explode_limit),
+            )
+
+        self.assertEqual(len(calls), 1)
+        fudged_base_term(_base, params, H(8))
+        self.assertEqual(len(calls), 2)
+
+
 class TestMechanic(unittest.TestCase):
     def test_base_simple(self):
         d2 = H(2)
@@ -297,6 +975,80 @@ class TestMechanic(unittest.TestCase):
 
             actual = mechanic_dyce_base(params, d6)
             self.assertEqual(expected, actual, msg=f"notation = {notation!r}")
+            actual_numpy = mechanic_dyce_numpy(params, d6)
+            self.assertEqual(expected, actual_numpy, msg=f"notation = {notation!r}")
+
+    def test_exploded_without_explosions(self):
+        for notation in ("4s1b@1", "4s1b@5+@1", "1s2b@1>1+@3", "2s3b@3<1"):
+            (params,) = Params.parse_from_notation(notation)
+            self.assertEqual(
+                mechanic_dyce_exploded(params, H(6), 0),
+                mechanic_dyce_base(params, H(6)),
+                msg=f"notation = {notation!r}",
+            )
+
+    def test_numpy(self):
+        for die in (H(2), H(6), H({-1: 1, 0: 2, 3: 1}), H(10) * 2):
+            for notation in (
+                "1s0b@1",
+                "1s1b@1",
+                "1s1b@2",
+                "1s0b@1>1",
+                "1s0b@1<1",
+                "1s0b@1>3+@1",
+                "1s0b@1<3+@1",
+                "4s1b@1",
+                "4s1b@3",
+                "4s1b@5",
+                "4s1b@5+@1+@5",
+                "1s2b@1>1+@3",
+                "1s2b@3<2+@2",
+                "2s3b@3",
+                "2s3b@5>2",
+                "3s2b@2<1+@1+@1",
+            ):
+                (params,) = Params.parse_from_notation(notation)
+                self.assertEqual(
+                    mechanic_dyce_numpy(params, die),
+                    mechanic_dyce_base(params, die),
+                    msg=f"die = {die!r}; notation = {notation!r}",
+                )
+
+    def test_numpy_scaled_die(self):
+        # Equal dice share pool tables regardless of their counts' scale
+        (params,) = Params.parse_from_notation("6s2b@3")
+        _pool_table.cache_clear()
+        scaled_d6 = H({outcome: 4096 for outcome in range(1, 7)})
+        expected = mechanic_dyce_base(params, H(6))
+        self.assertEqual(mechanic_dyce_numpy(params, scaled_d6), expected)
+        self.assertEqual(mechanic_dyce_numpy(params, H(6)), expected)
+
+    def test_order_stats(self):
+        for die in (H(2), H(6), H({-1: 1, 0: 2, 3: 1}), H(10) * 2):
+            for notation in (
+                "1s0b@1",
+                "1s1b@1",
+                "1s1b@2",
+                "1s0b@1>1",
+                "1s0b@1<1",
+                "1s0b@1>3+@1",
+                "1s0b@1<3+@1",
+                "4s1b@1",
+                "4s1b@3",
+                "4s1b@5",
+                "4s1b@5+@1+@5",
+                "1s2b@1>1+@3",
+                "1s2b@3<2+@2",
+                "2s3b@3",
+                "2s3b@5>2",
+                "3s2b@2<1+@1+@1",
+            ):
+                (params,) = Params.parse_from_notation(notation)
+                self.assertEqual(
+                    mechanic_dyce_order_stats(params, die),
+                    mechanic_dyce_base(params, die),
+                    msg=f"die = {die!r}; notation = {notation!r}",
+                )
 
 
 if __name__ == "__main__":
@@ -1,32 +1,46 @@
-from enum import IntEnum, auto
-from functools import cache
+import unittest
+from fractions import Fraction
 
 import icepool
 from dyce import H
 from dyce.evaluation import LimitT
 
 # Local imports
-from dyce_impl import _aggregate_exploded_deltas, _explosions_by_outcome
+from dyce_impl import (
+    _EXPLOSIONS_CACHE_SIZE,
+    PoolWindow,
+    _explosions_by_outcome,
+    combine_fudged_terms,
+    fudged_base_term,
+    fudged_delta_term,
+    mechanic_dyce_base,
+    mechanic_dyce_exploded,
+)
+from memo import memo
 from params import Params
 
 __all__ = ()
 
 
-class Pool(IntEnum):
-    STANDARD = auto()
-    BUMP = auto()
-
-
-assert Pool.STANDARD < Pool.BUMP
-
-_StateT = tuple[tuple[int, Pool], ...]
+# (seen, total, held, check_outcome), where seen is the number of dice processed so far
+# (capped once the kept positions are filled), total is the sum of the check outcome (and
+# any wrapped outcome) and bonus dice, held is either the outcome of the first kept die
+# (if the set die is the last one and the check die might wrap around) or whether the
+# check die has been bumped to the next position, and check_outcome is the outcome of
+# the check die (only tracked if there are explosions)
+_StateT = tuple[int, int, int | bool | None, int | None]
 
 
 class IcepoolMechanic(icepool.MultisetEvaluator):
     r"""
     icepool.MultisetEvaluator mechanic implementation, which is vastly more efficient
     than a ``#!python dyce``-based implementation for correct explosion approximation,
-    but offers little advantage otherwise (e.g., if fudging explosions).
+    but offers little advantage otherwise (e.g., if fudging explosions). Outcomes are
+    evaluated in ascending order (standard before bump for the same outcome). Rather
+    than the whole sorted roll, the state holds only what ``#!python final_outcome``
+    needs (see ``#!python _StateT``), so rolls that agree on the kept positions the
+    mechanic looks at collapse into the same state. Each die updates the state the same
+    way as in ``#!python mechanic_dyce_order_stats`` (see ``#!python PoolWindow``).
     """
 
     def __init__(
@@ -38,66 +52,57 @@ class IcepoolMechanic(icepool.MultisetEvaluator):
         self._params = params
         self._die = die
         self._explode_limit = explode_limit
-        self.pool_size = params.num_std + params.num_bmp
-        self.extra_std = min(params.extra_std, self.pool_size)
-        self.extra_bmp = min(params.extra_bmp, self.pool_size)
-
-        if params.extra_std:
-            self._order = icepool.Order.Ascending
-            self._roll_slice = slice(None, self.pool_size)
-            self._extra_bonus = -2 * max(params.extra_std - self.pool_size, 0)
-        elif params.extra_bmp:
-            self._order = icepool.Order.Descending
-            self._roll_slice = slice(-self.pool_size, None)
-            self._extra_bonus = 2 * max(params.extra_bmp - self.pool_size, 0)
-        else:
-            self._order = icepool.Order.Descending
-            self._roll_slice = slice(None)
-            self._extra_bonus = 0
+        self.window = PoolWindow.from_params(params)
+        self._explosions = _explosions_by_outcome_icepool(die, explode_limit)
 
     def final_outcome(self, final_state: _StateT) -> icepool.Die | int:
-        final_state = final_state[self._roll_slice]
-        assert len(final_state) == self.pool_size
-        check_die = self._params.set_die
-        _, set_type = final_state[check_die]
-
-        if set_type is Pool.BUMP:
-            check_die = (check_die + 1) % len(final_state)
-
-        check_outcome, _ = final_state[check_die]
-        total_outcome = check_outcome
+        _, total, _, check_outcome = final_state
 
-        if check_die < self._params.set_die:
-            wrapped_outcome, _ = final_state[self._params.set_die]
-            total_outcome += wrapped_outcome
-
-        return (
-            total_outcome
-            + sum(final_state[bonus_die][0] for bonus_die in self._params.bonus_dice)
-            + self._extra_bonus
-            + _explosions_by_outcome_icepool(self._die, self._explode_limit).get(
-                check_outcome, 0
-            )
-        )
+        return total + self.window.extra_bonus + self._explosions.get(check_outcome, 0)  # type: ignore
 
     def next_state(
         self, state: _StateT | None, outcome: int, std_count: int, bmp_count: int
     ) -> _StateT:
         if state is None:
-            state = ()
-
-        new_std = ((outcome, Pool.STANDARD),) * std_count
-        new_bmp = ((outcome, Pool.BUMP),) * bmp_count
+            state = (0, 0, None, None)
+
+        seen, total, held, check_outcome = state
+        window = self.window
+
+        if seen >= window.window_stop:
+            return state
+
+        track_check_outcome = bool(self._explosions)
+        total, held, check_outcome = window.fill(
+            total,
+            held,
+            check_outcome,
+            outcome,
+            False,
+            seen,
+            seen + std_count,
+            track_check_outcome,
+        )
+        total, held, check_outcome = window.fill(
+            total,
+            held,
+            check_outcome,
+            outcome,
+            True,
+            seen + std_count,
+            seen + std_count + bmp_count,
+            track_check_outcome,
+        )
 
-        if self._order is icepool.Order.Ascending:
-            return state + new_std + new_bmp
-        elif self._order is icepool.Order.Descending:
-            return new_std + new_bmp + state
-        else:
-            assert False, "should never be here"
+        return (
+            min(seen + std_count + bmp_count, window.window_stop),
+            total,
+            held,
+            check_outcome,
+        )
 
     def order(self, *_) -> icepool.Order:
-        return self._order
+        return icepool.Order.Ascending
 
 
 def mechanic_icepool(
@@ -110,8 +115,8 @@ def mechanic_icepool(
     and uses an ``#!python mechanic_icepool``-based implementation.
     """
     mechanic = IcepoolMechanic(params, die, explode_limit)
-    p_std = icepool.Die(die).pool(params.num_std + mechanic.extra_std)
-    p_bmp = icepool.Die(die).pool(params.num_bmp + mechanic.extra_bmp)
+    p_std = icepool.Die(die).pool(mechanic.window.num_std)
+    p_bmp = icepool.Die(die).pool(mechanic.window.num_bmp)
     d_result = mechanic(p_std, p_bmp)
 
     return H(d_result).lowest_terms()
@@ -126,12 +131,17 @@ def mechanic_icepool_fudged(
     This has the same interface as ``#!python mechanic_dyce``, but translates primitives
     and uses an ``#!python mechanic_icepool``-based implementation.
     """
-    return mechanic_icepool(params, die, explode_limit=0) + _aggregate_exploded_deltas(
-        die, explode_limit
+    return combine_fudged_terms(
+        fudged_base_term(mechanic_icepool_base, params, die),
+        fudged_delta_term(die, explode_limit),
     )
 
 
-@cache
+def mechanic_icepool_base(params: Params, die: H) -> H:
+    return mechanic_icepool(params, die, explode_limit=0)
+
+
+@memo(max_size=_EXPLOSIONS_CACHE_SIZE)
 def _explosions_by_outcome_icepool(
     die: H, explode_limit: LimitT
 ) -> dict[int, icepool.Die]:
@@ -139,3 +149,81 @@ def _explosions_by_outcome_icepool(
         outcome: icepool.Die(h)
         for outcome, h in _explosions_by_outcome(die, explode_limit).items()
     }
+
+
+class TestMechanicIcepool(unittest.TestCase):
+    def test_dyce_exploded(self):
+        for die in (H(2), H(6)):
+            for explode_limit in (0, 1, 2, Fraction(1, 100)):
+                for notation in (
+                    "1s0b@1",
+                    "4s1b@5",
+                    "4s1b@3+@1",
+                    "1s2b@1>1+@3",
+                    "1s2b@3<2",
+                    "2s3b@5+@5",
+                    "3s0b@3<1",
+                    "1s1b@2>4",
+                ):
+                    (params,) = Params.parse_from_notation(notation)
+                    self.assertEqual(
+                        mechanic_dyce_exploded(params, die, explode_limit),
+                        mechanic_icepool(params, die, explode_limit),
+                        msg=f"die = {die!r}; explode_limit = {explode_limit}; notation = {notation!r}",
+                    )
+
+    def test_baseline_exploded(self):
+        # Computed with the original (whole sorted roll) IcepoolMechanic
+        for die, explode_limit, notation, expected in (
+            (H(2), 1, "1s1b@2", {2: 8, 3: 6, 4: 7, 5: 7, 6: 2, 7: 1, 8: 1}),
+            (H(2), 1, "2s1b@3+@1", {3: 16, 4: 18, 5: 3, 6: 17, 7: 8, 9: 1, 10: 1}),
+            (H(2), 1, "1s2b@1>1", {1: 20, 2: 44, 3: 37, 4: 5, 5: 11, 6: 11}),
+            (
+                H(2),
+                2,
+                "2s1b@2<1+@3",
+                {2: 40, 3: 24, 4: 84, 5: 59, 6: 14, 7: 19, 9: 8, 10: 8},
+            ),
+            (
+                H(4),
+                1,
+                "1s1b@2",
+                dict(
+                    zip(
+                        range(2, 17),
+                        (96, 148, 253, 135, 132, 100, 80, 30, 22, 15, 6, 3, 2, 1, 1),
+                    )
+                ),
+            ),
+        ):
+            (params,) = Params.parse_from_notation(notation)
+            msg = f"die = {die!r}; explode_limit = {explode_limit}; notation = {notation!r}"
+
+            for implementation in (mechanic_icepool, mechanic_dyce_exploded):
+                self.assertEqual(
+                    implementation(params, die, explode_limit),
+                    H(expected),
+                    msg=f"{implementation.__name__}: {msg}",
+                )
+
+    def test_dyce_base(self):
+        for die in (H(4), H({-1: 1, 0: 2, 3: 1}), H(6) * 2):
+            for notation in (
+                "1s0b@1",
+                "1s1b@1",
+                "1s1b@2",
+                "2s2b@4+@1+@1",
+                "2s1b@3<2+@2",
+                "1s2b@1>3+@3",
+                "3s1b@2>1+@4",
+            ):
+                (params,) = Params.parse_from_notation(notation)
+                self.assertEqual(
+                    mechanic_icepool(params, die),
+                    mechanic_dyce_base(params, die),
+                    msg=f"die = {die!r}; notation = {notation!r}",
+                )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,32 @@
+from typing import Callable
+
+from dyce import H
+from dyce.evaluation import LimitT
+
+# Local imports
+from dyce_impl import (
+    mechanic_dyce_exploded,
+    mechanic_dyce_fudged,
+    mechanic_dyce_numpy_fudged,
+    mechanic_dyce_order_stats_fudged,
+)
+from icepool_impl import mechanic_icepool, mechanic_icepool_fudged
+from monte_carlo import mechanic_monte_carlo
+from params import Params
+
+__all__ = ()
+
+_MechanicImplementationT = Callable[[Params, H, LimitT], H]
+
+# Every implementation of the mechanic by name (e.g., for choosing between them in
+# showit or comparing them in benchmark), kept apart from either so that neither has to
+# import the other's dependencies
+IMPLEMENTATION_MAP: dict[str, _MechanicImplementationT] = {
+    "dyce (explosions fudged within limit)": mechanic_dyce_fudged,
+    "dyce order statistics (explosions fudged within limit)": mechanic_dyce_order_stats_fudged,
+    "dyce + numpy (explosions fudged within limit)": mechanic_dyce_numpy_fudged,
+    "dyce order statistics (explosions accurately limited)": mechanic_dyce_exploded,
+    "icepool (explosions fudged within limit)": mechanic_icepool_fudged,
+    "icepool (explosions accurately limited)": mechanic_icepool,
+    "numpy Monte Carlo (explosions accurately limited; approximate)": mechanic_monte_carlo,
+}
@@ -0,0 +1,352 @@
+import sys
+import threading
+import unittest
+import weakref
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import wraps
+from hashlib import blake2b
+from typing import Any, Callable, Iterable, TextIO, TypeVar
+
+import numpy as np
+from dyce import H, P
+
+__all__ = ()
+
+_T = TypeVar("_T")
+
+_DEFAULT_MAX_SIZE = 256
+_FINGERPRINT_CACHE_SIZE = 1024
+
+# id(obj) -> (obj, fingerprint); holding obj keeps its id from being reused while cached
+_FINGERPRINT_CACHE: OrderedDict[int, tuple[Any, tuple[str, bytes]]] = OrderedDict()
+_FINGERPRINT_LOCK = threading.Lock()
+
+# Every memoized function (including those defined within other functions, which drop
+# out once they are garbage collected)
+_MEMOS: "weakref.WeakSet[Callable]" = weakref.WeakSet()
+
+# qualified name -> combined hits, misses and evictions of garbage collected functions
+_RETIRED_STATS: dict[str, "MemoStats"] = {}
+_RETIRED_STATS_LOCK = threading.Lock()
+
+
+@dataclass(frozen=True)
+class MemoStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    entries: int = 0
+    size: int = 0  # in units of sizeof (bytes, if max_bytes was provided)
+
+    def __add__(self, other: "MemoStats") -> "MemoStats":
+        return MemoStats(
+            hits=self.hits + other.hits,
+            misses=self.misses + other.misses,
+            evictions=self.evictions + other.evictions,
+            entries=self.entries + other.entries,
+            size=self.size + other.size,
+        )
+
+    def __str__(self) -> str:
+        return f"hits: {self.hits}; misses: {self.misses}; evictions: {self.evictions}; entries: {self.entries}; size: {self.size}"
+
+
+def memo(
+    func: Callable[..., _T] | None = None,
+    *,
+    max_size: int | None = _DEFAULT_MAX_SIZE,
+    max_bytes: int | None = None,
+    sizeof: Callable[[Any], int] | None = None,
+):
+    r"""
+    Bounded replacement for ``#!python functools.cache``. Results are kept for up to
+    *max_size* distinct arguments or, if *max_bytes* is provided, until their
+    cumulative size (as estimated by *sizeof*, which defaults to ``#!python
+    sizeof_value``) exceeds *max_bytes*, after which the least recently used are
+    evicted (but never the one just computed). A *max_size* of ``#!python None`` is
+    unbounded, which is only appropriate for functions defined within other functions.
+    ``#!python H`` and ``#!python P`` arguments are keyed by ``#!python fingerprint``
+    rather than hashed and compared on each call (so equal histograms whose counts
+    differ in scale share results, see ``#!python fingerprint``). The decorated
+    function has ``#!python cache_info`` and ``#!python cache_clear`` methods (like
+    those from ``#!python functools``). See also ``#!python memo_stats``, ``#!python clear_memos`` and
+    ``#!python dump_memo_stats``.
+    """
+    if max_bytes is not None:
+        bound, measure = max_bytes, sizeof or sizeof_value
+    else:
+        bound, measure = max_size, lambda _: 1
+
+    def _decorator(f: Callable[..., _T]) -> Callable[..., _T]:
+        entries: OrderedDict[Any, tuple[_T, int]] = OrderedDict()
+        lock = threading.RLock()
+        hits = misses = evictions = size = 0
+
+        @wraps(f)
+        def _memoized(*args, **kw) -> _T:
+            nonlocal hits, misses, evictions, size
+            key = _make_key(args, kw)
+
+            with lock:
+                try:
+                    value, _ = entries[key]
+                except KeyError:
+                    misses += 1
+                else:
+                    hits += 1
+                    entries.move_to_end(key)
+
+                    return value
+
+            # Computed outside the lock, since f may recurse (or take a while)
+            value = f(*args, **kw)
+            value_size = measure(value)
+
+            with lock:
+                if key in entries:
+                    # Computed concurrently (or recursively) by someone else
+                    size -= entries[key][1]
+
+                entries[key] = value, value_size
+                entries.move_to_end(key)
+                size += value_size
+
+                while bound is not None and size > bound and len(entries) > 1:
+                    _, (_, evicted_size) = entries.popitem(last=False)
+                    size -= evicted_size
+                    evictions += 1
+
+            return value
+
+        def cache_info() -> MemoStats:
+            with lock:
+                return MemoStats(hits, misses, evictions, len(entries), size)
+
+        def cache_clear() -> None:
+            nonlocal hits, misses, evictions, size
+
+            with lock:
+                entries.clear()
+                hits = misses = evictions = size = 0
+
+        _memoized.cache_info = cache_info  # type: ignore
+        _memoized.cache_clear = cache_clear  # type: ignore
+        _MEMOS.add(_memoized)
+        weakref.finalize(_memoized, _retire, _memo_name(_memoized), cache_info)
+
+        return _memoized
+
+    return _decorator if func is None else _decorator(func)
+
+
+def memo_stats() -> dict[str, MemoStats]:
+    r"""
+    Returns the current statistics of every memoized function by qualified name.
+    Statistics are combined for functions defined within other functions (including
+    the hits, misses and evictions of those that have since been garbage collected).
+    """
+    with _RETIRED_STATS_LOCK:
+        stats = dict(_RETIRED_STATS)
+
+    for memoized in list(_MEMOS):
+        name = _memo_name(memoized)
+        stats[name] = stats.get(name, MemoStats()) + memoized.cache_info()  # type: ignore
+
+    return dict(sorted(stats.items()))
+
+
+def clear_memos(names: Iterable[str] | None = None) -> None:
+    r"""
+    Clears every memoized function (or only those whose qualified names are in
+    *names*), including their statistics.
+    """
+    names = None if names is None else set(names)
+
+    with _RETIRED_STATS_LOCK:
+        for name in list(_RETIRED_STATS):
+            if names is None or name in names:
+                del _RETIRED_STATS[name]
+
+    for memoized in list(_MEMOS):
+        if names is None or _memo_name(memoized) in names:
+            memoized.cache_clear()  # type: ignore
+
+
+def dump_memo_stats(file: TextIO | None = None) -> None:
+    for name, stats in memo_stats().items():
+        print(f"{name}: {stats}", file=sys.stdout if file is None else file)
+
+
+def fingerprint(obj: H | P) -> tuple[str, bytes]:
+    r"""
+    Returns a compact digest of *obj*'s structure that is equal for equal histograms
+    (i.e., in lowest terms) or pools. Fingerprints of recently seen objects are cached,
+    so passing the same object repeatedly doesn't re-examine it.
+
+    Because ``#!python H({1: 1, 2: 1})`` and ``#!python H({1: 2, 2: 2})`` have the
+    same fingerprint, it is only a safe key for results that depend on probabilities
+    alone. Functions whose results depend on the scale of counts (e.g., a table of
+    counts, or anything whose integer dtype is chosen from ``#!python H.total``) should
+    reduce such arguments with ``#!python H.lowest_terms`` before keying on them (as
+    ``#!python dyce_impl.encoded_pool_table`` does).
+    """
+    with _FINGERPRINT_LOCK:
+        try:
+            cached_obj, cached_fingerprint = _FINGERPRINT_CACHE[id(obj)]
+        except KeyError:
+            pass
+        else:
+            if cached_obj is obj:
+                _FINGERPRINT_CACHE.move_to_end(id(obj))
+
+                return cached_fingerprint
+
+    if isinstance(obj, H):
+        structure = repr(tuple(obj.lowest_terms().items()))
+    elif isinstance(obj, P):
+        structure = repr(tuple(fingerprint(h) for h in obj))
+    else:
+        raise TypeError(f"cannot fingerprint {obj!r}")
+
+    obj_fingerprint = (
+        type(obj).__name__,
+        blake2b(structure.encode("utf-8"), digest_size=16).digest(),
+    )
+
+    with _FINGERPRINT_LOCK:
+        _FINGERPRINT_CACHE[id(obj)] = obj, obj_fingerprint
+        _FINGERPRINT_CACHE.move_to_end(id(obj))
+
+        while len(_FINGERPRINT_CACHE) > _FINGERPRINT_CACHE_SIZE:
+            _FINGERPRINT_CACHE.popitem(last=False)
+
+    return obj_fingerprint
+
+
+def sizeof_value(value: Any) -> int:
+    r"""
+    Returns a rough estimate of the number of bytes used by *value* (including, for
+    histograms, arrays and containers, their contents).
+    """
+    if isinstance(value, np.ndarray):
+        return value.nbytes + sys.getsizeof(value)
+    elif isinstance(value, H):
+        return sys.getsizeof(value) + sizeof_value(dict(value.items()))
+    elif isinstance(value, P):
+        return sys.getsizeof(value) + sum(sizeof_value(h) for h in value)
+    elif isinstance(value, dict):
+        return sys.getsizeof(value) + sum(
+            sizeof_value(k) + sizeof_value(v) for k, v in value.items()
+        )
+    elif isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(sizeof_value(item) for item in value)
+    else:
+        return sys.getsizeof(value)
+
+
+def _make_key(args: tuple, kw: dict) -> tuple:
+    key = tuple(_key_part(arg) for arg in args)
+
+    if kw:
+        key += (_KW_MARK,) + tuple(
+            (name, _key_part(arg)) for name, arg in sorted(kw.items())
+        )
+
+    return key
+
+
+def _key_part(arg: Any) -> Any:
+    return fingerprint(arg) if isinstance(arg, (H, P)) else arg
+
+
+def _memo_name(memoized: Callable) -> str:
+    return f"{memoized.__module__}.{memoized.__qualname__}"
+
+
+def _retire(name: str, cache_info: Callable[[], MemoStats]) -> None:
+    stats = cache_info()
+
+    with _RETIRED_STATS_LOCK:
+        _RETIRED_STATS[name] = _RETIRED_STATS.get(name, MemoStats()) + MemoStats(
+            stats.hits, stats.misses, stats.evictions
+        )
+
+
+_KW_MARK = object()
+
+
+class TestMemo(unittest.TestCase):
+    def test_hits_and_misses(self):
+        calls = []
+
+        @memo(max_size=2)
+        def _f(n: int, h: H) -> H:
+            calls.append(n)
+
+            return h + n
+
+        self.assertEqual(_f(1, H(6)), H(6) + 1)
+        self.assertEqual(_f(1, H(6)), H(6) + 1)  # equal, but not the same object
+        self.assertEqual(_f(1, h=H(6)), H(6) + 1)  # keywords are keyed separately
+        self.assertEqual(_f(2, H(6)), H(6) + 2)
+        self.assertEqual(_f(1, H(6)), H(6) + 1)  # evicted
+        self.assertEqual(calls, [1, 1, 2, 1])
+        self.assertEqual(
+            _f.cache_info(), MemoStats(hits=1, misses=4, evictions=2, entries=2, size=2)
+        )
+        _f.cache_clear()
+        self.assertEqual(_f.cache_info(), MemoStats())
+
+    def test_max_bytes(self):
+        @memo(max_bytes=1_000, sizeof=len)
+        def _f(n: int) -> str:
+            return "x" * n
+
+        _f(600)
+        _f(300)
+        self.assertEqual(_f.cache_info().entries, 2)
+        _f(200)
+        self.assertEqual(_f.cache_info(), MemoStats(0, 3, 1, 2, 500))
+        _f(2_000)  # never evicts what was just computed
+        self.assertEqual(_f.cache_info(), MemoStats(0, 4, 3, 1, 2_000))
+
+    def test_recursion(self):
+        @memo(max_size=None)
+        def _fib(n: int) -> int:
+            return n if n < 2 else _fib(n - 1) + _fib(n - 2)
+
+        self.assertEqual(_fib(80), 23416728348467685)
+        self.assertEqual(_fib.cache_info().misses, 81)
+
+    def test_fingerprint(self):
+        self.assertEqual(fingerprint(H(6)), fingerprint(H(6)))
+        self.assertEqual(fingerprint(H(2)), fingerprint(H({1: 2, 2: 2})))
+        self.assertNotEqual(fingerprint(H(6)), fingerprint(H(6) + 1))
+        self.assertEqual(fingerprint(2 @ P(6)), fingerprint(P(H(6), H(6))))
+        self.assertNotEqual(fingerprint(P(6)), fingerprint(H(6)))
+        h = H(20)
+        self.assertIs(fingerprint(h), fingerprint(h))
+
+        with self.assertRaises(TypeError):
+            fingerprint(6)  # type: ignore
+
+    def test_stats(self):
+        def _outer(n: int) -> int:
+            @memo
+            def _inner(m: int) -> int:
+                return m
+
+            return _inner(n) + _inner(n)
+
+        _outer(1)
+        _outer(2)
+        name = f"{__name__}.{_outer.__qualname__}.<locals>._inner"
+        self.assertEqual(memo_stats()[name].hits, 2)
+        self.assertEqual(memo_stats()[name].misses, 2)
+        clear_memos([name])
+        self.assertNotIn(name, memo_stats())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,220 @@
+import math
+import unittest
+from dataclasses import dataclass
+from fractions import Fraction
+from statistics import NormalDist
+from time import perf_counter
+
+import numpy as np
+from dyce import H
+from dyce.evaluation import LimitT
+
+# Local imports
+from dyce_impl import (
+    _EXPLOSIONS_CACHE_SIZE,
+    _explosions_by_outcome,
+    _mechanic_on_rolls,
+    mechanic_dyce_exploded,
+)
+from memo import memo
+from params import Params
+
+__all__ = ()
+
+_DEFAULT_SAMPLES = 1_000_000
+_DEFAULT_SEED = 0
+_BATCH_SIZE = 100_000
+
+
+@dataclass(frozen=True)
+class MonteCarloEstimate:
+    h: H  # counts of each sampled total
+    samples: int
+    mean: float
+    # (lower, upper) bounds of the confidence interval for the mean
+    mean_interval: tuple[float, float]
+    # outcome -> (lower, upper) bounds of the confidence interval for its probability
+    probability_intervals: dict[int, tuple[float, float]]
+    confidence: float
+
+
+def mechanic_monte_carlo(
+    params: Params,
+    die: H,
+    explode_limit: LimitT = 0,
+) -> H:
+    r"""
+    This has the same interface as ``#!python mechanic_dyce``, but returns the
+    (approximate) histogram from ``#!python estimate_mechanic`` with its default sample
+    budget and seed (so results are reproducible).
+    """
+    return estimate_mechanic(params, die, explode_limit).h
+
+
+def estimate_mechanic(
+    params: Params,
+    die: H,
+    explode_limit: LimitT = 0,
+    samples: int | None = _DEFAULT_SAMPLES,
+    seconds: float | None = None,
+    seed: int | None = _DEFAULT_SEED,
+    confidence: float = 0.95,
+    batch_size: int = _BATCH_SIZE,
+) -> MonteCarloEstimate:
+    r"""
+    Estimates the mechanic's distribution by rolling batches of pools with NumPy and
+    applying the same logic as ``#!python mechanic_dyce_numpy`` to each roll. Explosions
+    are accurately limited (i.e., each check outcome's exploded distribution is
+    sampled, as with ``#!python mechanic_dyce_exploded``). Sampling stops after
+    *samples* rolls or *seconds* seconds, whichever comes first (at least one must be
+    provided, and at least one batch is always rolled). Results are reproducible for a
+    given *seed* and sample budget (but not for time budgets).
+    """
+    if samples is None and seconds is None:
+        raise ValueError("must provide a sample budget, a time budget or both")
+
+    pool_size = params.num_std + params.num_bmp
+    num_std = params.num_std + min(params.extra_std, pool_size)
+    num_bmp = params.num_bmp + min(params.extra_bmp, pool_size)
+
+    if params.extra_std:
+        extra_bonus = -2 * max(params.extra_std - pool_size, 0)
+        roll_slice = slice(None, pool_size)
+    elif params.extra_bmp:
+        extra_bonus = 2 * max(params.extra_bmp - pool_size, 0)
+        roll_slice = slice(-pool_size, None)
+    else:
+        extra_bonus = 0
+        roll_slice = slice(None, pool_size)
+
+    rng = np.random.default_rng(seed)
+    faces, face_cdf = _sampler(die)
+    explosion_samplers = _explosion_samplers(die, explode_limit)
+    bonus_dice = list(params.bonus_dice)
+    batches = []
+    sampled = 0
+    start = perf_counter()
+
+    while (samples is None or sampled < samples) and (
+        seconds is None or not batches or perf_counter() - start < seconds
+    ):
+        size = batch_size if samples is None else min(batch_size, samples - sampled)
+        std_rolls = faces[np.searchsorted(face_cdf, rng.random((size, num_std)))]
+        bmp_rolls = faces[np.searchsorted(face_cdf, rng.random((size, num_bmp)))]
+        rolls = np.concatenate((std_rolls << 1, bmp_rolls << 1 | 0x1), axis=1)
+        rolls.sort(axis=1)
+        totals, check_outcomes = _mechanic_on_rolls(
+            rolls[:, roll_slice], params.set_die, bonus_dice
+        )
+
+        for check_outcome, (outcomes, cdf) in explosion_samplers.items():
+            exploding = check_outcomes == check_outcome
+            totals[exploding] += outcomes[
+                np.searchsorted(cdf, rng.random(np.count_nonzero(exploding)))
+            ]
+
+        batches.append(totals)
+        sampled += size
+
+    unique_totals, counts = np.unique(
+        np.concatenate(batches) + extra_bonus, return_counts=True
+    )
+    h = H(zip(unique_totals.tolist(), counts.tolist()))
+    z = NormalDist().inv_cdf((1 + confidence) / 2)
+    mean = h.mean()
+    mean_margin = z * h.stdev() / math.sqrt(sampled)
+
+    return MonteCarloEstimate(
+        h=h,
+        samples=sampled,
+        mean=mean,
+        mean_interval=(mean - mean_margin, mean + mean_margin),
+        probability_intervals={
+            outcome: _wilson_interval(count, sampled, z) for outcome, count in h.items()
+        },
+        confidence=confidence,
+    )
+
+
+def _sampler(h: H) -> tuple[np.ndarray, np.ndarray]:
+    r"""
+    Returns *h*'s outcomes and their cumulative probabilities for inverse transform
+    sampling (i.e., ``#!python outcomes[np.searchsorted(cdf, uniform)]``).
+    """
+    total = h.total
+    cdf = np.cumsum([count / total for count in h.values()])
+    # Guard against rounding so that every uniform sample lands on an outcome
+    cdf[-1] = 1.0
+
+    return np.array(list(h), dtype=np.int64), cdf
+
+
+@memo(max_size=_EXPLOSIONS_CACHE_SIZE)
+def _explosion_samplers(
+    die: H, explode_limit: LimitT
+) -> dict[int, tuple[np.ndarray, np.ndarray]]:
+    return {
+        outcome: _sampler(exploded)
+        for outcome, exploded in _explosions_by_outcome(die, explode_limit).items()
+    }
+
+
+def _wilson_interval(successes: int, trials: int, z: float) -> tuple[float, float]:
+    p = successes / trials
+    denominator = 1 + z**2 / trials
+    center = (p + z**2 / (2 * trials)) / denominator
+    margin = z * math.sqrt(p * (1 - p) / trials + z**2 / (4 * trials**2)) / denominator
+
+    return max(center - margin, 0.0), min(center + margin, 1.0)
+
+
+class TestMonteCarlo(unittest.TestCase):
+    def test_estimate(self):
+        for die, explode_limit, notation in (
+            (H(6), 0, "2s1b@2+@1"),
+            (H(6), Fraction(1, 100), "3s2b@5"),
+            (H({-1: 1, 0: 2, 3: 1}), 2, "1s2b@1>1+@3"),
+            (H(10), 1, "2s2b@2<1"),
+        ):
+            (params,) = Params.parse_from_notation(notation)
+            exact = mechanic_dyce_exploded(params, die, explode_limit)
+            estimate = estimate_mechanic(
+                params, die, explode_limit, samples=200_000, confidence=0.9999
+            )
+            msg = f"die = {die!r}; explode_limit = {explode_limit}; notation = {notation!r}"
+            self.assertEqual(estimate.samples, 200_000, msg=msg)
+            self.assertEqual(estimate.h.total, 200_000, msg=msg)
+            self.assertLessEqual(set(estimate.h), set(exact), msg=msg)
+            lower, upper = estimate.mean_interval
+            self.assertLess(lower, exact.mean(), msg=msg)
+            self.assertGreater(upper, exact.mean(), msg=msg)
+
+            for outcome, (lower, upper) in estimate.probability_intervals.items():
+                probability = exact[outcome] / exact.total
+                self.assertLessEqual(lower, probability, msg=f"{msg}; {outcome}")
+                self.assertGreaterEqual(upper, probability, msg=f"{msg}; {outcome}")
+
+    def test_seed(self):
+        (params,) = Params.parse_from_notation("3s2b@3+@1")
+        self.assertEqual(
+            estimate_mechanic(params, H(20), 1, samples=1_000, seed=42).h,
+            estimate_mechanic(params, H(20), 1, samples=1_000, seed=42).h,
+        )
+        self.assertNotEqual(
+            estimate_mechanic(params, H(20), 1, samples=1_000, seed=42).h,
+            estimate_mechanic(params, H(20), 1, samples=1_000, seed=43).h,
+        )
+
+    def test_time_budget(self):
+        (params,) = Params.parse_from_notation("10s2b@6+@1")
+        estimate = estimate_mechanic(
+            params, H(20), Fraction(1, 10_000), samples=None, seconds=0.0, batch_size=10
+        )
+        self.assertEqual(estimate.samples, 10)
+
+        with self.assertRaises(ValueError):
+            estimate_mechanic(params, H(20), samples=None, seconds=None)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,15 +1,19 @@
 import re
-import traceback
 import unittest
-from dataclasses import dataclass
-from typing import ClassVar, Iterator, Optional
+from dataclasses import dataclass, replace
+from typing import ClassVar, Iterator, Optional, Union
 
 from dyce import H
 
+# Local imports
+from memo import memo
+
 __all__ = ()
 
+_NOTATION_CACHE_SIZE = 1024
+
 
-@dataclass
+@dataclass(frozen=True)
 class Params:
     num_std: int
     num_bmp: int
@@ -48,60 +52,52 @@ class Params:
         cls,
         s: str,
         override_die_map: dict[str, H] | None = None,
+        errors: list["NotationError"] | None = None,
     ) -> Iterator[Optional["Params"]]:
-        for line in s.split("\n"):
-            line = line.strip()
+        r"""
+        Yields a ``#!python Params`` object (or ``#!python None`` for ``<null>`` spacers)
+        for each non-empty line in *s*. Lines that cannot be parsed are skipped. If
+        *errors* is provided, a ``#!python NotationError`` is appended to it for each of
+        them.
+        """
+        parser = NotationParser(override_die_map)
+        yield from parser.parse(s)
 
-            if not line:
-                continue
+        if errors is not None:
+            errors.extend(parser.errors)
 
-            m = cls.NOTATION_RE.match(line)
+    @classmethod
+    def parse_line(
+        cls,
+        line: str,
+        override_die_map: dict[str, H] | None = None,
+    ) -> Optional["Params"]:
+        r"""
+        Parses a single (stripped, non-empty) notation *line*. Raises ``#!python
+        ValueError`` if *line* cannot be parsed. Lines are matched once per distinct
+        normalized line (up to ``#!python _NOTATION_CACHE_SIZE``, least recently used
+        first) across all calls, with override dice resolved from *override_die_map*
+        each time.
+        """
+        parsed = _parse_normalized_line(_normalized_line(line))
 
-            if not m:
-                continue
+        if isinstance(parsed, str):
+            raise ValueError(parsed)
 
-            if m.group("null"):
-                yield None
-                continue
+        if parsed is None or parsed.override_die_str is None:
+            return parsed
 
-            try:
-                set_str, std_str, bmp_str, bonuses_str = m.group(
-                    "set", "std", "bmp", "bonuses"
-                )
-                num_std = int(std_str)
-                num_bmp = int(bmp_str)
-                set_die = int(set_str) - 1  # translate to zero-indexed
-                bonus_dice = tuple(
-                    int(bonus_str) - 1  # translate to zero-indexed
-                    for bonus_str in cls.BONUS_RE.findall(bonuses_str)
-                )
-                ex_std = int(m.group("ex_std")) if m.group("ex_std") else 0
-                ex_bmp = int(m.group("ex_bmp")) if m.group("ex_bmp") else 0
-                comment = m.group("comment").strip() if m.group("comment") else ""
-                override_str = (
-                    m.group("override").strip() if m.group("override") else ""
-                )
+        override_str = parsed.override_die_str
 
-                assert (
-                    override_die_map or not override_str
-                ), f"must provide override die map if overriding dice ({override_str})"
-
-                params = Params(
-                    num_std,
-                    num_bmp,
-                    set_die,
-                    ex_std,
-                    ex_bmp,
-                    bonus_dice,
-                    comment,
-                    override_die_map[override_str] if override_str else None,  # type: ignore
-                    override_str or None,
-                )
-            except (AssertionError, KeyError, TypeError, ValueError):
-                traceback.print_exc()
-                continue
-            else:
-                yield params
+        if not override_die_map:
+            raise ValueError(
+                f"must provide override die map if overriding dice ({override_str})"
+            )
+
+        if override_str not in override_die_map:
+            raise ValueError(f"unrecognized override die ({override_str})")
+
+        return replace(parsed, override_die=override_die_map[override_str])
 
     def __str__(self) -> str:
         override_die = f"[{self.override_die_str}]" if self.override_die_str else ""
@@ -112,6 +108,20 @@ class Params:
 
         return f"{override_die}{self.num_std}s{self.num_bmp}b@{self.set_die + 1}{extra_std or extra_bmp}{bonuses}{comment}"
 
+    def normalized(self) -> "Params":
+        r"""
+        Returns a copy without anything that does not affect the mechanic's result (i.e.,
+        the comment and the override die, which callers resolve and pass separately),
+        and with bonus dice in a canonical order.
+        """
+        return replace(
+            self,
+            bonus_dice=tuple(sorted(self.bonus_dice)),
+            comment="",
+            override_die=None,
+            override_die_str=None,
+        )
+
     def __post_init__(self) -> None:
         pool_size = self.num_std + self.num_bmp
 
@@ -131,17 +141,18 @@ class Params:
             )
 
         # Normalize relative differences in extra_std and extra_bmp so that one is zero
-        # and the other is greater-than-or-equal-to zero
+        # and the other is greater-than-or-equal-to zero (frozen, so we have to bypass
+        # __setattr__)
         extra_lowest = min(self.extra_std, self.extra_bmp)
-        self.extra_std -= extra_lowest
-        self.extra_bmp -= extra_lowest
+        object.__setattr__(self, "extra_std", self.extra_std - extra_lowest)
+        object.__setattr__(self, "extra_bmp", self.extra_bmp - extra_lowest)
         assert (
             self.extra_std >= 0
             and self.extra_bmp >= 0
             and 0 in (self.extra_std, self.extra_bmp)
         ), f"normalization failed ({self.extra_std}, {self.extra_bmp})"
 
-        self.bonus_dice = tuple(self.bonus_dice)
+        object.__setattr__(self, "bonus_dice", tuple(self.bonus_dice))
 
         if not all(0 <= bonus_die < pool_size for bonus_die in self.bonus_dice):
             raise ValueError(
@@ -149,6 +160,125 @@ class Params:
             )
 
 
+@dataclass(frozen=True)
+class NotationError:
+    line_no: int  # one-indexed
+    line: str
+    message: str
+
+    def __str__(self) -> str:
+        return f"line {self.line_no}: {self.message} ({self.line!r})"
+
+
+# Either a parsed line or a message describing why it could not be parsed
+_ParsedLineT = Union[Params, None, str]
+
+
+# Whitespace outside of override dice and comments is only ever optional, so runs of it
+# can be collapsed without changing how a line is parsed
+_NORMALIZE_RE = re.compile(r"\[[^]]*\]|#.*|\s+")
+
+
+def _normalized_line(line: str) -> str:
+    return _NORMALIZE_RE.sub(
+        lambda m: " " if m.group().isspace() else m.group(), line.strip()
+    )
+
+
+@memo(max_size=_NOTATION_CACHE_SIZE)
+def _parse_normalized_line(line: str) -> _ParsedLineT:
+    r"""
+    Returns the ``#!python Params`` (or ``#!python None`` for a ``<null>`` spacer) for
+    *line* without resolving its override die, or a message describing why it could
+    not be parsed.
+    """
+    m = Params.NOTATION_RE.match(line)
+
+    if not m:
+        return "unrecognized notation"
+
+    if m.group("null"):
+        return None
+
+    set_str, std_str, bmp_str, bonuses_str = m.group("set", "std", "bmp", "bonuses")
+    num_std = int(std_str)
+    num_bmp = int(bmp_str)
+    set_die = int(set_str) - 1  # translate to zero-indexed
+    bonus_dice = tuple(
+        int(bonus_str) - 1  # translate to zero-indexed
+        for bonus_str in Params.BONUS_RE.findall(bonuses_str)
+    )
+    ex_std = int(m.group("ex_std")) if m.group("ex_std") else 0
+    ex_bmp = int(m.group("ex_bmp")) if m.group("ex_bmp") else 0
+    comment = m.group("comment").strip() if m.group("comment") else ""
+    override_str = m.group("override").strip() if m.group("override") else ""
+
+    try:
+        return Params(
+            num_std,
+            num_bmp,
+            set_die,
+            ex_std,
+            ex_bmp,
+            bonus_dice,
+            comment,
+            None,
+            override_str or None,
+        )
+    except ValueError as exc:
+        return str(exc)
+
+
+class NotationParser:
+    r"""
+    Parses notations (see ``#!python Params.parse_from_notation``), remembering each
+    distinct (stripped) line from the most recent call to ``#!python parse``. When the
+    notation text is edited and parsed again, only new or changed lines are matched
+    against ``#!python Params.NOTATION_RE``, so each call is linear in the number of
+    lines. Errors from the most recent call are available as ``#!python errors``.
+    """
+
+    def __init__(self, override_die_map: dict[str, H] | None = None):
+        self.override_die_map = override_die_map
+        self.errors: list[NotationError] = []
+        self._parsed_lines: dict[str, _ParsedLineT] = {}
+
+    def parse(self, s: str) -> list[Params | None]:
+        all_params: list[Params | None] = []
+        errors: list[NotationError] = []
+        parsed_lines: dict[str, _ParsedLineT] = {}
+
+        for line_no, line in enumerate(s.split("\n"), start=1):
+            line = line.strip()
+
+            if not line:
+                continue
+
+            try:
+                parsed = parsed_lines[line]
+            except KeyError:
+                try:
+                    parsed = self._parsed_lines[line]
+                except KeyError:
+                    try:
+                        parsed = Params.parse_line(line, self.override_die_map)
+                    except ValueError as exc:
+                        parsed = str(exc)
+
+                parsed_lines[line] = parsed
+
+            if isinstance(parsed, str):
+                errors.append(NotationError(line_no, line, parsed))
+            else:
+                all_params.append(parsed)
+
+        self.errors = errors
+        # Only keep lines from this call so that memory is bounded by the current text
+        self._parsed_lines = parsed_lines
+
+        return all_params
+
+
 class TestParams(unittest.TestCase):
     def test_bad_bonus_die(self):
         good_bonus_dice = tuple(range(3))
@@ -196,11 +326,21 @@ class TestParams(unittest.TestCase):
             "1s 0b @1 +@0",  # bad bonus
             "[d8] 1s 0b @1 +@0",  # missing override
         ):
+            errors: list[NotationError] = []
             self.assertEqual(
-                len(tuple(Params.parse_from_notation(notation, override_die_map))),
+                len(
+                    tuple(
+                        Params.parse_from_notation(notation, override_die_map, errors)
+                    )
+                ),
                 0,
                 msg=f"notation = {notation!r}",
             )
+            self.assertEqual(len(errors), 1, msg=f"notation = {notation!r}")
+            self.assertEqual(errors[0].line_no, 1, msg=f"notation = {notation!r}")
+            self.assertEqual(
+                errors[0].line, notation.strip(), msg=f"notation = {notation!r}"
+            )
 
     def test_bad_num_bmp(self):
         with self.assertRaisesRegex(
@@ -453,6 +593,91 @@ class TestParams(unittest.TestCase):
                     msg=f"notation = {notation!r}",
                 )
 
+    def test_frozen(self):
+        (params,) = Params.parse_from_notation("[d10] 1s 2b @2 >2", {"d10": H(10)})
+        (same_params,) = Params.parse_from_notation("[d10]1s2b@2>2", {"d10": H(10)})
+        self.assertEqual(params, same_params)
+        self.assertEqual(len({params, same_params}), 1)
+
+        with self.assertRaises(AttributeError):
+            params.set_die = 0  # type: ignore
+
+    def test_parser(self):
+        parser = NotationParser({"d10": H(10)})
+        notations = "1s0b@1\n\n  nonsense\n<null>\n[d8]1s0b@1\n1s 0b @1\n1s0b@1"
+        all_params = parser.parse(notations)
+        self.assertEqual(
+            [str(params) if params else params for params in all_params],
+            ["1s0b@1", None, "1s0b@1", "1s0b@1"],
+        )
+        self.assertEqual(
+            [(error.line_no, error.line, error.message) for error in parser.errors],
+            [
+                (3, "nonsense", "unrecognized notation"),
+                (5, "[d8]1s0b@1", "unrecognized override die (d8)"),
+            ],
+        )
+        self.assertEqual(
+            str(parser.errors[0]), "line 3: unrecognized notation ('nonsense')"
+        )
+
+        calls: list[str] = []
+        parse_line = Params.parse_line
+
+        def _parse_line(line, override_die_map=None):
+            calls.append(line)
+
+            return parse_line(line, override_die_map)
+
+        try:
+            Params.parse_line = _parse_line  # type: ignore
+            # Only new lines are parsed
+            all_params = parser.parse(f"2s1b@3\n{notations}\n2s1b@3")
+            self.assertEqual(calls, ["2s1b@3"])
+            self.assertEqual(len(all_params), 6)
+            self.assertEqual(parser.errors[0].line_no, 4)
+            # Lines that were removed are forgotten
+            parser.parse("1s0b@1")
+            parser.parse(notations)
+            self.assertEqual(
+                calls, ["2s1b@3", "nonsense", "<null>", "[d8]1s0b@1", "1s 0b @1"]
+            )
+        finally:
+            Params.parse_line = parse_line  # type: ignore
+
+    def test_parse_line_shared(self):
+        _parse_normalized_line.cache_clear()
+        (params,) = Params.parse_from_notation("[d10] 1s 2b @2  # a  b", {"d10": H(10)})
+        # Only optional whitespace is collapsed, so these share a parsed line
+        (same_params,) = Params.parse_from_notation(
+            " [d10]  1s  2b\t@2  # a  b ", {"d10": H(10)}
+        )
+        self.assertEqual(same_params, params)
+        self.assertEqual(same_params.comment, "a  b")
+        self.assertEqual(_parse_normalized_line.cache_info().misses, 1)
+        # Override dice are resolved from each call's map
+        (other_params,) = Params.parse_from_notation("[d10]1s 2b @2", {"d10": H(4)})
+        self.assertEqual(other_params.override_die, H(4))
+        self.assertEqual(_parse_normalized_line.cache_info().misses, 2)
+
+        # Whitespace within override dice is kept, and whitespace that can't be
+        # removed is only collapsed
+        for line in ("[d 10]1s0b@1", "[d  10]1s0b@1"):
+            self.assertEqual(_normalized_line(line), line, msg=f"line = {line!r}")
+
+        self.assertEqual(_normalized_line("1  0s0b@1"), "1 0s0b@1")
+
+        with self.assertRaisesRegex(ValueError, r"\Aunrecognized notation\Z"):
+            Params.parse_line("1  0s0b@1")
+
+    def test_normalized(self):
+        override_die_map = {"d10": H(10)}
+        (params,) = Params.parse_from_notation(
+            "[d10] 1s 2b @2 >2 +@3 +@1  # hellooo", override_die_map
+        )
+        self.assertEqual(str(params.normalized()), "1s2b@2>2+@1+@3")
+        self.assertEqual(str(params), "[d10]1s2b@2>2+@3+@1  # hellooo")
+
     def test_notation_null(self):
         notation = "<null>  # spacer"
 
@@ -0,0 +1,325 @@
+import inspect
+import json
+import os
+import sys
+import tempfile
+import threading
+import unittest
+import zlib
+from fractions import Fraction
+from functools import lru_cache
+from hashlib import sha256
+from time import time_ns
+from typing import Callable
+
+from dyce import H
+from dyce.evaluation import LimitT
+
+# Local imports
+from params import Params
+
+try:
+    import sqlite3
+except ImportError:  # e.g., not loaded in some Pyodide environments
+    sqlite3 = None  # type: ignore
+
+__all__ = ()
+
+# Bump this whenever stored results would change (e.g., 2 for closed-form explosion
+# tables, which changed results for nested explosions and per-face precision)
+_SCHEMA_VERSION = 2
+_DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_CACHE_PATH = os.path.join(
+    os.path.expanduser("~"), ".cache", "dyce-notebooks", "bumpity.sqlite3"
+)
+
+
+class ResultCache:
+    r"""
+    Persistent, content-addressed cache of mechanic results keyed on the implementation
+    (including its version, see ``#!python implementation_version``), the normalized
+    *params* (see ``#!python Params.normalized``), the die's outcomes
+    and counts, and the explode limit. Results are stored in an SQLite database as
+    compressed outcome/count pairs. Once the stored results exceed *max_bytes*, the least
+    recently used entries are evicted. If ``#!python sqlite3`` is unavailable, every
+    lookup is a miss.
+    """
+
+    def __init__(
+        self,
+        path: str | None = DEFAULT_CACHE_PATH,
+        max_bytes: int = _DEFAULT_MAX_BYTES,
+    ):
+        self.path = path or ":memory:"
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = None
+
+        if sqlite3 is not None:
+            if self.path != ":memory:":
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS results (
+                    key TEXT PRIMARY KEY,
+                    value BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    last_used INTEGER NOT NULL
+                )
+                """
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used)"
+            )
+            self._conn.commit()
+
+    def __str__(self) -> str:
+        return f"cache hits: {self.hits}; misses: {self.misses}"
+
+    def clear(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM results")
+                self._conn.commit()
+
+            self.hits = 0
+            self.misses = 0
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def get_or_compute(
+        self,
+        implementation: Callable[[Params, H, LimitT], H],
+        params: Params,
+        die: H,
+        explode_limit: LimitT,
+    ) -> H:
+        h = self.lookup(implementation, params, die, explode_limit)
+
+        if h is None:
+            h = implementation(params, die, explode_limit)
+            self.store(implementation, params, die, explode_limit, h)
+
+        return h
+
+    def lookup(
+        self,
+        implementation: Callable[[Params, H, LimitT], H],
+        params: Params,
+        die: H,
+        explode_limit: LimitT,
+    ) -> H | None:
+        return self._get(cache_key(implementation, params, die, explode_limit))
+
+    def store(
+        self,
+        implementation: Callable[[Params, H, LimitT], H],
+        params: Params,
+        die: H,
+        explode_limit: LimitT,
+        h: H,
+    ) -> None:
+        self._put(cache_key(implementation, params, die, explode_limit), h)
+
+    def _get(self, key: str) -> H | None:
+        with self._lock:
+            row = None
+
+            if self._conn is not None:
+                row = self._conn.execute(
+                    "SELECT value FROM results WHERE key = ?", (key,)
+                ).fetchone()
+
+            if row is None:
+                self.misses += 1
+
+                return None
+
+            self.hits += 1
+            self._conn.execute(  # type: ignore
+                "UPDATE results SET last_used = ? WHERE key = ?",
+                (time_ns(), key),
+            )
+            self._conn.commit()  # type: ignore
+
+        return _decode_h(row[0])
+
+    def _put(self, key: str, h: H) -> None:
+        value = _encode_h(h)
+
+        with self._lock:
+            if self._conn is None:
+                return
+
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results (key, value, size, last_used) VALUES (?, ?, ?, ?)",
+                (key, value, len(value), time_ns()),
+            )
+            (total_size,) = self._conn.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM results"
+            ).fetchone()
+
+            # Evict least recently used entries (but never the one we just stored)
+            while total_size > self.max_bytes:
+                row = self._conn.execute(
+                    "SELECT key, size FROM results WHERE key != ? ORDER BY last_used LIMIT 1",
+                    (key,),
+                ).fetchone()
+
+                if row is None:
+                    break
+
+                evicted_key, evicted_size = row
+                self._conn.execute("DELETE FROM results WHERE key = ?", (evicted_key,))
+                total_size -= evicted_size
+
+            self._conn.commit()
+
+
+def cache_key(
+    implementation: Callable[[Params, H, LimitT], H],
+    params: Params,
+    die: H,
+    explode_limit: LimitT,
+) -> str:
+    die_items = ",".join(f"{outcome}:{count}" for outcome, count in sorted(die.items()))
+    implementation_name = f"{implementation.__module__}.{implementation.__qualname__}"
+    key_str = f"{_SCHEMA_VERSION}|{implementation_name}|{implementation_version(implementation)}|{params.normalized()!s}|{die_items}|{explode_limit}"
+
+    return sha256(key_str.encode("utf-8")).hexdigest()
+
+
+def implementation_version(implementation: Callable) -> str:
+    r"""
+    Returns a string that changes whenever *implementation* might produce different
+    results, i.e., its ``#!python cache_version`` attribute (if any, which should be
+    bumped when something it depends on outside its own module changes) and a digest of
+    its module's source (so that any edit to that module invalidates stored results).
+    """
+    return f"{getattr(implementation, 'cache_version', 0)}:{_module_digest(implementation.__module__)}"
+
+
+@lru_cache(maxsize=None)
+def _module_digest(module_name: str) -> str:
+    try:
+        source = inspect.getsource(sys.modules[module_name])
+    except (KeyError, OSError, TypeError):  # e.g., defined interactively
+        return ""
+
+    return sha256(source.encode("utf-8")).hexdigest()[:16]
+
+
+def _encode_h(h: H) -> bytes:
+    return zlib.compress(
+        json.dumps(
+            [(str(outcome), count) for outcome, count in h.items()],
+            separators=(",", ":"),
+        ).encode("utf-8")
+    )
+
+
+def _decode_h(value: bytes) -> H:
+    return H(
+        (_decode_outcome(outcome), count)
+        for outcome, count in json.loads(zlib.decompress(value).decode("utf-8"))
+    )
+
+
+def _decode_outcome(outcome: str) -> int | Fraction:
+    try:
+        return int(outcome)
+    except ValueError:
+        return Fraction(outcome)
+
+
+class TestResultCache(unittest.TestCase):
+    def setUp(self):
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self._tmp_dir.name, "results.sqlite3")
+        self.calls = 0
+
+    def tearDown(self):
+        self._tmp_dir.cleanup()
+
+    def _implementation(self, params: Params, die: H, explode_limit: LimitT) -> H:
+        self.calls += 1
+
+        return die + params.num_std
+
+    def test_hits_and_misses(self):
+        cache = ResultCache(self.path)
+        (params,) = Params.parse_from_notation("2s1b@1+@3+@1  # first")
+        (same_params,) = Params.parse_from_notation("2s1b@1+@1+@3  # second")
+        h = cache.get_or_compute(self._implementation, params, H(6), 0)
+        self.assertEqual(h, H(6) + 2)
+        self.assertEqual((cache.hits, cache.misses, self.calls), (0, 1, 1))
+        h = cache.get_or_compute(self._implementation, same_params, H(6), 0)
+        self.assertEqual(h, H(6) + 2)
+        self.assertEqual((cache.hits, cache.misses, self.calls), (1, 1, 1))
+        cache.get_or_compute(self._implementation, params, H(6), Fraction(1, 10))
+        cache.get_or_compute(self._implementation, params, H(8), 0)
+        self.assertEqual((cache.hits, cache.misses, self.calls), (1, 3, 3))
+
+    def test_persistence(self):
+        (params,) = Params.parse_from_notation("3s0b@2")
+        cache = ResultCache(self.path)
+        cache.get_or_compute(self._implementation, params, H(4), 1)
+        cache.close()
+        cache = ResultCache(self.path)
+        h = cache.get_or_compute(self._implementation, params, H(4), 1)
+        self.assertEqual(h, H(4) + 3)
+        self.assertEqual((cache.hits, cache.misses, self.calls), (1, 0, 1))
+
+    def test_eviction(self):
+        (params,) = Params.parse_from_notation("1s0b@1")
+        big_h = H(1000)
+        cache = ResultCache(self.path, max_bytes=len(_encode_h(big_h + 1)) + 1)
+        cache.get_or_compute(self._implementation, params, big_h, 0)
+        cache.get_or_compute(self._implementation, params, big_h, 1)
+        cache.get_or_compute(self._implementation, params, big_h, 1)
+        cache.get_or_compute(self._implementation, params, big_h, 0)
+        self.assertEqual((cache.hits, cache.misses, self.calls), (1, 3, 3))
+
+    def test_implementation_version(self):
+        def _implementation(params: Params, die: H, explode_limit: LimitT) -> H:
+            self.calls += 1
+
+            return die + params.num_std
+
+        (params,) = Params.parse_from_notation("1s0b@1")
+        cache = ResultCache(self.path)
+        cache.get_or_compute(_implementation, params, H(6), 0)
+        cache.get_or_compute(_implementation, params, H(6), 0)
+        _implementation.cache_version = 2  # type: ignore
+        cache.get_or_compute(_implementation, params, H(6), 0)
+        self.assertEqual((cache.hits, cache.misses, self.calls), (1, 2, 2))
+        self.assertNotEqual(
+            cache_key(_implementation, params, H(6), 0),
+            cache_key(self._implementation, params, H(6), 0),
+        )
+
+    def test_last_used_is_wall_clock(self):
+        (params,) = Params.parse_from_notation("1s0b@1")
+        cache = ResultCache(self.path)
+        before = time_ns()
+        cache.get_or_compute(self._implementation, params, H(6), 0)
+        (last_used,) = cache._conn.execute(  # type: ignore
+            "SELECT last_used FROM results"
+        ).fetchone()
+        self.assertGreaterEqual(last_used, before)
+
+    def test_round_trip(self):
+        for h in (H(6), 10 @ H(20), H({-3: 1, 0: 2**80}), H({Fraction(1, 3): 1})):
+            self.assertEqual(_decode_h(_encode_h(h)), h, msg=f"h = {h!r}")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,58 +1,130 @@
+import asyncio
+import html
+from concurrent.futures import ProcessPoolExecutor
 from fractions import Fraction
+from functools import lru_cache
 from typing import Callable
 
 from anydyce import HPlotterChooser
 from anydyce.viz import PlotWidgets
+from batch import evaluate_params_async, is_emscripten
 from dyce import H
 from dyce.evaluation import LimitT
 from dyce_impl import mechanic_dyce_fudged
-from icepool_impl import mechanic_icepool, mechanic_icepool_fudged
+from implementations import IMPLEMENTATION_MAP
 from IPython.display import display
 from ipywidgets import widgets
 
 # Local imports
-from params import Params
+from params import NotationParser, Params
+from result_cache import ResultCache
 
 _MechanicImplementationT = Callable[[Params, H, LimitT], H]
 
-_IMPLEMENTATION_MAP: dict[str, _MechanicImplementationT] = {
-    "dyce (explosions fudged within limit)": mechanic_dyce_fudged,
-    "icepool (explosions fudged within limit)": mechanic_icepool_fudged,
-    "icepool (explosions accurately limited)": mechanic_icepool,
-}
+
+@lru_cache(maxsize=None)
+def _process_pool(workers: int | None) -> ProcessPoolExecutor:
+    r"""
+    Returns a process pool of *workers* shared by every ``#!python showit`` (e.g., when
+    re-running a cell), rather than leaving a new one behind each time.
+    """
+    return ProcessPoolExecutor(workers)
 
 
 def showit(
     notations: str,
     die_map: dict[str, H],
     selected_die: H | None = None,
+    result_cache: ResultCache | None = None,
+    workers: int | None = None,
 ):
     if selected_die is None:
         selected_die = next(iter(die_map.values()))
 
+    if result_cache is None:
+        result_cache = ResultCache()
+
+    executor = None if workers == 1 or is_emscripten() else _process_pool(workers)
+    notation_parser = NotationParser(die_map)
+
+    # The task computing the most recently selected options (if any); superseded tasks
+    # are cancelled so their results never reach the chooser
+    current_task: asyncio.Task | None = None
+
+    def _task_done(task: asyncio.Task) -> None:
+        # Superseded tasks' errors are for options that are no longer selected
+        if task is not current_task or task.cancelled() or task.exception() is None:
+            return
+
+        exc = task.exception()
+        errors_widget.value = "<br>".join(
+            error
+            for error in (
+                errors_widget.value,
+                html.escape(f"unable to compute results: {exc!r}"),
+            )
+            if error
+        )
+        cache_stats_widget.value = str(result_cache)
+
     def _display(
         mechanic_implementation: _MechanicImplementationT,
         die: H,
         explode_limit: LimitT,
     ) -> None:
-        def _hs_gen():
-            for params in Params.parse_from_notation(notations, die_map):
-                if params is None:
-                    yield None
-                else:
-                    h = mechanic_implementation(
-                        params,
-                        params.override_die if params.override_die else die,
-                        explode_limit,
-                    )
-                    desc = f"{params.comment if params.comment else params!s}\nmean: {h.mean():0.02f}\nstdev: {h.stdev():0.02f}"
-                    yield desc, h
-
-        chooser.update_hs(_hs_gen())
+        nonlocal current_task
+
+        if current_task is not None:
+            current_task.cancel()
+
+        all_params = notation_parser.parse(notations)
+        errors_widget.value = "<br>".join(
+            html.escape(str(error)) for error in notation_parser.errors
+        )
+        update = _update(all_params, mechanic_implementation, die, explode_limit)
+
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:  # not in a kernel, so there's nothing to keep responsive
+            asyncio.run(update)
+        else:
+            current_task = loop.create_task(update)
+            current_task.add_done_callback(_task_done)
+
+    async def _update(
+        all_params: list[Params | None],
+        mechanic_implementation: _MechanicImplementationT,
+        die: H,
+        explode_limit: LimitT,
+    ) -> None:
+        # Lines that haven't finished yet are laid out as spacers
+        hs: list = [None for _ in all_params]
+        num_pending = sum(params is not None for params in all_params)
+        cache_stats_widget.value = f"{result_cache}; computing {num_pending} line(s)"
+
+        async for i, params, h in evaluate_params_async(
+            all_params,
+            die,
+            explode_limit,
+            mechanic_implementation,
+            executor=executor,
+            result_cache=result_cache,
+        ):
+            if params is not None:
+                assert h is not None
+                desc = f"{params.comment if params.comment else params!s}\nmean: {h.mean():0.02f}\nstdev: {h.stdev():0.02f}"
+                hs[i] = (desc, h)
+                chooser.update_hs(hs)
+                num_pending -= 1
+                cache_stats_widget.value = (
+                    f"{result_cache}; computing {num_pending} line(s)"
+                    if num_pending
+                    else str(result_cache)
+                )
 
     implementation_widget = widgets.Dropdown(
         value=mechanic_dyce_fudged,
-        options=_IMPLEMENTATION_MAP,
+        options=IMPLEMENTATION_MAP,
         description="Implementation",
     )
 
@@ -82,6 +154,9 @@ def showit(
         readout=True,
     )
 
+    cache_stats_widget = widgets.Label()
+    errors_widget = widgets.HTML()
+
     chooser = HPlotterChooser(
         plot_widgets=PlotWidgets(
             initial_burst_zero_fill_normalize=True,
@@ -90,6 +165,8 @@ def showit(
 
     display(
         widgets.HBox([implementation_widget, die_widget, explode_limit_widget]),
+        cache_stats_widget,
+        errors_widget,
         widgets.interactive_output(
             _display,
             {
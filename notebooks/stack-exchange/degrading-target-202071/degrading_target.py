@@ -1,19 +1,63 @@
 from __future__ import annotations
 
-from typing import Callable
+import unittest
+from bisect import bisect_left
+from fractions import Fraction
+from itertools import accumulate, count
+from typing import Callable, Iterable, Optional
 
 from dyce import H
 from dyce.evaluation import HResult, foreach
 
 __all__ = (
+    "TriesExhaustedError",
     "degrading_target_customizable_adjustment",
+    "degrading_target_markov",
+    "degrading_target_sweep",
+    "degrading_target_tabulated",
     "reduce_once_per_try",
     "reduce_twice_per_try",
+    "tabulate_adjusted_targets",
 )
 
 
 AdjustedTargetT = Callable[[int, int], int]
 
+# A cap for callers that can't trust the adjustment to ever make success certain (e.g.,
+# showit.py, which runs custom code). Counts are exact (out of die.total ** tries), so
+# their size (and the cost of each try) grows with the number of tries.
+DEFAULT_MAX_TRIES = 1_000
+
+
+class TriesExhaustedError(RuntimeError):
+    r"""
+    Raised when success still isn't certain after the maximum number of tries (e.g.,
+    because the adjustment never brings the target within reach of every outcome). This
+    is the equivalent of the ``#!python RecursionError`` the recursive versions would
+    raise. *resolved* is the distribution of tries among only the ways that succeeded
+    within them, and *unresolved* is the probability of still trying after them.
+    *initial_target* is ``#!python None`` where it isn't known (i.e., from ``#!python
+    degrading_target_tabulated``).
+    """
+
+    def __init__(
+        self,
+        initial_target: Optional[int],
+        max_tries: int,
+        resolved: H,
+        unresolved: Fraction,
+    ):
+        subject = (
+            "success" if initial_target is None else f"initial target {initial_target}"
+        )
+        super().__init__(
+            f"{subject} is still unresolved after {max_tries} tries (with probability {float(unresolved):.3g})"
+        )
+        self.initial_target = initial_target
+        self.max_tries = max_tries
+        self.resolved = resolved
+        self.unresolved = unresolved
+
 
 def degrading_target_nonperformant(
     die: H,
@@ -87,6 +131,14 @@ def reduce_twice_per_try(initial_target: int, prior_tries: int) -> int:
     return initial_target - adjustment
 
 
+# Adjustments where failing the first try is the same as starting over with the
+# adjusted target after it (see degrading_target_sweep)
+_MEMORYLESS_ADJUSTMENTS: set[AdjustedTargetT] = {
+    reduce_once_per_try,
+    reduce_twice_per_try,
+}
+
+
 def degrading_target_customizable_adjustment(
     die: H,
     initial_target: int,
@@ -122,3 +174,397 @@ def degrading_target_customizable_adjustment(
         succeeds_or_fails_at_adjusted_target_h,
         limit=-1,  # do not limit recursion
     )
+
+
+def degrading_target_markov(
+    die: H,
+    initial_target: int,
+    adjusted_target_func: AdjustedTargetT = reduce_once_per_try,
+    max_tries: Optional[int] = None,
+) -> H:
+    r"""
+    Equivalent to ``#!python degrading_target_customizable_adjustment``, but without
+    any recursion. Each try either succeeds or leaves us at the next try, so we can
+    walk the tries in order, keeping track of how many ways we could still be trying
+    (out of ``#!python die.total ** prior_tries``). We stop once success is certain,
+    however many tries that takes. If *max_tries* is provided, raises ``#!python
+    TriesExhaustedError`` if success still isn't certain after that many (much like the
+    recursive version runs out of stack). Otherwise, an adjustment that never makes
+    success certain never returns. See ``#!python degrading_target_sweep``.
+    """
+    return degrading_target_sweep(
+        die, (initial_target,), adjusted_target_func, max_tries
+    )[initial_target]
+
+
+def degrading_target_sweep(
+    die: H,
+    initial_targets: Iterable[int],
+    adjusted_target_func: AdjustedTargetT = reduce_once_per_try,
+    max_tries: Optional[int] = None,
+    memoryless: Optional[bool] = None,
+) -> dict[int, H]:
+    r"""
+    Returns the distribution of tries (as with ``#!python degrading_target_markov``)
+    for each of *initial_targets*.
+
+    If *adjusted_target_func* is *memoryless* (i.e., failing the first try leaves us
+    exactly where we'd be starting over with the adjusted target after it, as with
+    ``#!python reduce_once_per_try`` and ``#!python reduce_twice_per_try``, which are
+    assumed to be unless *memoryless* is ``#!python False``), each initial target's
+    distribution is derived from that of the initial target it becomes after its first
+    try: either it succeeds on that try, or it fails and takes one more try than the
+    other. Each distinct initial target (including those only reached along the way) is
+    solved once and shared by every initial target that reaches it, and stretches of
+    tries that can't succeed cost nothing more than following them.
+
+    Otherwise, every initial target still trying is advanced one try at a time (in a
+    single pass over tries), with only the number of ways to succeed at each adjusted
+    target shared between them. If *max_tries* is provided, raises ``#!python
+    TriesExhaustedError`` (for the lowest such initial target) if any initial target is
+    still unresolved after that many.
+    """
+    initial_targets = tuple(initial_targets)
+
+    if memoryless is None:
+        memoryless = adjusted_target_func in _MEMORYLESS_ADJUSTMENTS
+
+    if memoryless:
+        sweep = _memoryless_sweep(die, initial_targets, adjusted_target_func, max_tries)
+
+        if sweep is not None:
+            return sweep
+
+    total = die.total
+    outcomes, counts_at_least = _counts_at_least(die)
+    succeeds_by_adjusted_target: dict[int, int] = {}
+    # initial target -> ways we could still be trying out of total ** prior_tries
+    ways_still_trying = {initial_target: 1 for initial_target in initial_targets}
+    # initial target -> [(tries, ways to succeed on exactly that try out of total **
+    # tries), ...]
+    successes: dict[int, list[tuple[int, int]]] = {
+        initial_target: [] for initial_target in ways_still_trying
+    }
+
+    for prior_tries in range(max_tries) if max_tries is not None else count():
+        if not ways_still_trying:
+            break
+
+        for initial_target, ways in list(ways_still_trying.items()):
+            adjusted_target = adjusted_target_func(initial_target, prior_tries)
+
+            try:
+                succeeds = succeeds_by_adjusted_target[adjusted_target]
+            except KeyError:
+                succeeds = succeeds_by_adjusted_target[adjusted_target] = (
+                    counts_at_least[bisect_left(outcomes, adjusted_target)]
+                )
+
+            if succeeds:
+                successes[initial_target].append((prior_tries + 1, ways * succeeds))
+
+            if succeeds == total:
+                del ways_still_trying[initial_target]
+            else:
+                ways_still_trying[initial_target] = ways * (total - succeeds)
+
+    if ways_still_trying:
+        assert max_tries is not None
+        initial_target = min(ways_still_trying)
+
+        raise TriesExhaustedError(
+            initial_target,
+            max_tries,
+            _h_from_successes(total, successes[initial_target]),
+            Fraction(ways_still_trying[initial_target], total**max_tries),
+        )
+
+    return {
+        initial_target: _h_from_successes(total, target_successes)
+        for initial_target, target_successes in successes.items()
+    }
+
+
+def tabulate_adjusted_targets(
+    die: H,
+    initial_target: int,
+    adjusted_target_func: AdjustedTargetT = reduce_once_per_try,
+    max_tries: Optional[int] = None,
+) -> tuple[int, ...]:
+    r"""
+    Returns the adjusted target for each try (in order) until success is certain (i.e.,
+    the adjusted target is no more than the lowest outcome of *die*) or for
+    *max_tries* (if provided), whichever comes first. This is the only part of solving for the
+    distribution of tries that calls *adjusted_target_func*. See ``#!python
+    degrading_target_tabulated``.
+    """
+    lowest = min(die)
+    adjusted_targets = []
+
+    for prior_tries in range(max_tries) if max_tries is not None else count():
+        adjusted_target = adjusted_target_func(initial_target, prior_tries)
+        adjusted_targets.append(adjusted_target)
+
+        if adjusted_target <= lowest:
+            break
+
+    return tuple(adjusted_targets)
+
+
+def degrading_target_tabulated(die: H, adjusted_targets: Iterable[int]) -> H:
+    r"""
+    Equivalent to ``#!python degrading_target_markov``, but takes the adjusted target
+    for each try (in order, e.g., from ``#!python tabulate_adjusted_targets``) rather
+    than a function to compute them. Raises ``#!python TriesExhaustedError`` if success
+    still isn't certain after the last adjusted target.
+    """
+    total = die.total
+    outcomes, counts_at_least = _counts_at_least(die)
+    successes: list[tuple[int, int]] = []
+    ways_still_trying = 1
+    tries = 0
+
+    for tries, adjusted_target in enumerate(adjusted_targets, start=1):
+        succeeds = counts_at_least[bisect_left(outcomes, adjusted_target)]
+
+        if succeeds:
+            successes.append((tries, ways_still_trying * succeeds))
+
+        if succeeds == total:
+            return _h_from_successes(total, successes)
+
+        ways_still_trying *= total - succeeds
+
+    raise TriesExhaustedError(
+        None,
+        tries,
+        _h_from_successes(total, successes),
+        Fraction(ways_still_trying, total**tries),
+    )
+
+
+def _counts_at_least(die: H) -> tuple[list[int], list[int]]:
+    r"""
+    Returns the outcomes of *die* and the number of ways to roll at least each of them
+    (plus zero ways to roll more than the highest), for lookups via ``#!python
+    bisect_left``.
+    """
+    return list(die), list(accumulate(reversed(die.values())))[::-1] + [0]
+
+
+def _memoryless_sweep(
+    die: H,
+    initial_targets: tuple[int, ...],
+    adjusted_target_func: AdjustedTargetT,
+    max_tries: Optional[int],
+) -> Optional[dict[int, H]]:
+    r"""
+    See ``#!python degrading_target_sweep``. Returns ``#!python None`` if some initial
+    target never resolves (i.e., it leads back to itself) or needs more than
+    *max_tries*, in which case the caller's step-by-step approach deals with it.
+    """
+    total = die.total
+    outcomes, counts_at_least = _counts_at_least(die)
+    # initial target -> (tries of the first count, ways to succeed on each try from
+    # then on, exponent), where the ways are out of total ** exponent
+    solved: dict[int, tuple[int, list[int], int]] = {}
+
+    for initial_target in initial_targets:
+        # Initial targets that must be solved before this one (each leads to the next)
+        chain: list[tuple[int, int]] = []
+        in_chain: set[int] = set()
+        target = initial_target
+
+        while target not in solved:
+            succeeds = counts_at_least[
+                bisect_left(outcomes, adjusted_target_func(target, 0))
+            ]
+
+            if succeeds == total:
+                solved[target] = (1, [1], 0)
+
+                break
+
+            if target in in_chain:
+                return None
+
+            chain.append((target, succeeds))
+            in_chain.add(target)
+            target = adjusted_target_func(target, 1)
+
+        for prior_target, succeeds in reversed(chain):
+            first_tries, counts, exponent = solved[target]
+
+            if succeeds:
+                # Either succeed on the first try, or fail it and then take one more
+                # try than target does
+                solved[prior_target] = (
+                    1,
+                    [succeeds * total**exponent]
+                    + [0] * (first_tries - 1)
+                    + [(total - succeeds) * count for count in counts],
+                    exponent + 1,
+                )
+            else:
+                # Certain to fail the first try, so only the tries shift
+                solved[prior_target] = (first_tries + 1, counts, exponent)
+
+            target = prior_target
+
+    sweep = {}
+
+    for initial_target in initial_targets:
+        first_tries, counts, _ = solved[initial_target]
+
+        if max_tries is not None and first_tries + len(counts) - 1 > max_tries:
+            return None
+
+        sweep[initial_target] = H(
+            (first_tries + i, count) for i, count in enumerate(counts) if count
+        )
+
+    return sweep
+
+
+def _h_from_successes(total: int, successes: list[tuple[int, int]]) -> H:
+    if not successes:
+        return H({})
+
+    last_tries, _ = successes[-1]
+
+    # Bring everything to a common total of total ** last_tries
+    return H((tries, ways * total ** (last_tries - tries)) for tries, ways in successes)
+
+
+class TestDegradingTarget(unittest.TestCase):
+    dice = (H(6), H(20), H({-1: 1, 0: 2, 3: 1}), 2 @ H(4))
+    adjusted_target_funcs = (
+        reduce_once_per_try,
+        reduce_twice_per_try,
+        lambda initial_target, prior_tries: initial_target - prior_tries // 3,
+    )
+
+    def test_markov(self):
+        for die in self.dice:
+            for adjusted_target_func in self.adjusted_target_funcs:
+                for initial_target in range(min(die) - 1, max(die) + 2):
+                    self.assertEqual(
+                        degrading_target_markov(
+                            die, initial_target, adjusted_target_func
+                        ),
+                        degrading_target_customizable_adjustment(
+                            die, initial_target, adjusted_target_func
+                        ),
+                        msg=f"die = {die!r}; initial_target = {initial_target}",
+                    )
+
+    def test_sweep(self):
+        for die in self.dice:
+            for adjusted_target_func in self.adjusted_target_funcs:
+                initial_targets = range(max(die) + 1, min(die) - 2, -1)
+                expected = {
+                    initial_target: degrading_target_markov(
+                        die, initial_target, adjusted_target_func
+                    )
+                    for initial_target in initial_targets
+                }
+                self.assertEqual(
+                    degrading_target_sweep(die, initial_targets, adjusted_target_func),
+                    expected,
+                    msg=f"die = {die!r}",
+                )
+                # With and without sharing between initial targets
+                self.assertEqual(
+                    degrading_target_sweep(
+                        die, initial_targets, adjusted_target_func, memoryless=False
+                    ),
+                    expected,
+                    msg=f"die = {die!r}",
+                )
+
+        self.assertEqual(
+            degrading_target_sweep(H(100), (1_100, 150, 50)),
+            {
+                initial_target: degrading_target_markov(H(100), initial_target)
+                for initial_target in (1_100, 150, 50)
+            },
+        )
+
+    def test_tabulated(self):
+        for die in self.dice:
+            for adjusted_target_func in self.adjusted_target_funcs:
+                for initial_target in range(min(die) - 1, max(die) + 2):
+                    self.assertEqual(
+                        degrading_target_tabulated(
+                            die,
+                            tabulate_adjusted_targets(
+                                die, initial_target, adjusted_target_func
+                            ),
+                        ),
+                        degrading_target_markov(
+                            die, initial_target, adjusted_target_func
+                        ),
+                        msg=f"die = {die!r}; initial_target = {initial_target}",
+                    )
+
+    def test_unbounded(self):
+        # Well beyond DEFAULT_MAX_TRIES, but certain to succeed eventually (the target
+        # is out of reach for the first 1,000 tries)
+        tries = degrading_target_markov(H(100), 1_100)
+        self.assertEqual(min(tries), 1_001)
+        self.assertEqual(max(tries), 1_100)
+        self.assertEqual(tries, degrading_target_markov(H(100), 100) + 1_000)
+        self.assertEqual(
+            degrading_target_tabulated(
+                H(100), tabulate_adjusted_targets(H(100), 1_100)
+            ),
+            tries,
+        )
+
+    def test_tries_exhausted(self):
+        def _never_adjust(initial_target: int, prior_tries: int) -> int:
+            return initial_target
+
+        with self.assertRaises(TriesExhaustedError) as cm:
+            degrading_target_markov(H(6), 4, _never_adjust, max_tries=10)
+
+        exc = cm.exception
+        self.assertEqual(exc.initial_target, 4)
+        self.assertEqual(exc.max_tries, 10)
+        self.assertEqual(exc.unresolved, Fraction(1, 2**10))
+        # Each try succeeds half the time, so each is half as likely as the one before
+        self.assertEqual(
+            exc.resolved, H({tries: 2 ** (10 - tries) for tries in range(1, 11)})
+        )
+
+        with self.assertRaises(TriesExhaustedError) as cm:
+            degrading_target_sweep(H(6), (1, 5, 4), _never_adjust, max_tries=10)
+
+        self.assertEqual(cm.exception.initial_target, 4)
+
+        # Shared initial targets that never resolve, or that need too many tries
+        with self.assertRaises(TriesExhaustedError) as cm:
+            degrading_target_sweep(
+                H(6), (1, 5, 4), _never_adjust, max_tries=10, memoryless=True
+            )
+
+        self.assertEqual(cm.exception.initial_target, 4)
+
+        with self.assertRaises(TriesExhaustedError) as cm:
+            degrading_target_sweep(H(6), (1, 20), max_tries=10)
+
+        self.assertEqual(cm.exception.initial_target, 20)
+        self.assertEqual(cm.exception.unresolved, 1)
+
+        with self.assertRaises(TriesExhaustedError) as cm:
+            degrading_target_tabulated(
+                H(6), tabulate_adjusted_targets(H(6), 4, _never_adjust, max_tries=10)
+            )
+
+        self.assertIsNone(cm.exception.initial_target)
+        self.assertEqual(cm.exception.resolved, exc.resolved)
+        self.assertEqual(cm.exception.unresolved, exc.unresolved)
+
+
+if __name__ == "__main__":
+    unittest.main()
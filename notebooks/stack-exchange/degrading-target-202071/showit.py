@@ -1,12 +1,21 @@
+import builtins
+import math
+import sys
+import unittest
 from enum import Enum
-from typing import Optional
+from functools import lru_cache
+from time import perf_counter
+from typing import Any, Callable, Optional, TypeVar
 
 from anydyce import HPlotterChooser
 from degrading_target import (
+    DEFAULT_MAX_TRIES,
     AdjustedTargetT,
-    degrading_target_customizable_adjustment,
+    TriesExhaustedError,
+    degrading_target_tabulated,
     reduce_once_per_try,
     reduce_twice_per_try,
+    tabulate_adjusted_targets,
 )
 from dyce import H
 from IPython.display import display
@@ -49,6 +58,68 @@ ADJ_METHOD_MAP: dict[AdjMethod, AdjustedTargetT] = {
 DEFAULT_DIE = Die.D20
 DEFAULT_ADJ_METHOD = AdjMethod.REDUCE_ONCE_PER_TRY
 
+# Upper bound on how long custom code may run (when compiled or tabulated)
+CUSTOM_CODE_TIMEOUT_SECONDS = 2.0
+
+# Custom code is compiled with this filename, which is how _call_with_deadline tells
+# its frames apart from everyone else's (e.g., dyce's)
+_CUSTOM_CODE_FILENAME = "<custom code>"
+
+# The only builtins available to custom code (which notably excludes __import__, open,
+# eval, exec, etc.)
+_SAFE_BUILTINS = {
+    name: getattr(builtins, name)
+    for name in (
+        "abs",
+        "all",
+        "any",
+        "bin",
+        "bool",
+        "callable",
+        "chr",
+        "dict",
+        "divmod",
+        "enumerate",
+        "filter",
+        "float",
+        "frozenset",
+        "hex",
+        "int",
+        "isinstance",
+        "iter",
+        "len",
+        "list",
+        "map",
+        "max",
+        "min",
+        "next",
+        "oct",
+        "ord",
+        "pow",
+        "range",
+        "repr",
+        "reversed",
+        "round",
+        "set",
+        "slice",
+        "sorted",
+        "str",
+        "sum",
+        "tuple",
+        "zip",
+        "ArithmeticError",
+        "Exception",
+        "IndexError",
+        "KeyError",
+        "StopIteration",
+        "TypeError",
+        "ValueError",
+        "ZeroDivisionError",
+    )
+}
+
+_T = TypeVar("_T")
+
 
 def showit():
     last_die_enum = DEFAULT_DIE
@@ -104,10 +175,16 @@ def showit():
             msg = f"Error {adj_method_exc}"
         else:
             try:
-                breakdown = degrading_target_customizable_adjustment(
-                    die_h, initial_target, adj_method_func
+                # Tabulation stops after DEFAULT_MAX_TRIES, which also bounds how long
+                # the solver takes (it never calls custom code itself)
+                breakdown = degrading_target_tabulated(
+                    die_h,
+                    _tabulate_adjusted_targets(die_h, initial_target, adj_method_func),
                 )
                 msg = f"Distribution of tries needed to reach success\nMean: {breakdown.mean():0.2f}; Std Dev: {breakdown.stdev():0.2f}"
+            except TriesExhaustedError as exc:
+                breakdown = exc.resolved
+                msg = f"Truncated after {exc.max_tries} tries (still trying with probability {float(exc.unresolved):.3g})\nMean: {breakdown.mean():0.2f}; Std Dev: {breakdown.stdev():0.2f} (of resolved tries)"
             except Exception as exc:
                 die_custom_widget.add_class("parse-error")
                 adj_method_custom_widget.add_class("parse-error")
@@ -158,9 +235,11 @@ def showit():
         description="Value",
         disabled=adj_method_widget.value is not AdjMethod.CUSTOM,
         layout={
-            "visibility": "hidden"
-            if adj_method_widget.value is not AdjMethod.CUSTOM
-            else "visible"
+            "visibility": (
+                "hidden"
+                if adj_method_widget.value is not AdjMethod.CUSTOM
+                else "visible"
+            )
         },
         height="auto",
         width="auto",
@@ -207,17 +286,8 @@ def showit():
 def _grab_adj_method_custom(
     value: str,
 ) -> tuple[AdjustedTargetT, Optional[Exception]]:
-    adj_method_globals = {"H": H, "_": ADJ_METHOD_MAP[DEFAULT_ADJ_METHOD]}
-
     try:
-        try:
-            adj_method_func = eval(value, adj_method_globals)
-        except SyntaxError:
-            del adj_method_globals["_"]
-            exec(value, adj_method_globals)
-            adj_method_func = adj_method_globals["_"]  # type: ignore
-
-        return adj_method_func, None
+        return _compile_adj_method_custom(value), None
     except Exception as exc:
 
         def adj_method_func(_: int, __: int) -> int:
@@ -226,8 +296,162 @@ def _grab_adj_method_custom(
         return adj_method_func, exc
 
 
+@lru_cache(maxsize=64)
+def _compile_adj_method_custom(value: str) -> AdjustedTargetT:
+    r"""
+    Compiles *value* (either an expression or statements defining ``#!python _``) in a
+    restricted namespace. Results are cached by *value*, so custom code is only
+    compiled once, no matter how many times other widgets change.
+    """
+    adj_method_globals = _restricted_globals(_=ADJ_METHOD_MAP[DEFAULT_ADJ_METHOD])
+
+    try:
+        code = _compile_custom(value, "eval")
+    except SyntaxError:
+        del adj_method_globals["_"]
+        _call_with_deadline(exec, _compile_custom(value, "exec"), adj_method_globals)
+        adj_method_func = adj_method_globals["_"]
+    else:
+        adj_method_func = _call_with_deadline(eval, code, adj_method_globals)
+
+    if not callable(adj_method_func):
+        raise TypeError(f"{adj_method_func!r} is not callable")
+
+    return adj_method_func
+
+
+@lru_cache(maxsize=256)
+def _tabulate_adjusted_targets(
+    die: H,
+    initial_target: int,
+    adj_method_func: AdjustedTargetT,
+) -> tuple[int, ...]:
+    r"""
+    Calls *adj_method_func* once for each try that could be needed, up to ``#!python
+    DEFAULT_MAX_TRIES`` (see ``#!python tabulate_adjusted_targets``), so the solver
+    never calls back into it (and its work is bounded, too). Results are
+    cached, and are abandoned (raising ``#!python TimeoutError``) if they take longer
+    than ``#!python CUSTOM_CODE_TIMEOUT_SECONDS``.
+    """
+    adjusted_targets = _call_with_deadline(
+        tabulate_adjusted_targets,
+        die,
+        initial_target,
+        adj_method_func,
+        DEFAULT_MAX_TRIES,
+    )
+
+    for adjusted_target in adjusted_targets:
+        if not isinstance(adjusted_target, (int, float)):
+            raise TypeError(f"adjusted target {adjusted_target!r} is not a number")
+
+    return adjusted_targets
+
+
+def _call_with_deadline(func: Callable[..., _T], *args: Any) -> _T:
+    r"""
+    Calls *func*, raising ``#!python TimeoutError`` from custom code (i.e., code
+    compiled by ``#!python _compile_custom``) once ``#!python
+    CUSTOM_CODE_TIMEOUT_SECONDS`` have elapsed. This relies on tracing (rather than
+    threads or signals, which aren't available everywhere, e.g., in Pyodide). Only
+    custom code's frames are traced (opcode by opcode). Everything else (e.g., dyce)
+    only pays for one trace call per function call, but can't be interrupted until it
+    returns to custom code.
+    """
+    deadline = perf_counter() + CUSTOM_CODE_TIMEOUT_SECONDS
+
+    def _trace(frame, event, arg):
+        if frame.f_code.co_filename != _CUSTOM_CODE_FILENAME:
+            return None
+
+        # Per-opcode events catch even single-line loops (e.g., "while True: pass")
+        frame.f_trace_opcodes = True
+
+        return _trace_custom(frame, event, arg)
+
+    def _trace_custom(frame, event, arg):
+        if perf_counter() > deadline:
+            raise TimeoutError(
+                f"custom code took longer than {CUSTOM_CODE_TIMEOUT_SECONDS} seconds"
+            )
+
+        return _trace_custom
+
+    prior_trace = sys.gettrace()
+    sys.settrace(_trace)
+
+    try:
+        return func(*args)
+    finally:
+        sys.settrace(prior_trace)
+
+
+def _compile_custom(value: str, mode: str):
+    return compile(value, _CUSTOM_CODE_FILENAME, mode)
+
+
 def _grab_die_custom(value: str) -> tuple[H, Optional[Exception]]:
     try:
-        return H(eval(value, {"H": H})), None
+        return (
+            H(
+                _call_with_deadline(
+                    eval, _compile_custom(value, "eval"), _restricted_globals()
+                )
+            ),
+            None,
+        )
     except Exception as exc:
         return H(0), exc
+
+
+def _restricted_globals(**kw: Any) -> dict[str, Any]:
+    return {"__builtins__": _SAFE_BUILTINS, "H": H, "math": math, **kw}
+
+
+class TestCustomCode(unittest.TestCase):
+    def test_die(self):
+        for value, expected in (
+            ("2 @ H(6)  # <-- this means 2d6", 2 @ H(6)),
+            # dyce's own work isn't traced, so this isn't anywhere near the deadline
+            ("10 @ H(20)", 10 @ H(20)),
+            ("H(dict(zip(range(1, 7), [1] * 6)))", H(6)),
+            ("H({str(i): 1 for i in set(range(3))}).umap(int)", H(3) - 1),
+            (
+                "H(v for i, v in enumerate(reversed(sorted(frozenset((1, 2, 2))))) if all((i >= 0,)))",
+                H(2),
+            ),
+        ):
+            die_h, exc = _grab_die_custom(value)
+            self.assertIsNone(exc, msg=f"value = {value!r}")
+            self.assertEqual(die_h, expected, msg=f"value = {value!r}")
+
+    def test_die_restricted(self):
+        for value in ("__import__('os')", "open('/dev/null')"):
+            _, exc = _grab_die_custom(value)
+            self.assertIsInstance(exc, NameError, msg=f"value = {value!r}")
+
+    def test_deadline(self):
+        global CUSTOM_CODE_TIMEOUT_SECONDS
+        prior_timeout = CUSTOM_CODE_TIMEOUT_SECONDS
+        CUSTOM_CODE_TIMEOUT_SECONDS = 0.1
+
+        try:
+            adj_method_func = _compile_adj_method_custom(
+                "def _(target, prior_tries):\n    while True: pass"
+            )
+
+            with self.assertRaises(TimeoutError):
+                _call_with_deadline(adj_method_func, 20, 0)
+
+            _, exc = _grab_die_custom("H(sum(1 for _ in iter(int, 1)))")
+            self.assertIsInstance(exc, TimeoutError)
+        finally:
+            CUSTOM_CODE_TIMEOUT_SECONDS = prior_timeout
+
+    def test_adjusted_targets(self):
+        adj_method_func = _compile_adj_method_custom(
+            "lambda target, prior_tries: target - prior_tries // 2"
+        )
+        self.assertEqual(
+            _tabulate_adjusted_targets(H(4), 4, adj_method_func), (4, 4, 3, 3, 2, 2, 1)
+        )
@@ -1,11 +1,23 @@
+import unittest
+from concurrent.futures import Executor, ThreadPoolExecutor
 from enum import Enum, auto
+from typing import Optional, Sequence
 
+import numpy as np
 from dyce import H
 from dyce.evaluation import HResult, foreach
 
 d6 = H(6)
 d20 = H(20)
 
+_INT64_MAX = int(np.iinfo(np.int64).max)
+
+_FacePairT = tuple[Optional[int], Optional[int]]
+
+# pool size -> number of ways to roll each sum of that many d6s (shared by every
+# contest, since the sliders only ever select a handful of pool sizes)
+_POOL_COUNTS: dict[int, np.ndarray] = {}
+
 
 class ContestType(Enum):
     PC_ATTACKS = auto()
@@ -21,6 +33,322 @@ def expected_dmg_frm_rnd_pc_attacks(
     dmg: int,
     arm: int,
     rof: int,
+) -> H:
+    return dmg_from_hit_counts(
+        hit_counts(ContestType.PC_ATTACKS, th_mod - dc_target, th_pool, dc_pool),
+        dmg,
+        arm,
+        rof,
+    )
+
+
+def expected_dmg_frm_rnd_pc_defends(
+    dc_mod: int,
+    dc_pool: int,
+    th_target: int,
+    th_pool: int,
+    dmg: int,
+    arm: int,
+    rof: int,
+) -> H:
+    return dmg_from_hit_counts(
+        hit_counts(ContestType.PC_DEFENDS, th_target - dc_mod, th_pool, dc_pool),
+        dmg,
+        arm,
+        rof,
+    )
+
+
+def expected_dmg_frm_rnd_pc_v_pc(
+    th_mod: int,
+    th_pool: int,
+    dc_mod: int,
+    dc_pool: int,
+    dmg: int,
+    arm: int,
+    rof: int,
+    executor: Optional[Executor] = None,
+) -> H:
+    r"""
+    If *executor* is provided, chunks of the d20 face pairs are evaluated on it (see
+    ``#!python hit_counts_pc_v_pc_chunked``).
+    """
+    net_mod = th_mod - dc_mod
+
+    if executor is None:
+        counts_by_hits = hit_counts(ContestType.PC_VS_PC, net_mod, th_pool, dc_pool)
+    else:
+        counts_by_hits = hit_counts_pc_v_pc_chunked(net_mod, th_pool, dc_pool, executor)
+
+    return dmg_from_hit_counts(counts_by_hits, dmg, arm, rof)
+
+
+def hit_counts(
+    contest_type: ContestType,
+    net_mod: int,
+    th_pool: int,
+    dc_pool: int,
+) -> np.ndarray:
+    r"""
+    Returns the number of ways to score each number of hits (starting at zero) in a
+    contest, where *net_mod* is every fixed modifier or target to hit less every fixed
+    modifier or target to defend (e.g., ``#!python th_mod - dc_target`` when the PC
+    attacks).
+
+    Rather than visiting every combination of dice, the distribution of the difference
+    between the pools is computed once (by convolving one pool's counts with the other's
+    reversed). The d20s only shift that difference, so each face (or pair of faces) is
+    sorted by whether it's a crit hit, a crit miss or neither, and the shifts for each
+    are convolved with the pool difference at once. Hits are ``#!python max(0, margin +
+    1)`` (or at least one for crit hits), which clamps the low end of each margin
+    distribution.
+    """
+    face_pairs = _face_pairs(contest_type)
+
+    return _hit_counts_for_face_pairs(
+        face_pairs,
+        net_mod,
+        th_pool,
+        dc_pool,
+        _counts_dtype(len(face_pairs), th_pool, dc_pool),
+    )
+
+
+def hit_counts_pc_v_pc_chunked(
+    net_mod: int,
+    th_pool: int,
+    dc_pool: int,
+    executor: Executor,
+    num_chunks: int = 20,
+) -> np.ndarray:
+    r"""
+    Equivalent to ``#!python hit_counts(ContestType.PC_VS_PC, net_mod, th_pool,
+    dc_pool)``, but splits the 20×20 grid of d20 face pairs into *num_chunks* chunks
+    (by rows of the attacker's face), evaluates each on *executor*, and sums the
+    results. Each chunk's counts are exact, so the merged counts are too.
+    """
+    face_pairs = _face_pairs(ContestType.PC_VS_PC)
+    dtype = _counts_dtype(len(face_pairs), th_pool, dc_pool)
+    chunk_size = -(-len(face_pairs) // num_chunks)
+    futures = [
+        executor.submit(
+            _hit_counts_for_face_pairs,
+            face_pairs[i : i + chunk_size],
+            net_mod,
+            th_pool,
+            dc_pool,
+            dtype,
+        )
+        for i in range(0, len(face_pairs), chunk_size)
+    ]
+
+    return _merge_hit_counts([future.result() for future in futures], dtype)
+
+
+def dmg_from_hit_counts(counts_by_hits: np.ndarray, dmg: int, arm: int, rof: int) -> H:
+    r"""
+    Maps hit counts (e.g., from ``#!python hit_counts``) to the damage for the round,
+    which is ``#!python min(rof, hits) * max(0, dmg - arm)``.
+    """
+    dmg_per_hit = max(0, dmg - arm)
+    counts_by_capped_hits = list(counts_by_hits[:rof].tolist())
+    counts_by_capped_hits += [0] * (rof + 1 - len(counts_by_capped_hits))
+    counts_by_capped_hits[rof] += sum(counts_by_hits[rof:].tolist())
+
+    return H(
+        (hits * dmg_per_hit, count)
+        for hits, count in enumerate(counts_by_capped_hits)
+        if count
+    ).lowest_terms()
+
+
+def _hit_counts_for_face_pairs(
+    face_pairs: Sequence[_FacePairT],
+    net_mod: int,
+    th_pool: int,
+    dc_pool: int,
+    dtype,
+) -> np.ndarray:
+    normal_shifts, crit_hit_shifts, crit_misses = _crit_classes(face_pairs)
+    # The lowest pool difference is th_pool - 6 * dc_pool
+    pool_diff_counts = np.convolve(
+        _pool_counts(th_pool).astype(dtype), _pool_counts(dc_pool)[::-1].astype(dtype)
+    )
+    pool_diff_lo = th_pool - 6 * dc_pool
+    counts_by_hits = np.zeros(1, dtype=dtype)
+    counts_by_hits[0] = crit_misses * int(pool_diff_counts.sum())
+
+    for (shift_lo, shift_counts), min_hits in (
+        (normal_shifts, 0),
+        (crit_hit_shifts, 1),
+    ):
+        if not len(shift_counts):
+            continue
+
+        margin_counts = np.convolve(shift_counts.astype(dtype), pool_diff_counts)
+        # hits = margin + 1, so index i corresponds to hits of hits_lo + i
+        hits_lo = shift_lo + pool_diff_lo + net_mod + 1
+        counts_by_hits = _add_clamped(counts_by_hits, margin_counts, hits_lo, min_hits)
+
+    return counts_by_hits
+
+
+def _merge_hit_counts(all_counts_by_hits: Sequence[np.ndarray], dtype) -> np.ndarray:
+    merged = np.zeros(max(len(c) for c in all_counts_by_hits), dtype=dtype)
+
+    for counts_by_hits in all_counts_by_hits:
+        merged[: len(counts_by_hits)] += counts_by_hits
+
+    return merged
+
+
+def _counts_dtype(num_face_pairs: int, th_pool: int, dc_pool: int):
+    r"""
+    Returns ``#!python np.int64`` if no count could overflow it, and ``#!python
+    object`` (i.e., Python ints) otherwise.
+    """
+    total = num_face_pairs * 6 ** (th_pool + dc_pool)
+
+    return np.int64 if total <= _INT64_MAX else object
+
+
+def _add_clamped(
+    counts_by_hits: np.ndarray,
+    margin_counts: np.ndarray,
+    hits_lo: int,
+    min_hits: int,
+) -> np.ndarray:
+    r"""
+    Adds *margin_counts* (where index ``#!python i`` has ``#!python hits_lo + i`` hits)
+    to *counts_by_hits*, counting anything with fewer than *min_hits* as *min_hits*.
+    """
+    hits_hi = hits_lo + len(margin_counts)
+    size = max(hits_hi, min_hits + 1)
+
+    if size > len(counts_by_hits):
+        counts_by_hits = np.concatenate(
+            (
+                counts_by_hits,
+                np.zeros(size - len(counts_by_hits), dtype=counts_by_hits.dtype),
+            )
+        )
+
+    num_clamped = max(0, min(min_hits - hits_lo, len(margin_counts)))
+
+    if num_clamped:
+        counts_by_hits[min_hits] += margin_counts[:num_clamped].sum()
+
+    if num_clamped < len(margin_counts):
+        start = hits_lo + num_clamped
+        counts_by_hits[start:hits_hi] += margin_counts[num_clamped:]
+
+    return counts_by_hits
+
+
+def _face_pairs(contest_type: ContestType) -> tuple[_FacePairT, ...]:
+    r"""
+    Returns the d20 faces of each side (where ``#!python None`` means that side doesn't
+    roll one).
+    """
+    if contest_type is ContestType.PC_ATTACKS:
+        return tuple((th_face, None) for th_face in range(1, 21))
+    elif contest_type is ContestType.PC_DEFENDS:
+        return tuple((None, dc_face) for dc_face in range(1, 21))
+    elif contest_type is ContestType.PC_VS_PC:
+        return tuple(
+            (th_face, dc_face) for th_face in range(1, 21) for dc_face in range(1, 21)
+        )
+    else:
+        assert False, f"unrecognized contest type {contest_type}"
+
+
+def _crit_classes(
+    face_pairs: Sequence[_FacePairT],
+) -> tuple[tuple[int, np.ndarray], tuple[int, np.ndarray], int]:
+    r"""
+    Returns the shifts (in the margin) of the d20 faces (or pairs of faces) without
+    crits, of those with crit hits (as the lowest shift and counts of each consecutive
+    shift) and the number of those with crit misses.
+    """
+    normal: dict[int, int] = {}
+    crit_hit: dict[int, int] = {}
+    crit_misses = 0
+
+    for th_face, dc_face in face_pairs:
+        shift = (th_face or 0) - (dc_face or 0)
+        crit = _crit(th_face, dc_face)
+
+        if crit is None:
+            normal[shift] = normal.get(shift, 0) + 1
+        elif crit:
+            crit_hit[shift] = crit_hit.get(shift, 0) + 1
+        else:
+            crit_misses += 1
+
+    return _dense(normal), _dense(crit_hit), crit_misses
+
+
+def _crit(th_face: Optional[int], dc_face: Optional[int]) -> Optional[bool]:
+    r"""
+    Returns ``#!python True`` for a crit hit, ``#!python False`` for a crit miss, or
+    ``#!python None`` otherwise (where a face of ``#!python None`` means that side
+    doesn't roll a d20).
+    """
+    if dc_face is None:
+        # PC attacks
+        return True if th_face == 20 else False if th_face == 1 else None
+    elif th_face is None:
+        # PC defends
+        return False if dc_face == 20 else True if dc_face == 1 else None
+    elif th_face == 20 and dc_face != 20 or th_face != 1 and dc_face == 1:
+        return True
+    elif th_face == 1 and dc_face != 1 or th_face != 20 and dc_face == 20:
+        return False
+    else:
+        return None
+
+
+def _dense(counts: dict[int, int]) -> tuple[int, np.ndarray]:
+    if not counts:
+        return 0, np.zeros(0, dtype=np.int64)
+
+    lo = min(counts)
+    dense = np.zeros(max(counts) - lo + 1, dtype=np.int64)
+
+    for shift, count in counts.items():
+        dense[shift - lo] = count
+
+    return lo, dense
+
+
+def _pool_counts(pool: int) -> np.ndarray:
+    r"""
+    Returns the number of ways to roll each sum of *pool* d6s (from *pool* up), which is
+    computed once per pool size.
+    """
+    try:
+        return _POOL_COUNTS[pool]
+    except KeyError:
+        pass
+
+    h = H({0: 1}) if pool == 0 else pool @ d6
+    counts = np.array(
+        list(h.values()), dtype=np.int64 if 6**pool <= _INT64_MAX else object
+    )
+    counts.flags.writeable = False
+    _POOL_COUNTS[pool] = counts
+
+    return counts
+
+
+def expected_dmg_frm_rnd_pc_attacks_foreach(
+    th_mod: int,
+    th_pool: int,
+    dc_target: int,
+    dc_pool: int,
+    dmg: int,
+    arm: int,
+    rof: int,
 ) -> H:
     def _dependent_term(th_die: HResult, th_pool: HResult, dc_pool: HResult):
         modded_th = th_die.outcome + th_mod + th_pool.outcome
@@ -42,7 +370,7 @@ def expected_dmg_frm_rnd_pc_attacks(
     )
 
 
-def expected_dmg_frm_rnd_pc_defends(
+def expected_dmg_frm_rnd_pc_defends_foreach(
     dc_mod: int,
     dc_pool: int,
     th_target: int,
@@ -71,7 +399,7 @@ def expected_dmg_frm_rnd_pc_defends(
     )
 
 
-def expected_dmg_frm_rnd_pc_v_pc(
+def expected_dmg_frm_rnd_pc_v_pc_foreach(
     th_mod: int,
     th_pool: int,
     dc_mod: int,
@@ -111,3 +439,70 @@ def expected_dmg_frm_rnd_pc_v_pc(
         dc_die=d20,
         dc_pool=H({0: 1}) if dc_pool == 0 else dc_pool @ d6,
     )
+
+
+class TestDpr(unittest.TestCase):
+    pools = ((0, 0), (1, 0), (0, 2), (2, 1))
+    # (dmg, arm, rof)
+    dmgs = ((5, 2, 3), (3, 4, 1), (8, 0, 10))
+
+    def test_pc_attacks(self):
+        for th_pool, dc_pool in self.pools:
+            for th_mod, dc_target in ((0, 10), (5, 12), (-3, 25), (9, -5)):
+                for dmg, arm, rof in self.dmgs:
+                    args = (th_mod, th_pool, dc_target, dc_pool, dmg, arm, rof)
+                    self.assertEqual(
+                        expected_dmg_frm_rnd_pc_attacks(*args),
+                        expected_dmg_frm_rnd_pc_attacks_foreach(*args),
+                        msg=f"args = {args}",
+                    )
+
+    def test_pc_defends(self):
+        for dc_pool, th_pool in self.pools:
+            for dc_mod, th_target in ((0, 10), (5, 12), (-3, 25), (9, -5)):
+                for dmg, arm, rof in self.dmgs:
+                    args = (dc_mod, dc_pool, th_target, th_pool, dmg, arm, rof)
+                    self.assertEqual(
+                        expected_dmg_frm_rnd_pc_defends(*args),
+                        expected_dmg_frm_rnd_pc_defends_foreach(*args),
+                        msg=f"args = {args}",
+                    )
+
+    def test_pc_v_pc(self):
+        # The reference visits every pair of d20s, so fewer combinations are checked
+        for (th_pool, dc_pool), (th_mod, dc_mod), (dmg, arm, rof) in zip(
+            self.pools + self.pools,
+            ((0, 0), (4, -2), (-6, 3), (2, 2), (19, 0), (0, 21), (3, 1), (-1, 0)),
+            self.dmgs * 3,
+        ):
+            args = (th_mod, th_pool, dc_mod, dc_pool, dmg, arm, rof)
+            self.assertEqual(
+                expected_dmg_frm_rnd_pc_v_pc(*args),
+                expected_dmg_frm_rnd_pc_v_pc_foreach(*args),
+                msg=f"args = {args}",
+            )
+
+    def test_pc_v_pc_chunked(self):
+        with ThreadPoolExecutor(2) as executor:
+            for th_pool, dc_pool in self.pools:
+                for net_mod in (-20, -3, 0, 7):
+                    for num_chunks in (1, 3, 20, 400):
+                        self.assertEqual(
+                            hit_counts_pc_v_pc_chunked(
+                                net_mod, th_pool, dc_pool, executor, num_chunks
+                            ).tolist(),
+                            hit_counts(
+                                ContestType.PC_VS_PC, net_mod, th_pool, dc_pool
+                            ).tolist(),
+                            msg=f"pools = {(th_pool, dc_pool)}; net_mod = {net_mod}; num_chunks = {num_chunks}",
+                        )
+
+    def test_large_pools(self):
+        # Counts for pools this large overflow int64, so they're kept as Python ints
+        counts_by_hits = hit_counts(ContestType.PC_VS_PC, 0, 20, 20)
+        self.assertEqual(counts_by_hits.dtype, object)
+        self.assertEqual(sum(counts_by_hits.tolist()), 20 * 20 * 6**40)
+
+
+if __name__ == "__main__":
+    unittest.main()
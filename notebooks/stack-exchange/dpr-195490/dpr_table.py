@@ -0,0 +1,285 @@
+import argparse
+import os
+import sys
+import tempfile
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Sequence
+
+import numpy as np
+from dpr import ContestType, dmg_from_hit_counts, hit_counts
+from dyce import H
+
+# Bump this whenever the layout of the table file changes
+TABLE_VERSION = 1
+
+DEFAULT_TABLE_PATH = os.path.join(os.path.dirname(__file__), "dpr_table.npz")
+
+# These mirror the ranges of the sliders in showit.py
+MAX_POOL = 10
+MAX_ROF = 10
+NET_MOD_RANGES = {
+    # th_mod - dc_target
+    ContestType.PC_ATTACKS: range(-10 - 30, 10 - 1 + 1),
+    # th_target - dc_mod
+    ContestType.PC_DEFENDS: range(1 - 10, 30 + 10 + 1),
+    # th_mod - dc_mod
+    ContestType.PC_VS_PC: range(-10 - 10, 10 + 10 + 1),
+}
+
+
+class HitCountsTable:
+    r"""
+    Precomputed hit counts (as returned by ``#!python dpr.hit_counts``) for every
+    contest type, net modifier and pair of pools the sliders can select. Counts for
+    ``#!python MAX_ROF`` or more hits are combined, which is all
+    ``#!python dpr.dmg_from_hit_counts`` needs for a rate of fire up to
+    ``#!python MAX_ROF``. Anything outside the table is computed instead.
+    """
+
+    def __init__(self, tables: dict[ContestType, tuple[int, np.ndarray]]):
+        # contest type -> (lowest net modifier, counts indexed by [net_mod - lowest,
+        # th_pool, dc_pool, hits])
+        self._tables = tables
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_TABLE_PATH) -> "HitCountsTable":
+        with np.load(path, allow_pickle=False) as npz:
+            if int(npz["version"]) != TABLE_VERSION:
+                raise ValueError(
+                    f"{path} has version {int(npz['version'])}, but {TABLE_VERSION} is required (rebuild it with python dpr_table.py)"
+                )
+
+            return cls(
+                {
+                    contest_type: (
+                        int(npz[f"{contest_type.name}_net_mod_lo"]),
+                        npz[contest_type.name],
+                    )
+                    for contest_type in ContestType
+                }
+            )
+
+    def save(self, path: str = DEFAULT_TABLE_PATH) -> None:
+        arrays: dict[str, np.ndarray] = {"version": np.array(TABLE_VERSION)}
+
+        for contest_type, (net_mod_lo, counts) in self._tables.items():
+            arrays[contest_type.name] = counts
+            arrays[f"{contest_type.name}_net_mod_lo"] = np.array(net_mod_lo)
+
+        with open(path, "wb") as f:
+            np.savez_compressed(f, **arrays)
+
+    def hit_counts(
+        self,
+        contest_type: ContestType,
+        net_mod: int,
+        th_pool: int,
+        dc_pool: int,
+    ) -> Optional[np.ndarray]:
+        r"""
+        Returns the (combined) hit counts from the table, or ``#!python None`` if they
+        aren't in it.
+        """
+        net_mod_lo, counts = self._tables[contest_type]
+        i = net_mod - net_mod_lo
+
+        if (
+            0 <= i < counts.shape[0]
+            and 0 <= th_pool < counts.shape[1]
+            and 0 <= dc_pool < counts.shape[2]
+        ):
+            return counts[i, th_pool, dc_pool]
+        else:
+            return None
+
+    def expected_dmg(
+        self,
+        contest_type: ContestType,
+        net_mod: int,
+        th_pool: int,
+        dc_pool: int,
+        dmg: int,
+        arm: int,
+        rof: int,
+    ) -> H:
+        counts_by_hits = (
+            self.hit_counts(contest_type, net_mod, th_pool, dc_pool)
+            if rof <= MAX_ROF
+            else None
+        )
+
+        if counts_by_hits is None:
+            counts_by_hits = hit_counts(contest_type, net_mod, th_pool, dc_pool)
+
+        return dmg_from_hit_counts(counts_by_hits, dmg, arm, rof)
+
+
+def load_table(path: str = DEFAULT_TABLE_PATH) -> Optional[HitCountsTable]:
+    r"""
+    Returns the table at *path*, or ``#!python None`` if it is missing or stale (in
+    which case callers should compute what they need instead).
+    """
+    try:
+        return HitCountsTable.load(path)
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def build_table(workers: Optional[int] = None) -> HitCountsTable:
+    r"""
+    Computes every entry of the table, one net modifier per task, on a process pool of
+    *workers* (or in this process if *workers* is ``#!python 1``).
+    """
+    tasks = [
+        (contest_type, net_mod)
+        for contest_type, net_mods in NET_MOD_RANGES.items()
+        for net_mod in net_mods
+    ]
+
+    if workers == 1:
+        rows = list(map(_build_row, tasks))
+    else:
+        with ProcessPoolExecutor(workers) as executor:
+            rows = list(executor.map(_build_row, tasks))
+
+    rows_by_task = dict(zip(tasks, rows))
+
+    return HitCountsTable(
+        {
+            contest_type: (
+                net_mods.start,
+                np.stack([rows_by_task[contest_type, n] for n in net_mods]),
+            )
+            for contest_type, net_mods in NET_MOD_RANGES.items()
+        }
+    )
+
+
+def _build_row(task: tuple[ContestType, int]) -> np.ndarray:
+    contest_type, net_mod = task
+    row = np.zeros((MAX_POOL + 1, MAX_POOL + 1, MAX_ROF + 1), dtype=np.int64)
+
+    for th_pool in range(MAX_POOL + 1):
+        for dc_pool in range(MAX_POOL + 1):
+            counts_by_hits = hit_counts(contest_type, net_mod, th_pool, dc_pool)
+            capped = min(len(counts_by_hits), MAX_ROF)
+            row[th_pool, dc_pool, :capped] = counts_by_hits[:capped]
+            row[th_pool, dc_pool, MAX_ROF] = counts_by_hits[MAX_ROF:].sum()
+
+    return row
+
+
+def _parse_args(argv: Optional[Sequence[str]]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Rebuild the precomputed hit counts used by showit.py."
+    )
+    parser.add_argument(
+        "-o", "--output", default=DEFAULT_TABLE_PATH, help="where to write the table"
+    )
+    parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        default=None,
+        help="number of worker processes (defaults to one per CPU)",
+    )
+
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    args = _parse_args(argv)
+    build_table(args.workers).save(args.output)
+    print(f"wrote {args.output}", file=sys.stderr)
+
+    return 0
+
+
+class TestHitCountsTable(unittest.TestCase):
+    def test_default_table(self):
+        table = load_table()
+        self.assertIsNotNone(table)
+        assert table is not None
+
+        for contest_type, net_mods in NET_MOD_RANGES.items():
+            for net_mod in (net_mods[0], net_mods[len(net_mods) // 2], net_mods[-1]):
+                for th_pool, dc_pool in ((0, 0), (3, 7), (MAX_POOL, MAX_POOL)):
+                    for dmg, arm, rof in ((5, 2, 1), (8, 0, MAX_ROF)):
+                        self.assertEqual(
+                            table.expected_dmg(
+                                contest_type, net_mod, th_pool, dc_pool, dmg, arm, rof
+                            ),
+                            dmg_from_hit_counts(
+                                hit_counts(contest_type, net_mod, th_pool, dc_pool),
+                                dmg,
+                                arm,
+                                rof,
+                            ),
+                            msg=f"contest_type = {contest_type}; net_mod = {net_mod}; pools = {(th_pool, dc_pool)}; rof = {rof}",
+                        )
+
+    def test_outside_table(self):
+        table = HitCountsTable(
+            {
+                contest_type: (0, np.stack([_build_row((contest_type, 0))]))
+                for contest_type in ContestType
+            }
+        )
+        self.assertIsNotNone(table.hit_counts(ContestType.PC_VS_PC, 0, 2, 2))
+
+        for net_mod, th_pool, dc_pool, rof in (
+            (1, 2, 2, 3),  # net modifier
+            (0, MAX_POOL + 1, 2, 3),  # pool
+            (0, 2, 2, MAX_ROF + 1),  # rate of fire
+        ):
+            if rof <= MAX_ROF:
+                self.assertIsNone(
+                    table.hit_counts(ContestType.PC_VS_PC, net_mod, th_pool, dc_pool)
+                )
+
+            self.assertEqual(
+                table.expected_dmg(
+                    ContestType.PC_VS_PC, net_mod, th_pool, dc_pool, 5, 2, rof
+                ),
+                dmg_from_hit_counts(
+                    hit_counts(ContestType.PC_VS_PC, net_mod, th_pool, dc_pool),
+                    5,
+                    2,
+                    rof,
+                ),
+                msg=f"net_mod = {net_mod}; pools = {(th_pool, dc_pool)}; rof = {rof}",
+            )
+
+    def test_save_and_load(self):
+        table = HitCountsTable(
+            {
+                contest_type: (-1, np.stack([_build_row((contest_type, -1))]))
+                for contest_type in ContestType
+            }
+        )
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "table.npz")
+            self.assertIsNone(load_table(path))
+            table.save(path)
+            loaded = load_table(path)
+            assert loaded is not None
+            self.assertEqual(
+                loaded.hit_counts(ContestType.PC_ATTACKS, -1, 4, 5).tolist(),
+                table.hit_counts(ContestType.PC_ATTACKS, -1, 4, 5).tolist(),  # type: ignore
+            )
+
+            with np.load(path) as npz:
+                arrays = dict(npz)
+
+            arrays["version"] = np.array(TABLE_VERSION + 1)
+
+            with open(path, "wb") as f:
+                np.savez_compressed(f, **arrays)
+
+            self.assertIsNone(load_table(path))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,15 +1,17 @@
+from typing import Optional
+
 from anydyce import HPlotterChooser
-from dpr import (
-    ContestType,
-    expected_dmg_frm_rnd_pc_attacks,
-    expected_dmg_frm_rnd_pc_defends,
-    expected_dmg_frm_rnd_pc_v_pc,
-)
+from dpr import ContestType, dmg_from_hit_counts, hit_counts
+from dpr_table import HitCountsTable, load_table
 from IPython.display import display
 from ipywidgets import widgets
 
 
-def showit():
+def showit(table: Optional[HitCountsTable] = None):
+    if table is None:
+        # If this is still None (i.e., there's no table), each change is computed
+        table = load_table()
+
     def _display(
         contest_type: ContestType,
         th_target: int,
@@ -27,42 +29,29 @@ def showit():
             th_target_widget.layout.visibility = "hidden"
             dc_mod_widget.layout.visibility = "hidden"
             dc_target_widget.layout.visibility = "visible"
-            expected_dmg = expected_dmg_frm_rnd_pc_attacks(
-                th_mod=th_mod,
-                th_pool=th_pool,
-                dc_target=dc_target,
-                dc_pool=dc_pool,
-                dmg=dmg,
-                arm=arm,
-                rof=rof,
-            )
+            net_mod = th_mod - dc_target
         elif contest_type is ContestType.PC_DEFENDS:
             th_mod_widget.layout.visibility = "hidden"
             th_target_widget.layout.visibility = "visible"
             dc_mod_widget.layout.visibility = "visible"
             dc_target_widget.layout.visibility = "hidden"
-            expected_dmg = expected_dmg_frm_rnd_pc_defends(
-                dc_pool=dc_pool,
-                dc_mod=dc_mod,
-                th_target=th_target,
-                th_pool=th_pool,
-                dmg=dmg,
-                arm=arm,
-                rof=rof,
-            )
+            net_mod = th_target - dc_mod
         elif contest_type is ContestType.PC_VS_PC:
             th_mod_widget.layout.visibility = "visible"
             th_target_widget.layout.visibility = "hidden"
             dc_mod_widget.layout.visibility = "visible"
             dc_target_widget.layout.visibility = "hidden"
-            expected_dmg = expected_dmg_frm_rnd_pc_v_pc(
-                th_mod=th_mod,
-                th_pool=th_pool,
-                dc_mod=dc_mod,
-                dc_pool=dc_pool,
-                dmg=dmg,
-                arm=arm,
-                rof=rof,
+            net_mod = th_mod - dc_mod
+        else:
+            assert False, f"unrecognized contest type {contest_type}"
+
+        if table is None:
+            expected_dmg = dmg_from_hit_counts(
+                hit_counts(contest_type, net_mod, th_pool, dc_pool), dmg, arm, rof
+            )
+        else:
+            expected_dmg = table.expected_dmg(
+                contest_type, net_mod, th_pool, dc_pool, dmg, arm, rof
             )
 
         chooser.update_hs(
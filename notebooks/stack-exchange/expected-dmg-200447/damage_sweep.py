@@ -0,0 +1,253 @@
+import unittest
+from concurrent.futures import Executor, ThreadPoolExecutor
+from dataclasses import dataclass
+from fractions import Fraction
+from typing import Mapping, Optional, Sequence
+
+import numpy as np
+from dyce import H
+
+# Local imports
+from expected_damage import (
+    CRITS_IMPROVED,
+    CRITS_NORMAL,
+    TO_HIT_ADV,
+    TO_HIT_NORMAL,
+    HitResult,
+    crit_foreach,
+    crit_normal,
+    dmg_by_tier,
+    expected_damage,
+    expected_damage_foreach,
+    to_hit_tiers,
+)
+
+SWEEP_ACS = tuple(range(10, 26))
+SWEEP_HIT_BONUSES = tuple(range(-2, 13))
+SWEEP_PERCENTILES = (10, 50, 90)
+
+
+@dataclass(frozen=True)
+class DamageSweep:
+    r"""
+    Statistics of expected damage for every damage, AC and hit bonus. *table* is
+    indexed by ``#!python [dmg, ac, hit_bonus, stat]``, where the stats are the mean,
+    the standard deviation, and then each of *percentiles* (as the lowest damage with
+    at least that cumulative probability).
+    """
+
+    dmg_names: tuple[str, ...]
+    acs: tuple[int, ...]
+    hit_bonuses: tuple[int, ...]
+    percentiles: tuple[int, ...]
+    table: np.ndarray
+
+    @property
+    def stat_names(self) -> tuple[str, ...]:
+        return sweep_stat_names(self.percentiles)
+
+    def stat(self, stat_name: str) -> np.ndarray:
+        r"""
+        Returns the table for *stat_name* (one of ``#!python stat_names``), indexed by
+        ``#!python [dmg, ac, hit_bonus]``.
+        """
+        return self.table[..., self.stat_names.index(stat_name)]
+
+
+def sweep_stat_names(percentiles: Sequence[int] = SWEEP_PERCENTILES) -> tuple[str, ...]:
+    r"""
+    Returns the names of the stats of a ``#!python damage_sweep`` with *percentiles*
+    (e.g., for choosing one before sweeping).
+    """
+    return ("mean", "stdev") + tuple(f"p{p}" for p in percentiles)
+
+
+def damage_sweep(
+    to_hit: H,
+    crits: tuple[int, ...],
+    dmgs: Mapping[str, tuple[H, H]],  # name -> (normal_dmg, extra_crit_dmg)
+    acs: Sequence[int] = SWEEP_ACS,
+    hit_bonuses: Sequence[int] = SWEEP_HIT_BONUSES,
+    percentiles: Sequence[int] = SWEEP_PERCENTILES,
+    executor: Optional[Executor] = None,
+) -> DamageSweep:
+    r"""
+    Computes statistics of ``#!python expected_damage`` for each of *dmgs* across every
+    AC and hit bonus (where a roll hits if it's at least the AC less the bonus). Grid
+    points only differ in how often each ``#!python HitResult`` tier comes up, so the
+    damage for each tier is computed once per damage, and every grid point's damage is
+    a weighted mix of those (as one matrix product). Damages are evaluated on
+    *executor*, if provided.
+    """
+    acs = tuple(acs)
+    hit_bonuses = tuple(hit_bonuses)
+    percentiles = tuple(percentiles)
+    args = [
+        (to_hit, crits, normal_dmg, extra_crit_dmg, acs, hit_bonuses, percentiles)
+        for normal_dmg, extra_crit_dmg in dmgs.values()
+    ]
+
+    if executor is None:
+        tables = [_sweep_one(*a) for a in args]
+    else:
+        tables = list(executor.map(_sweep_one, *zip(*args)))
+
+    return DamageSweep(
+        dmg_names=tuple(dmgs),
+        acs=acs,
+        hit_bonuses=hit_bonuses,
+        percentiles=percentiles,
+        table=np.stack(tables),
+    )
+
+
+def _sweep_one(
+    to_hit: H,
+    crits: tuple[int, ...],
+    normal_dmg: H,
+    extra_crit_dmg: H,
+    acs: tuple[int, ...],
+    hit_bonuses: tuple[int, ...],
+    percentiles: tuple[int, ...],
+) -> np.ndarray:
+    normal_dmg_ltd, crit_dmg_ltd = dmg_by_tier(normal_dmg, extra_crit_dmg)
+    tier_dmgs = (H({0: 1}), normal_dmg_ltd, crit_dmg_ltd)
+    dmg_outcomes = np.array(
+        sorted(set().union(*(dmg.outcomes() for dmg in tier_dmgs))), dtype=float
+    )
+    # tier -> probability of each damage outcome
+    tier_pmfs = np.array(
+        [
+            [dmg.get(outcome, 0) / dmg.total for outcome in dmg_outcomes]
+            for dmg in tier_dmgs
+        ]
+    )
+
+    # Many grid points share a target, so each distinct target is mixed once
+    targets = sorted({ac - hit_bonus for ac in acs for hit_bonus in hit_bonuses})
+    tiers = to_hit_tiers(to_hit)
+    tier_weights = np.array(
+        [
+            [
+                tier_counts[hit_result] / tiers.total
+                for hit_result in (HitResult.MISS, HitResult.HIT, HitResult.CRIT)
+            ]
+            for tier_counts in (tiers.tier_counts(target, crits) for target in targets)
+        ]
+    )
+    pmfs = tier_weights @ tier_pmfs  # target -> probability of each damage outcome
+    means = pmfs @ dmg_outcomes
+    stdevs = np.sqrt(np.maximum(pmfs @ dmg_outcomes**2 - means**2, 0.0))
+    cdfs = np.cumsum(pmfs, axis=1)
+    stats_by_target = np.column_stack(
+        [means, stdevs]
+        + [
+            # Tolerate rounding so that, e.g., a CDF of exactly one half counts as the
+            # median
+            dmg_outcomes[np.argmax(cdfs >= p / 100 - 1e-9, axis=1)]
+            for p in percentiles
+        ]
+    )
+    target_indexes = np.array(
+        [[targets.index(ac - hit_bonus) for hit_bonus in hit_bonuses] for ac in acs]
+    )
+
+    return stats_by_target[target_indexes]
+
+
+_sweep = damage_sweep(
+    TO_HIT_NORMAL, CRITS_NORMAL, {"d6+3": (H(6) + 3, H(6))}, acs=(15,), hit_bonuses=(5,)
+)
+assert _sweep.table.shape == (1, 1, 1, 5)
+assert _sweep.stat_names == sweep_stat_names() == ("mean", "stdev", "p10", "p50", "p90")
+assert np.isclose(
+    _sweep.stat("mean")[0, 0, 0],
+    float(expected_damage(crit_normal(10, TO_HIT_NORMAL), H(6) + 3, H(6)).mean()),
+)
+
+
+class TestDamageSweep(unittest.TestCase):
+    dmgs = {
+        "d6+3": (H(6) + 3, H(6)),
+        "d4-3": (H(4) - 3, H(4)),
+        "2d8": (2 @ H(8), 2 @ H(8)),
+    }
+    acs = (8, 15, 24)
+    hit_bonuses = (-2, 0, 5, 12)
+    percentiles = (1, 25, 50, 99)
+
+    def test_sweep(self):
+        for to_hit, crits in (
+            (TO_HIT_NORMAL, CRITS_NORMAL),
+            (TO_HIT_ADV, CRITS_IMPROVED),
+        ):
+            sweep = damage_sweep(
+                to_hit, crits, self.dmgs, self.acs, self.hit_bonuses, self.percentiles
+            )
+            self.assertEqual(sweep.dmg_names, tuple(self.dmgs))
+            self.assertEqual(
+                sweep.table.shape,
+                (
+                    len(self.dmgs),
+                    len(self.acs),
+                    len(self.hit_bonuses),
+                    len(sweep.stat_names),
+                ),
+            )
+
+            for i, (normal_dmg, extra_crit_dmg) in enumerate(self.dmgs.values()):
+                for j, ac in enumerate(self.acs):
+                    for k, hit_bonus in enumerate(self.hit_bonuses):
+                        dmg = expected_damage_foreach(
+                            crit_foreach(ac - hit_bonus, to_hit, crits),
+                            normal_dmg,
+                            extra_crit_dmg,
+                        )
+                        expected = [float(dmg.mean()), float(dmg.stdev())] + [
+                            _percentile(dmg, p) for p in self.percentiles
+                        ]
+                        for stat_name, actual, expected_stat in zip(
+                            sweep.stat_names, sweep.table[i, j, k], expected
+                        ):
+                            self.assertAlmostEqual(
+                                actual,
+                                expected_stat,
+                                msg=f"dmg = {sweep.dmg_names[i]}; ac = {ac}; hit_bonus = {hit_bonus}; stat = {stat_name}",
+                            )
+
+    def test_executor(self):
+        sweep = damage_sweep(TO_HIT_NORMAL, CRITS_NORMAL, self.dmgs)
+
+        with ThreadPoolExecutor(2) as executor:
+            self.assertTrue(
+                np.array_equal(
+                    damage_sweep(
+                        TO_HIT_NORMAL, CRITS_NORMAL, self.dmgs, executor=executor
+                    ).table,
+                    sweep.table,
+                )
+            )
+
+    def test_stat(self):
+        sweep = damage_sweep(TO_HIT_NORMAL, CRITS_NORMAL, self.dmgs)
+        self.assertEqual(sweep.stat_names, sweep_stat_names())
+
+        for i, stat_name in enumerate(sweep.stat_names):
+            self.assertTrue(np.array_equal(sweep.stat(stat_name), sweep.table[..., i]))
+
+
+def _percentile(h: H, p: int) -> float:
+    # The lowest outcome with at least p percent cumulative probability
+    at_most = Fraction(0)
+
+    for outcome, count in sorted(h.items()):
+        at_most += Fraction(count, h.total)
+
+        if at_most >= Fraction(p, 100):
+            return float(outcome)
+
+    assert False, "should never be here"
+
+
+if __name__ == "__main__":
+    unittest.main()
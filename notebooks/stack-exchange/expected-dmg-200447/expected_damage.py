@@ -1,10 +1,17 @@
+import unittest
 from enum import IntEnum, auto
-from functools import partial
-from typing import Optional, Union
+from functools import lru_cache, partial
+from itertools import product
+from math import lcm
+from typing import Iterable, Optional, Union
 
-from dyce import H, P
+import numpy as np
+from dyce import H
 from dyce.evaluation import HResult, foreach
 
+# Local imports
+from order_stats import highest, lowest
+
 
 class HitResult(IntEnum):
     MISS = 0
@@ -13,19 +20,27 @@ class HitResult(IntEnum):
 
 
 TO_HIT_NORMAL = H(20)
-TO_HIT_DISADV = P(TO_HIT_NORMAL, TO_HIT_NORMAL).h(0)
-TO_HIT_ADV = P(TO_HIT_NORMAL, TO_HIT_NORMAL).h(-1)
+TO_HIT_DISADV = lowest(TO_HIT_NORMAL, 2)
+TO_HIT_ADV = highest(TO_HIT_NORMAL, 2)
+TO_HIT_ELVEN_ACCURACY = highest(TO_HIT_NORMAL, 3)
+
+CRITS_NORMAL = (20,)
+CRITS_IMPROVED = (19, 20)
+CRITS_SUPERIOR = (18, 19, 20)
+
+_TO_HIT_TIERS_CACHE_SIZE = 64
 
 
 def _limit(h: H, lo: Optional[int] = None, hi: Optional[int] = None) -> H:
-    def _eval(h_result: HResult) -> Union[H, int]:
-        res = h_result.outcome
-        res = res if lo is None else max(res, lo)
-        res = res if hi is None else min(res, hi)
+    # Remaps outcomes directly (outcomes that land on the same value are combined)
+    return h.umap(lambda outcome: _clamp(outcome, lo, hi))
+
 
-        return res
+def _clamp(outcome, lo: Optional[int], hi: Optional[int]):
+    outcome = outcome if lo is None else max(outcome, lo)
+    outcome = outcome if hi is None else min(outcome, hi)
 
-    return foreach(_eval, h_result=h)
+    return outcome
 
 
 assert _limit(H(6), lo=2) == H({2: 2, 3: 1, 4: 1, 5: 1, 6: 1})
@@ -33,37 +48,69 @@ assert _limit(H(6), hi=5) == H({1: 1, 2: 1, 3: 1, 4: 1, 5: 2})
 assert _limit(H(6), lo=2, hi=5) == H({2: 2, 3: 1, 4: 1, 5: 2})
 
 
-def _to_hit_result(
-    to_hit: HResult,
-    *,
-    target: int,
-    crits: tuple[int, ...],
-) -> Union[H, int]:
-    if to_hit.outcome in crits:
-        return HitResult.CRIT
-    elif to_hit.outcome == 1 or to_hit.outcome < target:
-        return HitResult.MISS
-    else:
-        return HitResult.HIT
+class ToHitTiers:
+    r"""
+    Classifies outcomes of *to_hit* into ``#!python HitResult`` tiers. The outcomes and
+    counts are laid out as arrays once, so each classification (for a given target and
+    crit range) is just a few masks over them. Crits take precedence, then a natural 1
+    or anything below the target misses, and everything else hits.
+    """
+
+    def __init__(self, to_hit: H):
+        self.to_hit = to_hit
+        self.total = to_hit.total
+        self._outcomes = np.array(list(to_hit.outcomes()))
+        self._counts = np.array(list(to_hit.counts()), dtype=object)
+
+    def tier_counts(self, target: int, crits: tuple[int, ...]) -> dict[HitResult, int]:
+        crit_mask = np.isin(self._outcomes, crits)
+        miss_mask = ~crit_mask & ((self._outcomes == 1) | (self._outcomes < target))
+        hit_mask = ~crit_mask & ~miss_mask
+
+        return {
+            HitResult.MISS: int(self._counts[miss_mask].sum()),
+            HitResult.HIT: int(self._counts[hit_mask].sum()),
+            HitResult.CRIT: int(self._counts[crit_mask].sum()),
+        }
+
+    def h(self, target: int, crits: tuple[int, ...]) -> H:
+        return H(
+            (hit_result, count)
+            for hit_result, count in self.tier_counts(target, crits).items()
+            if count
+        )
+
+
+def to_hit_tiers(to_hit: H) -> ToHitTiers:
+    r"""
+    Returns a ``#!python ToHitTiers`` for *to_hit* in lowest terms (so its counts are
+    out of its own ``#!python total``, which may be less than *to_hit*'s). Equal
+    histograms share one, which is built the first time it's needed (up to ``#!python
+    _TO_HIT_TIERS_CACHE_SIZE``, least recently used first).
+    """
+    return _to_hit_tiers(to_hit.lowest_terms())
+
+
+@lru_cache(maxsize=_TO_HIT_TIERS_CACHE_SIZE)
+def _to_hit_tiers(to_hit: H) -> ToHitTiers:
+    # Equal histograms hash and compare alike regardless of the scale of their counts,
+    # so only ever called with histograms in lowest terms
+    return ToHitTiers(to_hit)
 
 
 def crit_normal(target: int, to_hit: H) -> H:
-    return foreach(
-        partial(_to_hit_result, target=target, crits=(20,)),
-        to_hit=to_hit,
-    )
+    return to_hit_tiers(to_hit).h(target, CRITS_NORMAL)
 
 
 assert crit_normal(10, TO_HIT_NORMAL) == H(
     {HitResult.MISS: 9, HitResult.HIT: 10, HitResult.CRIT: 1}
 )
+assert to_hit_tiers(TO_HIT_NORMAL) is to_hit_tiers(H(20))
+assert to_hit_tiers(H({i: 2 for i in range(1, 21)})).total == 20
 
 
 def crit_improved(target: int, to_hit: H) -> H:
-    return foreach(
-        partial(_to_hit_result, target=target, crits=(19, 20)),
-        to_hit=to_hit,
-    )
+    return to_hit_tiers(to_hit).h(target, CRITS_IMPROVED)
 
 
 assert crit_improved(10, TO_HIT_NORMAL) == H(
@@ -72,10 +119,7 @@ assert crit_improved(10, TO_HIT_NORMAL) == H(
 
 
 def crit_superior(target: int, to_hit: H) -> H:
-    return foreach(
-        partial(_to_hit_result, target=target, crits=(18, 19, 20)),
-        to_hit=to_hit,
-    )
+    return to_hit_tiers(to_hit).h(target, CRITS_SUPERIOR)
 
 
 assert crit_superior(10, TO_HIT_NORMAL) == H(
@@ -88,20 +132,88 @@ def expected_damage(
     normal_dmg: H,  # e.g., H(6) + 3 for 1d6+3
     extra_crit_dmg: H,  # e.g., H(6) for 1d6
 ) -> H:
+    tier_counts = {hit_result: 0 for hit_result in HitResult}
+
+    for outcome, count in expected_to_hit.items():
+        # Anything other than a hit or crit is a miss
+        hit_result = (
+            outcome if outcome in (HitResult.HIT, HitResult.CRIT) else HitResult.MISS
+        )
+        tier_counts[HitResult(hit_result)] += count
+
+    return _mix_by_tier(tier_counts, *dmg_by_tier(normal_dmg, extra_crit_dmg))
+
+
+def expected_damage_batch(
+    to_hit: H,
+    targets: Iterable[int],
+    crit_ranges: Iterable[tuple[int, ...]],
+    dmgs: Iterable[tuple[H, H]],  # (normal_dmg, extra_crit_dmg) pairs
+) -> dict[tuple[int, tuple[int, ...], H, H], H]:
+    r"""
+    Returns ``#!python expected_damage`` for every combination of target, crit range
+    and damage, keyed by ``#!python (target, crits, normal_dmg, extra_crit_dmg)``. The
+    classification of *to_hit* and the limited damage for each pair are shared by every
+    combination that uses them.
+    """
+    tiers = to_hit_tiers(to_hit)
+    tier_dmgs_by_dmgs = {
+        (normal_dmg, extra_crit_dmg): dmg_by_tier(normal_dmg, extra_crit_dmg)
+        for normal_dmg, extra_crit_dmg in dmgs
+    }
+    tier_counts_by_target_crits = {
+        (target, crits): tiers.tier_counts(target, crits)
+        for target, crits in product(targets, crit_ranges)
+    }
+
+    return {
+        (target, crits, normal_dmg, extra_crit_dmg): _mix_by_tier(
+            tier_counts, *tier_dmgs
+        )
+        for (target, crits), tier_counts in tier_counts_by_target_crits.items()
+        for (normal_dmg, extra_crit_dmg), tier_dmgs in tier_dmgs_by_dmgs.items()
+    }
+
+
+def dmg_by_tier(normal_dmg: H, extra_crit_dmg: H) -> tuple[H, H]:
+    r"""
+    Returns the damage for a hit and for a crit (neither of which can be negative), in
+    that order. A miss does no damage.
+    """
     # Minimum normal damage is 0
     normal_dmg_ltd = _limit(normal_dmg, lo=0)
     # Minimum additional crit damage is 0
     crit_dmg_ltd = normal_dmg_ltd + _limit(extra_crit_dmg, lo=0)
 
-    def _eval(expected_to_hit: HResult) -> Union[H, int]:
-        if expected_to_hit.outcome == HitResult.CRIT:
-            return crit_dmg_ltd
-        elif expected_to_hit.outcome == HitResult.HIT:
-            return normal_dmg_ltd
-        else:
-            return 0
+    return normal_dmg_ltd, crit_dmg_ltd
 
-    return foreach(_eval, expected_to_hit=expected_to_hit)
+
+def _mix_by_tier(
+    tier_counts: dict[HitResult, int],
+    normal_dmg_ltd: H,
+    crit_dmg_ltd: H,
+) -> H:
+    r"""
+    Mixes the damage for each tier (none for a miss) weighted by the tier's count in a
+    single aggregation, scaling each damage histogram to a common total first.
+    """
+    dmg_by_tier = {
+        HitResult.MISS: H({0: 1}),
+        HitResult.HIT: normal_dmg_ltd,
+        HitResult.CRIT: crit_dmg_ltd,
+    }
+    weighted = [
+        (dmg_by_tier[hit_result], count)
+        for hit_result, count in tier_counts.items()
+        if count
+    ]
+    common_total = lcm(*(dmg.total for dmg, _ in weighted))
+
+    return H(
+        (outcome, dmg_count * weight * (common_total // dmg.total))
+        for dmg, weight in weighted
+        for outcome, dmg_count in dmg.items()
+    ).lowest_terms()
 
 
 assert expected_damage(crit_improved(13, TO_HIT_DISADV), H(6) + 3, H(6)) == H(
@@ -155,3 +267,134 @@ assert expected_damage(crit_improved(13, TO_HIT_ADV), H(6) + 3, H(6)) == H(
         15: 19,
     }
 )
+assert expected_damage_batch(
+    TO_HIT_NORMAL, (13,), (CRITS_NORMAL, CRITS_IMPROVED), ((H(6) + 3, H(6)),)
+) == {
+    (13, crits, H(6) + 3, H(6)): expected_damage(
+        crit_method(13, TO_HIT_NORMAL), H(6) + 3, H(6)
+    )
+    for crits, crit_method in (
+        (CRITS_NORMAL, crit_normal),
+        (CRITS_IMPROVED, crit_improved),
+    )
+}
+
+
+def crit_foreach(target: int, to_hit: H, crits: tuple[int, ...]) -> H:
+    r"""
+    Reference for ``#!python ToHitTiers.h`` that classifies each outcome of *to_hit* on
+    its own.
+    """
+    return foreach(
+        partial(_to_hit_result, target=target, crits=crits),
+        to_hit=to_hit,
+    )
+
+
+def _to_hit_result(
+    to_hit: HResult,
+    *,
+    target: int,
+    crits: tuple[int, ...],
+) -> Union[H, int]:
+    if to_hit.outcome in crits:
+        return HitResult.CRIT
+    elif to_hit.outcome == 1 or to_hit.outcome < target:
+        return HitResult.MISS
+    else:
+        return HitResult.HIT
+
+
+def expected_damage_foreach(
+    expected_to_hit: H,
+    normal_dmg: H,
+    extra_crit_dmg: H,
+) -> H:
+    r"""
+    Reference for ``#!python expected_damage`` that substitutes the damage for each
+    ``#!python HitResult`` outcome on its own.
+    """
+    normal_dmg_ltd, crit_dmg_ltd = dmg_by_tier(normal_dmg, extra_crit_dmg)
+
+    def _eval(expected_to_hit: HResult) -> Union[H, int]:
+        if expected_to_hit.outcome == HitResult.CRIT:
+            return crit_dmg_ltd
+        elif expected_to_hit.outcome == HitResult.HIT:
+            return normal_dmg_ltd
+        else:
+            return 0
+
+    return foreach(_eval, expected_to_hit=expected_to_hit)
+
+
+class TestExpectedDamage(unittest.TestCase):
+    to_hits = (
+        TO_HIT_NORMAL,
+        TO_HIT_DISADV,
+        TO_HIT_ADV,
+        TO_HIT_ELVEN_ACCURACY,
+        H(20) + 3,
+        H({1: 3, 10: 1, 20: 2}),
+    )
+    crit_ranges = (CRITS_NORMAL, CRITS_IMPROVED, CRITS_SUPERIOR, ())
+    dmgs = ((H(6) + 3, H(6)), (H(4) - 3, H(4) - 2), (2 @ H(8), H({0: 1})))
+
+    def test_to_hit_tiers(self):
+        for to_hit in self.to_hits:
+            tiers = to_hit_tiers(to_hit)
+
+            for crits in self.crit_ranges:
+                for target in range(-1, 27):
+                    self.assertEqual(
+                        tiers.h(target, crits),
+                        crit_foreach(target, to_hit, crits),
+                        msg=f"to_hit = {to_hit!r}; target = {target}; crits = {crits}",
+                    )
+
+    def test_crit_methods(self):
+        for crit_method, crits in (
+            (crit_normal, CRITS_NORMAL),
+            (crit_improved, CRITS_IMPROVED),
+            (crit_superior, CRITS_SUPERIOR),
+        ):
+            for to_hit in self.to_hits:
+                for target in (2, 11, 19, 21):
+                    self.assertEqual(
+                        crit_method(target, to_hit),
+                        crit_foreach(target, to_hit, crits),
+                        msg=f"to_hit = {to_hit!r}; target = {target}; crits = {crits}",
+                    )
+
+    def test_expected_damage(self):
+        for to_hit in self.to_hits:
+            for target in (2, 11, 19):
+                expected_to_hit = crit_improved(target, to_hit)
+
+                for normal_dmg, extra_crit_dmg in self.dmgs:
+                    self.assertEqual(
+                        expected_damage(expected_to_hit, normal_dmg, extra_crit_dmg),
+                        expected_damage_foreach(
+                            expected_to_hit, normal_dmg, extra_crit_dmg
+                        ),
+                        msg=f"to_hit = {to_hit!r}; target = {target}; normal_dmg = {normal_dmg!r}",
+                    )
+
+    def test_expected_damage_batch(self):
+        targets = (2, 11, 19, 25)
+        batch = expected_damage_batch(TO_HIT_ADV, targets, self.crit_ranges, self.dmgs)
+        self.assertEqual(
+            len(batch), len(targets) * len(self.crit_ranges) * len(self.dmgs)
+        )
+
+        for (target, crits, normal_dmg, extra_crit_dmg), dmg in batch.items():
+            self.assertEqual(
+                dmg,
+                expected_damage_foreach(
+                    crit_foreach(target, TO_HIT_ADV, crits), normal_dmg, extra_crit_dmg
+                ),
+                msg=f"target = {target}; crits = {crits}; normal_dmg = {normal_dmg!r}",
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
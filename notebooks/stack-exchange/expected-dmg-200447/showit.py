@@ -1,9 +1,14 @@
 from typing import Callable
 
+import matplotlib.pyplot
 from anydyce import HPlotterChooser
 from anydyce.viz import PlotWidgets
+from damage_sweep import damage_sweep, sweep_stat_names
 from dyce import H
 from expected_damage import (
+    CRITS_IMPROVED,
+    CRITS_NORMAL,
+    CRITS_SUPERIOR,
     TO_HIT_ADV,
     TO_HIT_DISADV,
     TO_HIT_NORMAL,
@@ -29,6 +34,12 @@ CRIT_METHODS = {
     # Any others?
 }
 
+CRIT_RANGES = {
+    "Normal": CRITS_NORMAL,
+    "Improved": CRITS_IMPROVED,
+    "Superior": CRITS_SUPERIOR,
+}
+
 
 def showit(damage_dice: dict[str, H]):
     def _display(
@@ -145,3 +156,78 @@ def showit(damage_dice: dict[str, H]):
     )
 
     chooser.interact()
+
+
+def showit_heatmap(damage_dice: dict[str, H]):
+    def _display(
+        to_hit: H,
+        crits: tuple[int, ...],
+        dmg_mod: int,
+        stat_name: str,
+    ) -> None:
+        sweep = damage_sweep(
+            to_hit,
+            crits,
+            {name: (die + dmg_mod, die) for name, die in damage_dice.items()},
+        )
+        stat = sweep.stat(stat_name)
+        fig, axes = matplotlib.pyplot.subplots(
+            1,
+            len(sweep.dmg_names),
+            figsize=(3 * len(sweep.dmg_names), 4),
+            sharey=True,
+            squeeze=False,
+        )
+
+        for ax, dmg_name, dmg_stat in zip(axes[0], sweep.dmg_names, stat):
+            image = ax.imshow(
+                dmg_stat,
+                origin="lower",
+                aspect="auto",
+                vmin=stat.min(),
+                vmax=stat.max(),
+                extent=(
+                    sweep.hit_bonuses[0] - 0.5,
+                    sweep.hit_bonuses[-1] + 0.5,
+                    sweep.acs[0] - 0.5,
+                    sweep.acs[-1] + 0.5,
+                ),
+            )
+            ax.set_title(f"{dmg_name}{dmg_mod:+}")
+            ax.set_xlabel("Hit bonus")
+
+        axes[0][0].set_ylabel("AC")
+        fig.colorbar(image, ax=axes[0].tolist(), label=stat_name)
+        matplotlib.pyplot.show()
+
+    to_hit_widget = widgets.Dropdown(
+        options=TO_HIT_METHODS, value=TO_HIT_NORMAL, description="To Hit"
+    )
+    crit_range_widget = widgets.Dropdown(options=CRIT_RANGES, description="Crit Method")
+    dmg_mod_widget = widgets.IntSlider(
+        value=0,
+        min=-10,
+        max=+10,
+        step=1,
+        continuous_update=False,
+        description="Dmg Mod",
+    )
+    stat_widget = widgets.Dropdown(options=sweep_stat_names(), description="Statistic")
+
+    display(
+        widgets.VBox(
+            [
+                widgets.HBox([to_hit_widget, crit_range_widget]),
+                widgets.HBox([dmg_mod_widget, stat_widget]),
+            ]
+        ),
+        widgets.interactive_output(
+            _display,
+            {
+                "to_hit": to_hit_widget,
+                "crits": crit_range_widget,
+                "dmg_mod": dmg_mod_widget,
+                "stat_name": stat_widget,
+            },
+        ),
+    )
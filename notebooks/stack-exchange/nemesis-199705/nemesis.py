@@ -1,15 +1,9 @@
-import sys
+import unittest
 from enum import IntEnum
 
 from dyce import H
 from dyce.evaluation import HResult, foreach
-
-if sys.version_info >= (3, 9):
-    from functools import cache
-else:
-    from functools import lru_cache
-
-    cache = lru_cache(maxsize=None)
+from memo import memo
 
 d6 = H(6)
 
@@ -19,6 +13,7 @@ class Result(IntEnum):
     WIN = 1
 
 
+@memo
 def nemesis(
     our_yang_pool_size: int,
     our_yin_pool_size: int,
@@ -56,12 +51,139 @@ def nemesis(
         for outcome, count in (our_anticipated_hits - their_anticipated_blocks).items()
     )
 
-    @cache
-    def _resolve_combat(
-        our_chi_this_round: int,
-        their_chi_this_round: int,
-        this_round: int = 0,
-    ) -> H:
+    return _resolve_combat(
+        our_anticipated_chi_losses,
+        their_anticipated_chi_losses,
+        our_initial_chi,
+        their_initial_chi,
+    )
+
+
+def _resolve_combat(
+    our_chi_losses: H,
+    their_chi_losses: H,
+    our_initial_chi: int,
+    their_initial_chi: int,
+) -> H:
+    r"""
+    Resolves combat bottom-up over every pair of chi values up to the initial ones
+    (each round can only lower chi, so every state a round leads to has already been
+    resolved). Rounds where neither side loses chi don't change anything, so they're
+    left out and the other outcomes renormalized (as if rounds were re-rolled until
+    someone loses chi).
+
+    To keep counts exact, wins for each state are counted out of ``#!python total **
+    (our_chi + their_chi + offset)``, where ``#!python total`` is the count of joint chi
+    losses other than neither side losing any, and *offset* keeps the exponent positive
+    for every state a round can lead to (including those where combat has ended, which
+    are part of the grid). A round losing ``#!python our_loss + their_loss`` chi lowers
+    the exponent by as much, so wins from a subsequent state are scaled by ``#!python
+    total ** (our_loss + their_loss)`` (and the whole sum divided by ``#!python total``
+    once). Each side's chi losses are independent, so those scaled counts factor into
+    one per side, and the sum over the joint chi losses is done one side at a time
+    (``#!python their_sums`` holds the partial sums over their chi losses for each
+    state).
+    """
+    if our_initial_chi < 0 or their_initial_chi < 0:
+        return (
+            H({Result.WIN: 1})
+            if our_initial_chi >= their_initial_chi
+            else H({Result.LOSS: 1})
+        )
+
+    no_loss_count = our_chi_losses.get(0, 0) * their_chi_losses.get(0, 0)
+    total = our_chi_losses.total * their_chi_losses.total - no_loss_count
+
+    if not total:
+        # Neither side can ever lose chi, so combat never resolves
+        return H({})
+
+    # chi loss -> count * total ** chi loss
+    our_scaled_counts = {
+        chi_loss: count * total**chi_loss
+        for chi_loss, count in our_chi_losses.items()
+        if count
+    }
+    their_scaled_counts = {
+        chi_loss: count * total**chi_loss
+        for chi_loss, count in their_chi_losses.items()
+        if count
+    }
+    our_max_chi_loss = max(our_scaled_counts)
+    their_max_chi_loss = max(their_scaled_counts)
+    offset = our_max_chi_loss + their_max_chi_loss + 1
+    our_no_loss_scaled_count = our_scaled_counts.get(0, 0)
+    # Grid indexes are chi values shifted by the largest possible chi loss, since
+    # that's as far below zero as a round can take them
+    num_rows = our_max_chi_loss + our_initial_chi + 1
+    num_cols = their_max_chi_loss + their_initial_chi + 1
+    wins = [[0] * num_cols for _ in range(num_rows)]
+    their_sums = [[0] * num_cols for _ in range(num_rows)]
+
+    for row in range(num_rows):
+        our_chi = row - our_max_chi_loss
+
+        for col in range(num_cols):
+            their_chi = col - their_max_chi_loss
+
+            if our_chi < 0 or their_chi < 0:
+                state_wins = (
+                    total ** (our_chi + their_chi + offset)
+                    if our_chi >= their_chi
+                    else 0
+                )
+            else:
+                state_wins = sum(
+                    scaled_count * their_sums[row - chi_loss][col]
+                    for chi_loss, scaled_count in our_scaled_counts.items()
+                    if chi_loss
+                )
+
+                if our_no_loss_scaled_count:
+                    # Only rounds where they lose chi (this state's partial sum isn't
+                    # complete yet)
+                    state_wins += our_no_loss_scaled_count * sum(
+                        scaled_count * wins[row][col - chi_loss]
+                        for chi_loss, scaled_count in their_scaled_counts.items()
+                        if chi_loss
+                    )
+
+                state_wins //= total
+
+            wins[row][col] = state_wins
+            their_sums[row][col] = sum(
+                scaled_count * wins[row][col - chi_loss]
+                for chi_loss, scaled_count in their_scaled_counts.items()
+                if chi_loss <= col
+            )
+
+    our_wins = wins[-1][-1]
+    outcomes = total ** (our_initial_chi + their_initial_chi + offset)
+
+    return H(
+        (result, count)
+        for result, count in (
+            (Result.WIN, our_wins),
+            (Result.LOSS, outcomes - our_wins),
+        )
+        if count
+    ).lowest_terms()
+
+
+def _resolve_combat_foreach(
+    our_chi_losses: H,
+    their_chi_losses: H,
+    our_initial_chi: int,
+    their_initial_chi: int,
+) -> H:
+    r"""
+    Reference for ``#!python _resolve_combat`` that recurses from the initial chi
+    values, one round at a time.
+    """
+
+    # Unbounded, but only for the lifetime of this call
+    @memo(max_size=None)
+    def _resolve(our_chi_this_round: int, their_chi_this_round: int) -> H:
         if our_chi_this_round < 0 or their_chi_this_round < 0:
             return (
                 H({Result.WIN: 1})
@@ -71,10 +193,9 @@ def nemesis(
 
         def _next(our_chi_loss: HResult, their_chi_loss: HResult) -> H:
             if our_chi_loss.outcome or their_chi_loss.outcome:
-                return _resolve_combat(
+                return _resolve(
                     our_chi_this_round - our_chi_loss.outcome,
                     their_chi_this_round - their_chi_loss.outcome,
-                    this_round + 1,
                 )
             else:
                 # Neither side lost any chi, so consider this a dead-end to avoid
@@ -83,11 +204,81 @@ def nemesis(
 
         return foreach(
             _next,
-            our_chi_loss=our_anticipated_chi_losses,
-            their_chi_loss=their_anticipated_chi_losses,
+            our_chi_loss=our_chi_losses,
+            their_chi_loss=their_chi_losses,
             # We set limit to -1 to explicitly remove any externally imposed recursion
             # cutoff, since the default is effectively 1
             limit=-1,
         )
 
-    return _resolve_combat(our_initial_chi, their_initial_chi)
+    return _resolve(our_initial_chi, their_initial_chi)
+
+
+class TestNemesis(unittest.TestCase):
+    chi_losses = (
+        H({0: 1}),
+        H({0: 2, 1: 1}),
+        H({1: 1, 2: 1}),  # always loses chi
+        H({0: 5, 1: 3, 3: 1}),
+        H({0: 3, 2: 6}),  # not in lowest terms
+    )
+
+    def test_resolve_combat(self):
+        for our_chi_losses in self.chi_losses:
+            for their_chi_losses in self.chi_losses:
+                for our_initial_chi, their_initial_chi in (
+                    (0, 0),
+                    (3, 1),
+                    (2, 5),
+                    (6, 6),
+                    (-1, 2),
+                    (-2, -1),
+                ):
+                    self.assertEqual(
+                        _resolve_combat(
+                            our_chi_losses,
+                            their_chi_losses,
+                            our_initial_chi,
+                            their_initial_chi,
+                        ),
+                        _resolve_combat_foreach(
+                            our_chi_losses,
+                            their_chi_losses,
+                            our_initial_chi,
+                            their_initial_chi,
+                        ),
+                        msg=f"chi_losses = {(our_chi_losses, their_chi_losses)}; initial_chi = {(our_initial_chi, their_initial_chi)}",
+                    )
+
+    def test_pools(self):
+        for our_yang, our_yin, their_yang, their_yin in (
+            (2, 1, 1, 2),
+            (3, 0, 2, 2),
+            (0, 3, 3, 1),
+        ):
+            our_hits, our_blocks = (
+                n @ d6.le(4) if n else H({0: 1}) for n in (our_yang, our_yin)
+            )
+            their_hits, their_blocks = (
+                n @ d6.le(3) if n else H({0: 1}) for n in (their_yang, their_yin)
+            )
+            our_chi_losses = H(
+                (max(outcome, 0), count)
+                for outcome, count in (their_hits - our_blocks).items()
+            )
+            their_chi_losses = H(
+                (max(outcome, 0), count)
+                for outcome, count in (our_hits - their_blocks).items()
+            )
+            self.assertEqual(
+                nemesis(our_yang, our_yin, 4, 5, their_yang, their_yin, 3, 4),
+                _resolve_combat_foreach(our_chi_losses, their_chi_losses, 5, 4),
+                msg=f"pools = {(our_yang, our_yin, their_yang, their_yin)}",
+            )
+
+    def test_never_resolves(self):
+        self.assertEqual(_resolve_combat(H({0: 1}), H({0: 3}), 2, 2), H({}))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -57,7 +57,7 @@ def showit():
     our_initial_chi_widget = widgets.IntSlider(
         value=5,
         min=0,
-        max=10,
+        max=50,
         step=1,
         continuous_update=False,
         description="Starting Chi",
@@ -93,7 +93,7 @@ def showit():
     their_initial_chi_widget = widgets.IntSlider(
         value=5,
         min=0,
-        max=10,
+        max=50,
         step=1,
         continuous_update=False,
         description="Starting Chi",
@@ -0,0 +1,216 @@
+# A subset of the canonical (and tested) copy in github/bumpity-pool-posita-dyce-12's
+# memo.py, without statistics. Each notebook directory is fetched on its own, so it
+# needs its own copy. Make changes there first.
+import sys
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import wraps
+from hashlib import blake2b
+from typing import Any, Callable, TypeVar
+
+import numpy as np
+from dyce import H, P
+
+__all__ = ()
+
+_T = TypeVar("_T")
+
+_DEFAULT_MAX_SIZE = 256
+_FINGERPRINT_CACHE_SIZE = 1024
+
+# id(obj) -> (obj, fingerprint); holding obj keeps its id from being reused while cached
+_FINGERPRINT_CACHE: OrderedDict[int, tuple[Any, tuple[str, bytes]]] = OrderedDict()
+_FINGERPRINT_LOCK = threading.Lock()
+
+
+@dataclass(frozen=True)
+class MemoStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    entries: int = 0
+    size: int = 0  # in units of sizeof (bytes, if max_bytes was provided)
+
+    def __add__(self, other: "MemoStats") -> "MemoStats":
+        return MemoStats(
+            hits=self.hits + other.hits,
+            misses=self.misses + other.misses,
+            evictions=self.evictions + other.evictions,
+            entries=self.entries + other.entries,
+            size=self.size + other.size,
+        )
+
+    def __str__(self) -> str:
+        return f"hits: {self.hits}; misses: {self.misses}; evictions: {self.evictions}; entries: {self.entries}; size: {self.size}"
+
+
+def memo(
+    func: Callable[..., _T] | None = None,
+    *,
+    max_size: int | None = _DEFAULT_MAX_SIZE,
+    max_bytes: int | None = None,
+    sizeof: Callable[[Any], int] | None = None,
+):
+    r"""
+    Bounded replacement for ``#!python functools.cache``. Results are kept for up to
+    *max_size* distinct arguments or, if *max_bytes* is provided, until their
+    cumulative size (as estimated by *sizeof*, which defaults to ``#!python
+    sizeof_value``) exceeds *max_bytes*, after which the least recently used are
+    evicted (but never the one just computed). A *max_size* of ``#!python None`` is
+    unbounded, which is only appropriate for functions defined within other functions.
+    ``#!python H`` and ``#!python P`` arguments are keyed by ``#!python fingerprint``
+    rather than hashed and compared on each call (so equal histograms whose counts
+    differ in scale share results, see ``#!python fingerprint``). The decorated
+    function has ``#!python cache_info`` and ``#!python cache_clear`` methods (like
+    those from ``#!python functools``).
+    """
+    if max_bytes is not None:
+        bound, measure = max_bytes, sizeof or sizeof_value
+    else:
+        bound, measure = max_size, lambda _: 1
+
+    def _decorator(f: Callable[..., _T]) -> Callable[..., _T]:
+        entries: OrderedDict[Any, tuple[_T, int]] = OrderedDict()
+        lock = threading.RLock()
+        hits = misses = evictions = size = 0
+
+        @wraps(f)
+        def _memoized(*args, **kw) -> _T:
+            nonlocal hits, misses, evictions, size
+            key = _make_key(args, kw)
+
+            with lock:
+                try:
+                    value, _ = entries[key]
+                except KeyError:
+                    misses += 1
+                else:
+                    hits += 1
+                    entries.move_to_end(key)
+
+                    return value
+
+            # Computed outside the lock, since f may recurse (or take a while)
+            value = f(*args, **kw)
+            value_size = measure(value)
+
+            with lock:
+                if key in entries:
+                    # Computed concurrently (or recursively) by someone else
+                    size -= entries[key][1]
+
+                entries[key] = value, value_size
+                entries.move_to_end(key)
+                size += value_size
+
+                while bound is not None and size > bound and len(entries) > 1:
+                    _, (_, evicted_size) = entries.popitem(last=False)
+                    size -= evicted_size
+                    evictions += 1
+
+            return value
+
+        def cache_info() -> MemoStats:
+            with lock:
+                return MemoStats(hits, misses, evictions, len(entries), size)
+
+        def cache_clear() -> None:
+            nonlocal hits, misses, evictions, size
+
+            with lock:
+                entries.clear()
+                hits = misses = evictions = size = 0
+
+        _memoized.cache_info = cache_info  # type: ignore
+        _memoized.cache_clear = cache_clear  # type: ignore
+
+        return _memoized
+
+    return _decorator if func is None else _decorator(func)
+
+
+def fingerprint(obj: H | P) -> tuple[str, bytes]:
+    r"""
+    Returns a compact digest of *obj*'s structure that is equal for equal histograms
+    (i.e., in lowest terms) or pools. Fingerprints of recently seen objects are cached,
+    so passing the same object repeatedly doesn't re-examine it.
+
+    Because ``#!python H({1: 1, 2: 1})`` and ``#!python H({1: 2, 2: 2})`` have the
+    same fingerprint, it is only a safe key for results that depend on probabilities
+    alone. Functions whose results depend on the scale of counts (e.g., a table of
+    counts, or anything whose integer dtype is chosen from ``#!python H.total``) should
+    reduce such arguments with ``#!python H.lowest_terms`` before keying on them (as
+    ``#!python encoded_pool_table`` does in bumpity-pool-posita-dyce-12's
+    ``dyce_impl.py``).
+    """
+    with _FINGERPRINT_LOCK:
+        try:
+            cached_obj, cached_fingerprint = _FINGERPRINT_CACHE[id(obj)]
+        except KeyError:
+            pass
+        else:
+            if cached_obj is obj:
+                _FINGERPRINT_CACHE.move_to_end(id(obj))
+
+                return cached_fingerprint
+
+    if isinstance(obj, H):
+        structure = repr(tuple(obj.lowest_terms().items()))
+    elif isinstance(obj, P):
+        structure = repr(tuple(fingerprint(h) for h in obj))
+    else:
+        raise TypeError(f"cannot fingerprint {obj!r}")
+
+    obj_fingerprint = (
+        type(obj).__name__,
+        blake2b(structure.encode("utf-8"), digest_size=16).digest(),
+    )
+
+    with _FINGERPRINT_LOCK:
+        _FINGERPRINT_CACHE[id(obj)] = obj, obj_fingerprint
+        _FINGERPRINT_CACHE.move_to_end(id(obj))
+
+        while len(_FINGERPRINT_CACHE) > _FINGERPRINT_CACHE_SIZE:
+            _FINGERPRINT_CACHE.popitem(last=False)
+
+    return obj_fingerprint
+
+
+def sizeof_value(value: Any) -> int:
+    r"""
+    Returns a rough estimate of the number of bytes used by *value* (including, for
+    histograms, arrays and containers, their contents).
+    """
+    if isinstance(value, np.ndarray):
+        return value.nbytes + sys.getsizeof(value)
+    elif isinstance(value, H):
+        return sys.getsizeof(value) + sizeof_value(dict(value.items()))
+    elif isinstance(value, P):
+        return sys.getsizeof(value) + sum(sizeof_value(h) for h in value)
+    elif isinstance(value, dict):
+        return sys.getsizeof(value) + sum(
+            sizeof_value(k) + sizeof_value(v) for k, v in value.items()
+        )
+    elif isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(sizeof_value(item) for item in value)
+    else:
+        return sys.getsizeof(value)
+
+
+def _make_key(args: tuple, kw: dict) -> tuple:
+    key = tuple(_key_part(arg) for arg in args)
+
+    if kw:
+        key += (_KW_MARK,) + tuple(
+            (name, _key_part(arg)) for name, arg in sorted(kw.items())
+        )
+
+    return key
+
+
+def _key_part(arg: Any) -> Any:
+    return fingerprint(arg) if isinstance(arg, (H, P)) else arg
+
+
+_KW_MARK = object()
@@ -1,19 +1,13 @@
-import sys
 from typing import Union
 
 from dyce import H, P
 from dyce.p import RollT
+from memo import memo
 from numerary import RealLike
 
-if sys.version_info >= (3, 9):
-    from functools import cache
-else:
-    from functools import lru_cache
 
-    cache = lru_cache(maxsize=None)
-
-
-@cache
+# Large enough for every (a_pool_size, d_pool_size, n) reachable from 11d6 vs. 11d6
+@memo(max_size=1024)
 def nco_karonen(
     a_pool_size: int,
     d_pool_size: int,
@@ -0,0 +1,112 @@
+import unittest
+from functools import lru_cache
+from itertools import accumulate
+from math import comb
+
+from dyce import H, P
+
+_ORDER_STAT_CACHE_SIZE = 256
+
+
+def highest(die: H, n: int, k: int = 1) -> H:
+    r"""
+    Returns the distribution of the *k*-th highest of *n* rolls of *die* (e.g.,
+    ``#!python highest(H(20), 2)`` is rolling with advantage, and ``#!python
+    highest(H(20), 3)`` is with elven accuracy). Equivalent to ``#!python (n @
+    P(die)).h(-k)``, but without enumerating rolls.
+    """
+    return _order_stat(die, n, k, True)
+
+
+def lowest(die: H, n: int, k: int = 1) -> H:
+    r"""
+    Returns the distribution of the *k*-th lowest of *n* rolls of *die* (e.g.,
+    ``#!python lowest(H(20), 2)`` is rolling with disadvantage). Equivalent to
+    ``#!python (n @ P(die)).h(k - 1)``, but without enumerating rolls.
+    """
+    return _order_stat(die, n, k, False)
+
+
+@lru_cache(maxsize=_ORDER_STAT_CACHE_SIZE)
+def _order_stat(die: H, n: int, k: int, from_highest: bool) -> H:
+    r"""
+    With each roll's counts out of *total*, the number of ways the *k*-th highest of *n*
+    rolls is at most an outcome is the number of ways fewer than *k* rolls are above it,
+    i.e., the sum over ``#!python j < k`` of ``#!python comb(n, j) * above**j *
+    at_most**(n - j)`` (where *at_most* and *above* partition *total*). Differences
+    between consecutive outcomes' sums are the counts of each. The *k*-th lowest is the
+    *k*-th highest with the order of outcomes reversed.
+    """
+    if not 1 <= k <= n:
+        raise ValueError(f"k ({k}) must be from 1 to n ({n})")
+
+    outcomes = list(die.outcomes())
+    counts = list(die.counts())
+
+    if not from_highest:
+        outcomes.reverse()
+        counts.reverse()
+
+    total = sum(counts)
+    # Once reversed, "at most" means "at least", but the arithmetic is the same
+    at_most_counts = list(accumulate(counts))
+    ways_at_most = [
+        sum(comb(n, j) * (total - at_most) ** j * at_most ** (n - j) for j in range(k))
+        for at_most in at_most_counts
+    ]
+
+    return H(
+        (outcome, ways - prior_ways)
+        for outcome, ways, prior_ways in zip(
+            outcomes, ways_at_most, [0] + ways_at_most[:-1]
+        )
+        if ways != prior_ways
+    )
+
+
+assert highest(H(20), 2) == (2 @ P(20)).h(-1)
+assert lowest(H(20), 2) == (2 @ P(20)).h(0)
+assert highest(H(6) + H(4), 3, 2) == (3 @ P(H(6) + H(4))).h(-2)
+assert lowest(H({1: 3, 5: 1, 8: 2}), 4, 3) == (4 @ P(H({1: 3, 5: 1, 8: 2}))).h(2)
+
+
+class TestOrderStats(unittest.TestCase):
+    dice = (H(20), H(6) + H(4), H({1: 3, 5: 1, 8: 2}), H({-2: 1, 0: 5}), H({7: 3}))
+
+    def test_highest(self):
+        for die in self.dice:
+            for n in range(1, 5):
+                pool = n @ P(die)
+
+                for k in range(1, n + 1):
+                    self.assertEqual(
+                        highest(die, n, k),
+                        pool.h(-k),
+                        msg=f"die = {die!r}; n = {n}; k = {k}",
+                    )
+
+    def test_lowest(self):
+        for die in self.dice:
+            for n in range(1, 5):
+                pool = n @ P(die)
+
+                for k in range(1, n + 1):
+                    self.assertEqual(
+                        lowest(die, n, k),
+                        pool.h(k - 1),
+                        msg=f"die = {die!r}; n = {n}; k = {k}",
+                    )
+
+    def test_bad_k(self):
+        for k in (0, 3):
+            with self.assertRaisesRegex(
+                ValueError, rf"\Ak \({k}\) must be from 1 to n \(2\)\Z"
+            ):
+                highest(H(6), 2, k)
+
+    def test_cached(self):
+        self.assertIs(highest(H(20), 3), highest(H(20), 3))
+
+
+if __name__ == "__main__":
+    unittest.main()